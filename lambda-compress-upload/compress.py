@@ -3,30 +3,44 @@
 import os
 import subprocess
 import logging
+import threading
 import time
 
 logger = logging.getLogger(__name__)
 
+# Used when no settings are passed (see encoder_settings.choose_settings)
+DEFAULT_SETTINGS = {"preset": "veryfast", "crf": 23, "threads": 0, "timeout": 840}
 
-def compress_video(input_path: str, recording_id: str, resolution: int = 480) -> tuple[str, int, float]:
+
+def compress_video(
+    input_path: str,
+    recording_id: str,
+    resolution: int = 480,
+    stdin_feed=None,
+    settings: dict | None = None,
+) -> tuple[str, int, float]:
     """
     Compress video to the given resolution using FFmpeg.
 
     Args:
         resolution: Target height in pixels (e.g. 480, 720, 1080). Default 480p.
+        stdin_feed: Optional callable(sink) that writes the source to ffmpeg's stdin
+            (a streaming download) instead of reading input_path.
+        settings: preset, crf, threads and timeout from encoder_settings.choose_settings.
 
     Returns (output_path, compressed_size_bytes, duration_seconds).
     """
     output_path = f"/tmp/{recording_id}_compressed.mp4"
+    settings = settings or DEFAULT_SETTINGS
 
     cmd = [
         "ffmpeg",
-        "-i", input_path,
+        "-i", "pipe:0" if stdin_feed else input_path,
         "-vf", f"scale=-2:{resolution}",
         "-c:v", "libx264",
-        "-crf", "23",
-        "-preset", "veryfast",
-        "-threads", "0",  # Use all available CPU cores
+        "-crf", str(settings["crf"]),
+        "-preset", settings["preset"],
+        "-threads", str(settings["threads"]),  # 0 = all available CPU cores
         "-c:a", "aac",
         "-b:a", "128k",
         "-movflags", "+faststart",
@@ -37,18 +51,22 @@ def compress_video(input_path: str, recording_id: str, resolution: int = 480) ->
     logger.info(f"Compressing video: {' '.join(cmd)}")
     start_time = time.time()
 
-    result = subprocess.run(
-        cmd,
-        capture_output=True,
-        text=True,
-        timeout=840,  # 14 minutes max (leave 1 min for upload)
-    )
+    if stdin_feed:
+        returncode, stderr = _run_with_feed(cmd, stdin_feed, timeout=settings["timeout"])
+    else:
+        result = subprocess.run(
+            cmd,
+            capture_output=True,
+            text=True,
+            timeout=settings["timeout"],  # leaves time for upload within the Lambda limit
+        )
+        returncode, stderr = result.returncode, result.stderr
 
     duration = time.time() - start_time
 
-    if result.returncode != 0:
-        logger.error(f"FFmpeg stderr: {result.stderr[-2000:]}")
-        raise RuntimeError(f"FFmpeg failed with code {result.returncode}: {result.stderr[-500:]}")
+    if returncode != 0:
+        logger.error(f"FFmpeg stderr: {stderr[-2000:]}")
+        raise RuntimeError(f"FFmpeg failed with code {returncode}: {stderr[-500:]}")
 
     compressed_size = os.path.getsize(output_path)
     logger.info(
@@ -58,6 +76,82 @@ def compress_video(input_path: str, recording_id: str, resolution: int = 480) ->
     return output_path, compressed_size, duration
 
 
+def remux_video(input_path: str, recording_id: str) -> tuple[str, int, float]:
+    """
+    Copy the video and audio streams into a +faststart MP4 without re-encoding.
+
+    For sources encoder_settings.plan_compression() found already small enough.
+    Returns (output_path, size_bytes, duration_seconds).
+    """
+    output_path = f"/tmp/{recording_id}_compressed.mp4"
+
+    cmd = [
+        "ffmpeg",
+        "-i", input_path,
+        "-map", "0:v:0",
+        "-map", "0:a:0?",
+        "-c", "copy",
+        "-movflags", "+faststart",
+        "-y",
+        output_path,
+    ]
+
+    logger.info(f"Remuxing video: {' '.join(cmd)}")
+    start_time = time.time()
+    result = subprocess.run(cmd, capture_output=True, text=True, timeout=300)
+    duration = time.time() - start_time
+
+    if result.returncode != 0:
+        logger.error(f"FFmpeg stderr: {result.stderr[-2000:]}")
+        raise RuntimeError(f"Remux failed with code {result.returncode}: {result.stderr[-500:]}")
+
+    size = os.path.getsize(output_path)
+    logger.info(f"Remux complete: {size:,} bytes in {duration:.1f}s")
+    return output_path, size, duration
+
+
+def _run_with_feed(cmd: list, stdin_feed, timeout: float) -> tuple[int, str]:
+    """Run ffmpeg while a background thread writes its input to stdin. Returns (returncode, stderr)."""
+    proc = subprocess.Popen(
+        cmd,
+        stdin=subprocess.PIPE,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+    )
+    feed_errors = []
+
+    def feed():
+        try:
+            stdin_feed(proc.stdin)
+        except Exception as e:
+            feed_errors.append(e)
+        finally:
+            try:
+                proc.stdin.close()
+            except BrokenPipeError:
+                pass
+
+    feeder = threading.Thread(target=feed, name="ffmpeg-feed", daemon=True)
+    feeder.start()
+    # Reads below block until ffmpeg exits, so enforce the timeout with a kill timer
+    watchdog = threading.Timer(timeout, proc.kill)
+    watchdog.start()
+    try:
+        stderr = proc.stderr.read().decode(errors="replace")
+        returncode = proc.wait()
+        feeder.join()
+    except Exception:
+        proc.kill()
+        proc.wait()
+        raise
+    finally:
+        watchdog.cancel()
+
+    if feed_errors:
+        raise feed_errors[0]
+    return returncode, stderr
+
+
 def extract_audio(input_path: str, recording_id: str) -> tuple[str, int] | None:
     """
     Extract and compress audio to MP3 128k if no separate audio URL was provided.
@@ -91,3 +185,102 @@ def extract_audio(input_path: str, recording_id: str) -> tuple[str, int] | None:
     size = os.path.getsize(output_path)
     logger.info(f"Audio extracted: {size:,} bytes")
     return output_path, size
+
+
+def compress_single_pass(
+    input_path: str,
+    recording_id: str,
+    resolution: int = 480,
+    want_audio: bool = True,
+    media_info: dict | None = None,
+    settings: dict | None = None,
+) -> dict:
+    """
+    Produce the compressed MP4, MP3 audio track and JPEG thumbnail from one decode.
+
+    A single ffmpeg invocation scales the source once and splits the frames
+    between the H.264 encoder and a one-frame thumbnail output, while the
+    audio stream feeds both the AAC track and (if wanted) the MP3 output.
+
+    Args:
+        resolution: Target height in pixels.
+        want_audio: Also write the MP3 (skip when audio was downloaded separately).
+        media_info: Result of probe.probe_media(input_path), probed here if omitted.
+        settings: preset, crf, threads and timeout from encoder_settings.choose_settings.
+
+    Returns:
+        Dict with 'video' (path, size), 'audio' (path, size) | None,
+        'thumbnail' (path, size) | None and 'duration' (seconds spent in ffmpeg).
+        Raises RuntimeError on failure so callers can fall back to separate passes.
+    """
+    from probe import probe_media
+    from thumbnail import pick_thumbnail_time
+
+    info = media_info or probe_media(input_path)
+    settings = settings or DEFAULT_SETTINGS
+    if not info["has_video"]:
+        raise RuntimeError("Input has no video stream")
+
+    video_path = f"/tmp/{recording_id}_compressed.mp4"
+    audio_path = f"/tmp/{recording_id}_compressed_audio.mp3"
+    thumb_path = f"/tmp/{recording_id}_thumbnail.jpg"
+    thumb_time = pick_thumbnail_time(info["duration"])
+    write_audio = want_audio and info["has_audio"]
+
+    filter_graph = (
+        f"[0:v]scale=-2:{resolution},split=2[vout][vthumb];"
+        f"[vthumb]select='gte(t,{thumb_time})'[thumb]"
+    )
+
+    cmd = [
+        "ffmpeg",
+        "-i", input_path,
+        "-filter_complex", filter_graph,
+        # Output 1: compressed video (+ AAC of the first audio track if present)
+        "-map", "[vout]",
+        "-map", "0:a:0?",
+        "-c:v", "libx264",
+        "-crf", str(settings["crf"]),
+        "-preset", settings["preset"],
+        "-threads", str(settings["threads"]),
+        "-c:a", "aac",
+        "-b:a", "128k",
+        "-movflags", "+faststart",
+        "-y", video_path,
+        # Output 2: thumbnail (first frame at/after thumb_time)
+        "-map", "[thumb]",
+        "-frames:v", "1",
+        "-q:v", "2",
+        "-y", thumb_path,
+    ]
+    if write_audio:
+        # Output 3: MP3 audio track
+        cmd += [
+            "-map", "0:a:0",
+            "-c:a", "libmp3lame",
+            "-b:a", "128k",
+            "-y", audio_path,
+        ]
+
+    logger.info(f"Single-pass compress: {' '.join(cmd)}")
+    start_time = time.time()
+    result = subprocess.run(cmd, capture_output=True, text=True, timeout=settings["timeout"])
+    duration = time.time() - start_time
+
+    if result.returncode != 0:
+        logger.error(f"FFmpeg stderr: {result.stderr[-2000:]}")
+        raise RuntimeError(f"Single-pass FFmpeg failed with code {result.returncode}: {result.stderr[-500:]}")
+
+    outputs = {"video": (video_path, os.path.getsize(video_path)), "audio": None, "thumbnail": None}
+    if write_audio and os.path.exists(audio_path) and os.path.getsize(audio_path) > 0:
+        outputs["audio"] = (audio_path, os.path.getsize(audio_path))
+    if os.path.exists(thumb_path) and os.path.getsize(thumb_path) > 0:
+        outputs["thumbnail"] = (thumb_path, os.path.getsize(thumb_path))
+    outputs["duration"] = duration
+
+    logger.info(
+        f"Single-pass complete in {duration:.1f}s: video {outputs['video'][1]:,} bytes, "
+        f"audio {outputs['audio'][1] if outputs['audio'] else 0:,} bytes, "
+        f"thumbnail {outputs['thumbnail'][1] if outputs['thumbnail'] else 0:,} bytes"
+    )
+    return outputs
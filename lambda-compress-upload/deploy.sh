@@ -32,6 +32,9 @@ echo "=========================================="
 
 cd "$(dirname "$0")"
 
+# Refresh shared modules (lambda-shared/) in this build context
+../lambda-shared/sync.sh
+
 # Step 1: Create ECR repository (if create mode)
 if [ "$ACTION" = "create" ]; then
   echo ""
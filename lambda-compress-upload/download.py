@@ -1,46 +1,43 @@
-"""Download video/audio from MeetingBaaS presigned URLs to /tmp."""
+"""Download video/audio from MeetingBaaS presigned URLs to /tmp (or stream into ffmpeg)."""
 
+import glob
 import os
 import logging
-import requests
 
-logger = logging.getLogger(__name__)
+from ranged_download import fetch_to_file, stream_to
 
-CHUNK_SIZE = 8 * 1024 * 1024  # 8MB chunks for download
+logger = logging.getLogger(__name__)
 
 
-def download_file(url: str, output_path: str) -> int:
-    """Download a file from URL to local path. Returns file size in bytes."""
-    logger.info(f"Downloading to {output_path}")
+def download_file(url: str, output_path: str) -> dict:
+    """
+    Download a file from URL to local path using parallel byte ranges.
 
-    response = requests.get(url, stream=True, timeout=600)
-    response.raise_for_status()
+    Returns:
+        Stats dict with bytes, seconds, mb_per_s, parts, retries.
+    """
+    return fetch_to_file(url, output_path)
 
-    total_bytes = 0
-    with open(output_path, "wb") as f:
-        for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
-            if chunk:
-                f.write(chunk)
-                total_bytes += len(chunk)
 
-    logger.info(f"Downloaded {total_bytes:,} bytes to {output_path}")
-    return total_bytes
+def download_video(video_url: str, recording_id: str) -> tuple[str, dict]:
+    """Download video to /tmp. Returns (path, download stats)."""
+    path = f"/tmp/{recording_id}_input.mp4"
+    stats = download_file(video_url, path)
+    return path, stats
 
 
-def download_video(video_url: str, recording_id: str) -> tuple[str, int]:
-    """Download video to /tmp. Returns (path, size_bytes)."""
-    path = f"/tmp/{recording_id}_input.mp4"
-    size = download_file(video_url, path)
-    return path, size
+def stream_video(video_url: str, sink) -> dict:
+    """Stream video bytes into sink (e.g., ffmpeg stdin) while still downloading. Returns stats."""
+    return stream_to(video_url, sink)
 
 
-def download_audio(audio_url: str, recording_id: str) -> tuple[str, int] | None:
-    """Download audio to /tmp if URL provided. Returns (path, size_bytes) or None."""
+def download_audio(audio_url: str, recording_id: str) -> tuple[str, dict] | None:
+    """Download audio to /tmp if URL provided. Returns (path, download stats) or None."""
     if not audio_url:
         return None
     path = f"/tmp/{recording_id}_input_audio.mp3"
-    size = download_file(audio_url, path)
-    return path, size
+    stats = download_file(audio_url, path)
+    return path, stats
 
 
 def cleanup_temp_files(recording_id: str):
@@ -50,7 +47,10 @@ def cleanup_temp_files(recording_id: str):
         f"/tmp/{recording_id}_input_audio.mp3",
         f"/tmp/{recording_id}_compressed.mp4",
         f"/tmp/{recording_id}_compressed_audio.mp3",
+        f"/tmp/{recording_id}_thumbnail.jpg",
     ]
+    # Leftovers of a failed segmented encode
+    patterns += glob.glob(f"/tmp/{recording_id}_segment*")
     for path in patterns:
         if os.path.exists(path):
             os.remove(path)
@@ -0,0 +1,228 @@
+"""Pick x264 preset, CRF and threads so the encode fits the Lambda time budget.
+
+plan_compression() first decides whether the source needs encoding at all:
+H.264/AAC at or below the target height and already at a bitrate the encode
+would not meaningfully reduce is remuxed (stream copy + faststart) instead.
+
+Encode time is predicted from the probed source (duration, resolution, fps)
+with a per-preset throughput table for one vCPU, optionally corrected by a
+short trial encode of the actual input. The slowest (best compressing)
+preset predicted to finish within the budget is chosen, so short recordings
+get a better preset and long 1080p ones a faster one instead of timing out.
+"""
+
+import logging
+import os
+import subprocess
+import time
+
+logger = logging.getLogger(__name__)
+
+# libx264 throughput per vCPU in output megapixels/s, fastest preset last
+# (conservative figures for Lambda x86_64 vCPUs; the trial encode corrects them)
+PRESET_MPPS = {
+    "medium": 20.0,
+    "fast": 27.0,
+    "faster": 35.0,
+    "veryfast": 55.0,
+    "superfast": 100.0,
+    "ultrafast": 140.0,
+}
+# The fastest presets compress much worse at equal CRF, so give back some size
+PRESET_CRF = {"superfast": 25, "ultrafast": 26}
+DEFAULT_CRF = 23
+DEFAULT_PRESET = "veryfast"
+DECODE_MPPS = 250.0        # H.264 decode + scale, source megapixels/s per vCPU
+THREAD_EFFICIENCY = 0.75   # each extra vCPU adds this fraction of one
+STARTUP_SECONDS = 2.0
+DEFAULT_FPS = 25.0
+
+ENCODE_TIMEOUT = 840       # budget when there is no Lambda context (Railway, local)
+UPLOAD_RESERVE_SECONDS = int(os.environ.get("ENCODE_UPLOAD_RESERVE_SECONDS", "90"))
+BUDGET_SAFETY = 0.8        # only plan to use this share of the budget
+TRIAL_MIN_DURATION = int(os.environ.get("ENCODE_TRIAL_MIN_SECONDS", "600"))
+TRIAL_SECONDS = 6
+
+REMUX_ENABLED = os.environ.get("COMPRESS_REMUX", "1") == "1"
+REMUX_VIDEO_CODECS = ("h264",)
+REMUX_AUDIO_CODECS = ("aac", None)  # None = no audio stream
+# Typical libx264 CRF 23 output for meeting content, in bits per pixel per frame
+TRANSCODE_BITS_PER_PIXEL = 0.06
+# Only transcode when it is expected to shrink the video by at least this share
+REMUX_MIN_SAVING = float(os.environ.get("REMUX_MIN_SAVING", "0.2"))
+
+
+def remaining_seconds(context) -> float | None:
+    """Seconds left in this Lambda invocation, or None outside Lambda."""
+    if context is None or not hasattr(context, "get_remaining_time_in_millis"):
+        return None
+    return context.get_remaining_time_in_millis() / 1000
+
+
+def encode_budget(context) -> float:
+    """Seconds the encode may take, leaving UPLOAD_RESERVE_SECONDS for upload and callback."""
+    remaining = remaining_seconds(context)
+    if remaining is None:
+        return ENCODE_TIMEOUT
+    return max(30.0, remaining - UPLOAD_RESERVE_SECONDS)
+
+
+def predict_seconds(info: dict, resolution: int, preset: str, threads: int, speed_factor: float = 1.0,
+                    duration: float = None) -> float:
+    """Predicted wall time to encode `duration` seconds (default: all) of the probed source."""
+    duration = info["duration"] if duration is None else duration
+    fps = info.get("fps") or DEFAULT_FPS
+    width, height = info.get("width") or 1280, info.get("height") or 720
+    out_width = round(width * resolution / height / 2) * 2
+    frames = duration * fps
+
+    cpu_seconds = frames * (width * height / 1e6 / DECODE_MPPS + out_width * resolution / 1e6 / PRESET_MPPS[preset])
+    effective_cpus = 1 + (threads - 1) * THREAD_EFFICIENCY
+    return STARTUP_SECONDS + cpu_seconds / effective_cpus / speed_factor
+
+
+def _source_video_bit_rate(info: dict) -> int | None:
+    """Video stream bitrate, derived from the container bitrate if the stream has none."""
+    if info.get("video_bit_rate"):
+        return info["video_bit_rate"]
+    if info.get("bit_rate"):
+        return max(0, info["bit_rate"] - (info.get("audio_bit_rate") or 128_000))
+    return None
+
+
+def plan_compression(info: dict | None, resolution: int) -> dict:
+    """
+    Decide between remuxing the source as-is and transcoding it.
+
+    Returns:
+        Dict with path ("remux" | "transcode"), reason, copyable (the source could
+        be stream-copied, whatever its bitrate), source_kbps and expected_kbps
+        (estimated transcode output).
+    """
+    plan = {"path": "transcode", "reason": None, "copyable": False, "source_kbps": None, "expected_kbps": None}
+    if not REMUX_ENABLED:
+        plan["reason"] = "remux disabled"
+        return plan
+    if not info or not info.get("has_video"):
+        plan["reason"] = "no probe" if not info else "no video stream"
+        return plan
+    if info.get("video_codec") not in REMUX_VIDEO_CODECS:
+        plan["reason"] = f"video codec {info.get('video_codec')}"
+        return plan
+    if info.get("audio_codec") not in REMUX_AUDIO_CODECS:
+        plan["reason"] = f"audio codec {info.get('audio_codec')}"
+        return plan
+    if not info.get("height") or info["height"] > resolution:
+        plan["reason"] = f"height {info.get('height')} above {resolution}p"
+        return plan
+    plan["copyable"] = True
+
+    source_bps = _source_video_bit_rate(info)
+    if not source_bps:
+        plan["reason"] = "unknown bitrate"
+        return plan
+    fps = info.get("fps") or DEFAULT_FPS
+    out_width = round((info.get("width") or 1280) * resolution / info["height"] / 2) * 2
+    expected_bps = out_width * resolution * fps * TRANSCODE_BITS_PER_PIXEL
+    plan["source_kbps"] = round(source_bps / 1000)
+    plan["expected_kbps"] = round(expected_bps / 1000)
+
+    if expected_bps <= source_bps * (1 - REMUX_MIN_SAVING):
+        plan["reason"] = f"transcode expected to cut video from {plan['source_kbps']} to {plan['expected_kbps']} kbps"
+        return plan
+    plan["path"] = "remux"
+    plan["reason"] = f"source already {plan['source_kbps']} kbps H.264 at {info['height']}p"
+    return plan
+
+
+def trial_speed_factor(input_path: str, info: dict, resolution: int, threads: int) -> float | None:
+    """
+    Encode TRIAL_SECONDS from the middle of the input and return how much faster
+    (>1) or slower (<1) this machine is than the table predicts.
+    """
+    start = max(0.0, info["duration"] / 2 - TRIAL_SECONDS / 2)
+    cmd = [
+        "ffmpeg", "-nostdin", "-loglevel", "error",
+        "-ss", f"{start:.2f}", "-t", str(TRIAL_SECONDS),
+        "-i", input_path,
+        "-vf", f"scale=-2:{resolution}",
+        "-c:v", "libx264", "-preset", DEFAULT_PRESET, "-crf", str(DEFAULT_CRF),
+        "-threads", str(threads),
+        "-an", "-f", "null", "-",
+    ]
+    t0 = time.time()
+    try:
+        result = subprocess.run(cmd, capture_output=True, timeout=60)
+    except subprocess.TimeoutExpired:
+        return None
+    elapsed = time.time() - t0
+    if result.returncode != 0 or elapsed <= 0:
+        return None
+    predicted = predict_seconds(info, resolution, DEFAULT_PRESET, threads, duration=TRIAL_SECONDS)
+    return min(4.0, max(0.25, predicted / elapsed))
+
+
+def choose_settings(info: dict | None, resolution: int, budget_seconds: float,
+                    input_path: str = None, threads: int = None) -> dict:
+    """
+    Pick preset, CRF and threads for the budget.
+
+    Args:
+        info: probe.probe_media() result, or None when the input is not seekable
+            (streaming) — then the default preset is used with the budget as timeout.
+        input_path: Local input; enables the trial encode for long recordings.
+
+    Returns:
+        Dict with preset, crf, threads, timeout, budget_seconds, predicted_seconds,
+        speed_factor and calibration ("table" | "trial" | "none").
+    """
+    threads = threads or os.cpu_count() or 1
+    settings = {
+        "preset": DEFAULT_PRESET,
+        "crf": DEFAULT_CRF,
+        "threads": threads,
+        "timeout": int(budget_seconds),
+        "budget_seconds": round(budget_seconds, 1),
+        "predicted_seconds": None,
+        "speed_factor": 1.0,
+        "calibration": "none",
+    }
+    if not info or not info.get("duration") or not info.get("has_video"):
+        return settings
+
+    speed_factor = 1.0
+    settings["calibration"] = "table"
+    if input_path and info["duration"] >= TRIAL_MIN_DURATION:
+        trial_start = time.time()
+        measured = trial_speed_factor(input_path, info, resolution, threads)
+        # The trial itself comes out of the budget
+        budget_seconds = max(30.0, budget_seconds - (time.time() - trial_start))
+        settings["timeout"] = int(budget_seconds)
+        settings["budget_seconds"] = round(budget_seconds, 1)
+        if measured is not None:
+            speed_factor = measured
+            settings["calibration"] = "trial"
+
+    target = budget_seconds * BUDGET_SAFETY
+    presets = list(PRESET_MPPS)
+    chosen = presets[-1]
+    for preset in presets:
+        if predict_seconds(info, resolution, preset, threads, speed_factor) <= target:
+            chosen = preset
+            break
+
+    predicted = predict_seconds(info, resolution, chosen, threads, speed_factor)
+    if predicted > budget_seconds:
+        logger.warning(f"Even {chosen} is predicted to take {predicted:.0f}s of a {budget_seconds:.0f}s budget")
+
+    settings.update({
+        "preset": chosen,
+        "crf": PRESET_CRF.get(chosen, DEFAULT_CRF),
+        "predicted_seconds": round(predicted, 1),
+        "speed_factor": round(speed_factor, 3),
+    })
+    logger.info(
+        f"Encoder settings: preset {chosen}, crf {settings['crf']}, {threads} threads, "
+        f"predicted {predicted:.0f}s of {budget_seconds:.0f}s budget ({settings['calibration']})"
+    )
+    return settings
@@ -14,32 +14,40 @@ Expected event payload:
     "s3_audio_key": "meeting-recordings/{org}/{user}/{id}/audio.mp3",
     "callback_url": "https://....supabase.co/functions/v1/process-compress-callback",
     "callback_secret": "shared-hmac-secret",
-    "video_quality": "480p" | "720p" | "1080p"  (optional, default "480p")
+    "video_quality": "480p" | "720p" | "1080p"  (optional, default "480p"),
+    "stream_download": false  (optional, pipe the video download straight into ffmpeg),
+    "segments": 4  (optional, encode long recordings as N parallel keyframe-aligned segments)
 }
 """
 
-import hashlib
-import hmac
-import json
 import logging
+import os
 import time
+from concurrent.futures import ThreadPoolExecutor
 
-import requests
-
-from compress import compress_video, extract_audio
-from download import cleanup_temp_files, download_audio, download_video
+from callback_client import send_callback
+from compress import compress_single_pass, compress_video, extract_audio, remux_video
+from download import cleanup_temp_files, download_audio, download_video, stream_video
+from encoder_settings import choose_settings, encode_budget, plan_compression
+from probe import probe_media
 from s3_upload import upload_to_s3
+from segmented import SEGMENT_MIN_DURATION, SEGMENTS, compress_segmented
 from thumbnail import extract_thumbnail
+from tracing import Trace, metrics
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
+# Encode video, MP3 and thumbnail from a single decode (set to 0 for separate passes)
+SINGLE_PASS = os.environ.get("COMPRESS_SINGLE_PASS", "1") == "1"
+
 
 def lambda_handler(event, context):
     recording_id = event["recording_id"]
     logger.info(f"Processing recording: {recording_id}")
 
     start_time = time.time()
+    trace = Trace()
     result = {
         "recording_id": recording_id,
         "status": "failed",
@@ -47,69 +55,216 @@ def lambda_handler(event, context):
     }
 
     try:
-        # 1. Download video from MeetingBaaS
-        video_path, original_size = download_video(event["video_url"], recording_id)
-        result["original_size_bytes"] = original_size
-
-        # 2. Download audio separately if provided
-        audio_download = download_audio(event.get("audio_url"), recording_id)
-
-        # 3. Compress video to configured resolution
         quality_map = {"480p": 480, "720p": 720, "1080p": 1080}
         video_quality = event.get("video_quality", "480p")
         resolution = quality_map.get(video_quality, 480)
         logger.info(f"Video quality setting: {video_quality} → {resolution}p")
 
-        compressed_path, compressed_size, compress_duration = compress_video(
-            video_path, recording_id, resolution=resolution
-        )
+        # 1. Download audio separately if provided
+        with trace.span("download_audio") as span:
+            audio_download = download_audio(event.get("audio_url"), recording_id)
+            span["bytes"] = audio_download[1]["bytes"] if audio_download else None
+        result["download"] = {"audio": audio_download[1] if audio_download else None}
+
+        single_pass = None
+        compress_mode = "separate"
+        transcoded = True
+
+        # 2+3. Download video from MeetingBaaS and compress to configured resolution.
+        # In streaming mode the download is piped into ffmpeg so encoding starts immediately
+        # (needs a +faststart MP4 — otherwise leave stream_download off).
+        if event.get("stream_download", False):
+            video_stats = {}
+            # Nothing to probe before the stream starts: default preset, time-boxed to the budget
+            encoder = choose_settings(None, resolution, encode_budget(context))
+            result["compress_path"] = {"path": "transcode", "reason": "streaming download (not probed)"}
+            with trace.span("download_compress") as span:
+                compressed_path, compressed_size, compress_duration = compress_video(
+                    None, recording_id, resolution=resolution,
+                    stdin_feed=lambda sink: video_stats.update(stream_video(event["video_url"], sink)),
+                    settings=encoder,
+                )
+                span["bytes"] = video_stats.get("bytes")
+        else:
+            with trace.span("download_video") as span:
+                video_path, video_stats = download_video(event["video_url"], recording_id)
+                span["bytes"] = video_stats["bytes"]
+
+            media_info = None
+            with trace.span("probe"):
+                try:
+                    media_info = probe_media(video_path)
+                    trace.media_seconds = media_info["duration"]
+                except Exception as e:
+                    logger.warning(f"Probe failed: {e}")
+
+            # Already-acceptable H.264/AAC is remuxed instead of re-encoded
+            plan = plan_compression(media_info, resolution)
+            # Fit preset/CRF/threads to the time left in this invocation (no trial encode
+            # when remuxing; the table prediction is only needed to report the time saved)
+            encoder = choose_settings(
+                media_info, resolution, encode_budget(context),
+                input_path=video_path if plan["path"] == "transcode" else None,
+            )
+
+            if plan["path"] == "remux":
+                try:
+                    with trace.span("remux", video_stats["bytes"]):
+                        compressed_path, compressed_size, compress_duration = remux_video(video_path, recording_id)
+                    compress_mode = "remux"
+                    transcoded = False
+                except Exception as e:
+                    logger.warning(f"Remux failed, transcoding instead: {e}")
+                    plan.update(path="transcode", reason=f"remux failed: {e}")
+
+            segments = int(event.get("segments") or SEGMENTS)
+            if (compress_mode != "remux" and segments > 1 and media_info
+                    and (media_info["duration"] or 0) >= SEGMENT_MIN_DURATION):
+                # Keyframe-aligned segments encoded by parallel ffmpeg processes; outputs
+                # have the single-pass shape, the thumbnail is extracted afterwards
+                try:
+                    with trace.span("compress", video_stats["bytes"]):
+                        single_pass = compress_segmented(
+                            video_path, recording_id, media_info, segments, resolution=resolution,
+                            want_audio=audio_download is None, settings=encoder,
+                        )
+                    compressed_path, compressed_size = single_pass["video"]
+                    compress_duration = single_pass["duration"]
+                    compress_mode = "segmented"
+                    result["segments"] = single_pass["segments"]
+                except Exception as e:
+                    logger.warning(f"Segmented compression failed, falling back to one process: {e}")
+                    single_pass = None
+
+            if compress_mode == "separate" and SINGLE_PASS:
+                # One decode → MP4 + MP3 + thumbnail; fall back to separate passes on failure
+                try:
+                    with trace.span("compress", video_stats["bytes"]):
+                        single_pass = compress_single_pass(
+                            video_path, recording_id, resolution=resolution,
+                            want_audio=audio_download is None, media_info=media_info,
+                            settings=encoder,
+                        )
+                    compressed_path, compressed_size = single_pass["video"]
+                    compress_duration = single_pass["duration"]
+                    compress_mode = "single-pass"
+                except Exception as e:
+                    logger.warning(f"Single-pass compression failed, falling back to separate passes: {e}")
+                    single_pass = None
+            if compress_mode == "separate":
+                # The failed attempt used up part of the budget
+                encoder["timeout"] = int(encode_budget(context))
+                with trace.span("compress", video_stats["bytes"]):
+                    compressed_path, compressed_size, compress_duration = compress_video(
+                        video_path, recording_id, resolution=resolution, settings=encoder,
+                    )
+
+            # Predicted encode time minus the remux, when the remux replaced the encode
+            saved_seconds = None
+            if not transcoded and encoder["predicted_seconds"]:
+                saved_seconds = round(encoder["predicted_seconds"] - compress_duration, 1)
+
+            if compress_mode != "remux" and plan["copyable"] and compressed_size >= video_stats["bytes"]:
+                # The encode made it bigger: ship the original streams instead
+                logger.info(f"Transcode grew the video to {compressed_size:,} bytes, remuxing the source")
+                try:
+                    with trace.span("remux", video_stats["bytes"]):
+                        compressed_path, compressed_size, _ = remux_video(video_path, recording_id)
+                    plan.update(path="remux", reason="transcode did not shrink the file")
+                    compress_mode = "remux"
+                except Exception as e:
+                    logger.warning(f"Remux failed, keeping the transcode: {e}")
+
+            result["compress_path"] = {
+                **plan,
+                "seconds": round(compress_duration, 1),
+                "transcode_predicted_seconds": encoder["predicted_seconds"],
+                "saved_seconds": saved_seconds,
+            }
+        result["compress_mode"] = compress_mode
+        if transcoded:
+            result["encoder"] = {
+                key: encoder[key]
+                for key in ("preset", "crf", "threads", "budget_seconds", "predicted_seconds", "calibration")
+            }
+            result["encoder"]["actual_seconds"] = round(compress_duration, 1)
+        result["download"]["video"] = video_stats
+        original_size = video_stats["bytes"]
+        result["original_size_bytes"] = original_size
         result["compressed_size_bytes"] = compressed_size
         result["compression_duration_seconds"] = int(compress_duration)
         result["compression_ratio"] = round(compressed_size / original_size, 4) if original_size > 0 else 0
 
-        # 4. Upload compressed video to S3
-        video_size = upload_to_s3(
-            compressed_path,
-            event["s3_bucket"],
-            event["s3_video_key"],
-            content_type="video/mp4",
-        )
+        # 4-6. Upload video, audio and thumbnail concurrently (each multipart upload is itself
+        # parallel; the shared buffer pool in s3_upload bounds their combined memory)
+        thumbnail_s3_key = event["s3_video_key"].rsplit("/", 1)[0] + "/thumbnail.jpg"
 
-        # 5. Upload audio to S3
-        audio_size = 0
-        if audio_download:
-            # Use separately downloaded audio
-            audio_path, _ = audio_download
-            audio_size = upload_to_s3(
-                audio_path,
-                event["s3_bucket"],
-                event["s3_audio_key"],
-                content_type="audio/mpeg",
-            )
-        else:
-            # Extract audio from compressed video
-            extracted = extract_audio(compressed_path, recording_id)
-            if extracted:
+        def upload_video():
+            with trace.span("upload_video", compressed_size):
+                return upload_to_s3(
+                    compressed_path,
+                    event["s3_bucket"],
+                    event["s3_video_key"],
+                    content_type="video/mp4",
+                )
+
+        def upload_audio():
+            if audio_download:
+                # Use separately downloaded audio
+                audio_path, _ = audio_download
+            elif single_pass and single_pass["audio"]:
+                # Already extracted by the single-pass encode
+                audio_path, _ = single_pass["audio"]
+            else:
+                # Extract audio from compressed video
+                extracted = extract_audio(compressed_path, recording_id)
+                if not extracted:
+                    return None
                 audio_path, _ = extracted
-                audio_size = upload_to_s3(
+            with trace.span("upload_audio") as span:
+                stats = upload_to_s3(
                     audio_path,
                     event["s3_bucket"],
                     event["s3_audio_key"],
                     content_type="audio/mpeg",
                 )
+                span["bytes"] = stats["bytes"]
+            return stats
 
-        # 6. Extract and upload thumbnail
-        thumbnail_s3_key = event["s3_video_key"].rsplit("/", 1)[0] + "/thumbnail.jpg"
-        thumbnail_result = extract_thumbnail(compressed_path, recording_id)
-        thumbnail_size = 0
-        if thumbnail_result:
-            thumb_path, _ = thumbnail_result
-            thumbnail_size = upload_to_s3(
-                thumb_path,
-                event["s3_bucket"],
-                thumbnail_s3_key,
-                content_type="image/jpeg",
-            )
+        def upload_thumbnail():
+            if single_pass and single_pass["thumbnail"]:
+                thumbnail_result = single_pass["thumbnail"]
+            else:
+                thumbnail_result = extract_thumbnail(compressed_path, recording_id)
+            if not thumbnail_result:
+                return None
+            thumb_path, thumb_size = thumbnail_result
+            with trace.span("upload_thumbnail", thumb_size):
+                return upload_to_s3(
+                    thumb_path,
+                    event["s3_bucket"],
+                    thumbnail_s3_key,
+                    content_type="image/jpeg",
+                )
+
+        upload_start = time.time()
+        with ThreadPoolExecutor(max_workers=3, thread_name_prefix="upload") as pool:
+            video_future = pool.submit(upload_video)
+            audio_future = pool.submit(upload_audio)
+            thumbnail_future = pool.submit(upload_thumbnail)
+            video_upload = video_future.result()
+            audio_upload = audio_future.result()
+            thumbnail_upload = thumbnail_future.result()
+        trace.add("upload_wall", time.time() - upload_start)
+
+        video_size = video_upload["bytes"]
+        audio_size = audio_upload["bytes"] if audio_upload else 0
+        thumbnail_size = thumbnail_upload["bytes"] if thumbnail_upload else 0
+        result["upload"] = {
+            "video": video_upload,
+            "audio": audio_upload,
+            "thumbnail": thumbnail_upload,
+        }
 
         # Build S3 URLs
         region = event.get("aws_region", "eu-west-2")
@@ -137,35 +292,12 @@ def lambda_handler(event, context):
         # Always clean up temp files
         cleanup_temp_files(recording_id)
 
-        # Always send callback (success or failure)
-        _send_callback(event["callback_url"], event["callback_secret"], result)
+        # Always send callback (success or failure), with whatever stages completed
+        result["timings"] = trace.as_dict()
+        with trace.span("callback"):
+            result["callback"] = send_callback(event["callback_url"], event["callback_secret"], result)
+        metrics.observe_trace(trace, result["status"])
+        logger.info(f"Stage timings: {trace.summary()}")
 
     return result
 
-
-def _send_callback(callback_url: str, secret: str, payload: dict):
-    """Send callback to edge function with HMAC-SHA256 signature."""
-    body = json.dumps(payload)
-    signature = hmac.new(
-        secret.encode("utf-8"),
-        body.encode("utf-8"),
-        hashlib.sha256,
-    ).hexdigest()
-
-    headers = {
-        "Content-Type": "application/json",
-        "X-Callback-Signature": signature,
-    }
-
-    try:
-        response = requests.post(
-            callback_url,
-            data=body,
-            headers=headers,
-            timeout=30,
-        )
-        logger.info(f"Callback sent: {response.status_code}")
-        if response.status_code >= 400:
-            logger.error(f"Callback failed: {response.text[:500]}")
-    except Exception as e:
-        logger.error(f"Callback request failed: {e}")
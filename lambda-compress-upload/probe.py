@@ -0,0 +1,74 @@
+"""FFprobe media inspection (duration, streams, codecs, resolution, bitrate)."""
+
+import json
+import logging
+import subprocess
+
+logger = logging.getLogger(__name__)
+
+
+def probe_media(input_path: str) -> dict:
+    """
+    Inspect a media file with a single ffprobe call.
+
+    Returns dict with duration (seconds), bit_rate (bps), has_video, has_audio,
+    video_codec, width, height, fps, video_bit_rate, audio_codec, audio_bit_rate.
+    Missing values are None. Raises RuntimeError if ffprobe fails.
+    """
+    cmd = [
+        "ffprobe",
+        "-v", "error",
+        "-show_entries",
+        "format=duration,bit_rate:stream=codec_type,codec_name,width,height,bit_rate,avg_frame_rate",
+        "-of", "json",
+        input_path,
+    ]
+
+    result = subprocess.run(cmd, capture_output=True, text=True, timeout=60)
+    if result.returncode != 0:
+        raise RuntimeError(f"ffprobe failed with code {result.returncode}: {result.stderr[-500:]}")
+
+    data = json.loads(result.stdout or "{}")
+    fmt = data.get("format", {})
+    streams = data.get("streams", [])
+    video = next((s for s in streams if s.get("codec_type") == "video"), None)
+    audio = next((s for s in streams if s.get("codec_type") == "audio"), None)
+
+    info = {
+        "duration": _to_float(fmt.get("duration")),
+        "bit_rate": _to_int(fmt.get("bit_rate")),
+        "has_video": video is not None,
+        "has_audio": audio is not None,
+        "video_codec": video.get("codec_name") if video else None,
+        "width": _to_int(video.get("width")) if video else None,
+        "height": _to_int(video.get("height")) if video else None,
+        "fps": _parse_rate(video.get("avg_frame_rate")) if video else None,
+        "video_bit_rate": _to_int(video.get("bit_rate")) if video else None,
+        "audio_codec": audio.get("codec_name") if audio else None,
+        "audio_bit_rate": _to_int(audio.get("bit_rate")) if audio else None,
+    }
+    logger.info(f"Probed {input_path}: {info}")
+    return info
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _parse_rate(value):
+    """Parse an ffprobe rational like '30000/1001'."""
+    try:
+        num, _, den = str(value).partition("/")
+        return round(float(num) / float(den or 1), 3)
+    except (TypeError, ValueError, ZeroDivisionError):
+        return None
@@ -0,0 +1,296 @@
+"""Parallel ranged downloads from S3 or HTTP(S), to a file or streamed in order.
+
+Shared by lambda-transcribe and lambda-compress-upload. The canonical copy lives
+in lambda-shared/; run lambda-shared/sync.sh after editing it.
+
+- fetch_to_file(): S3 URLs go through boto3's managed transfer with a tuned
+  TransferConfig; other URLs (presigned / MeetingBaaS) are split into byte
+  ranges fetched on a thread pool and written in place with os.pwrite.
+- stream_to(): fetches ranges in parallel but writes them to a sink (e.g.
+  ffmpeg's stdin) strictly in order, with a bounded look-ahead window, so
+  processing starts while the tail is still downloading.
+- object_size() / fetch_ranges(): size of the object and parallel reads of
+  arbitrary byte ranges, for callers that only need parts of it.
+
+Each range is retried independently with exponential backoff. Both return a
+stats dict with bytes, seconds, MB/s, part count and retries.
+"""
+
+import logging
+import os
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+import requests
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
+
+logger = logging.getLogger(__name__)
+
+PART_SIZE = int(os.environ.get("DOWNLOAD_PART_SIZE_MB", "16")) * 1024 * 1024
+CONCURRENCY = int(os.environ.get("DOWNLOAD_CONCURRENCY", "8"))
+MAX_RETRIES = 4
+REQUEST_TIMEOUT = 60
+STREAM_BLOCK = 1024 * 1024  # serial fallback read size
+
+# Regex to parse S3 URLs: https://{bucket}.s3.{region}.amazonaws.com/{key}
+_S3_URL_RE = re.compile(
+    r"https?://(?P<bucket>[^.]+)\.s3[.-](?P<region>[^.]+)\.amazonaws\.com/(?P<key>[^?]+)$"
+)
+_CONTENT_RANGE_RE = re.compile(r"bytes \d+-\d+/(\d+)")
+
+_s3_client = None
+_session = None
+_client_lock = threading.Lock()
+
+
+def _get_s3():
+    """Process-wide S3 client with a connection pool sized for CONCURRENCY."""
+    global _s3_client
+    with _client_lock:
+        if _s3_client is None:
+            _s3_client = boto3.client(
+                "s3",
+                config=Config(
+                    max_pool_connections=max(10, CONCURRENCY * 2),
+                    retries={"max_attempts": 3, "mode": "adaptive"},
+                ),
+            )
+        return _s3_client
+
+
+def _get_session() -> requests.Session:
+    """Process-wide requests session with a pooled adapter."""
+    global _session
+    with _client_lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(
+                pool_connections=CONCURRENCY, pool_maxsize=CONCURRENCY * 2
+            )
+            _session.mount("https://", adapter)
+            _session.mount("http://", adapter)
+        return _session
+
+
+def parse_s3_url(url: str):
+    """Parse an S3 HTTPS URL into (bucket, key). Returns None if not a plain S3 URL."""
+    m = _S3_URL_RE.match(url)
+    if m:
+        return m.group("bucket"), m.group("key")
+    return None
+
+
+def _stats(total_bytes: int, seconds: float, parts: int, retries: int, mode: str) -> dict:
+    return {
+        "bytes": total_bytes,
+        "seconds": round(seconds, 2),
+        "mb_per_s": round(total_bytes / seconds / 1e6, 2) if seconds > 0 else 0.0,
+        "parts": parts,
+        "retries": retries,
+        "mode": mode,
+    }
+
+
+class _Source:
+    """Byte-range reader over an S3 object or an HTTP URL."""
+
+    def __init__(self, url: str):
+        self.url = url
+        self.s3 = parse_s3_url(url)
+        self.retries = 0
+        self._retry_lock = threading.Lock()
+
+    def probe(self):
+        """Return total size in bytes, or None if the server doesn't support ranges."""
+        if self.s3:
+            head = _get_s3().head_object(Bucket=self.s3[0], Key=self.s3[1])
+            return head["ContentLength"]
+        # Presigned URLs are signed for GET only, so probe with a 1-byte range GET.
+        # Streamed and closed unread: a server that ignores Range answers 200 with
+        # the whole object, which must not be downloaded just to learn that.
+        with _get_session().get(
+            self.url, headers={"Range": "bytes=0-0"}, timeout=REQUEST_TIMEOUT, stream=True
+        ) as response:
+            if response.status_code != 206:
+                return None
+            m = _CONTENT_RANGE_RE.match(response.headers.get("Content-Range", ""))
+            return int(m.group(1)) if m else None
+
+    def read_range(self, start: int, end: int) -> bytes:
+        """Fetch bytes [start, end] inclusive, retrying this range on failure."""
+        for attempt in range(MAX_RETRIES + 1):
+            try:
+                if self.s3:
+                    obj = _get_s3().get_object(
+                        Bucket=self.s3[0], Key=self.s3[1], Range=f"bytes={start}-{end}"
+                    )
+                    data = obj["Body"].read()
+                else:
+                    response = _get_session().get(
+                        self.url, headers={"Range": f"bytes={start}-{end}"}, timeout=REQUEST_TIMEOUT
+                    )
+                    response.raise_for_status()
+                    data = response.content
+                if len(data) != end - start + 1:
+                    raise IOError(f"Short read for bytes {start}-{end}: got {len(data)}")
+                return data
+            except Exception as e:
+                if attempt == MAX_RETRIES:
+                    raise
+                with self._retry_lock:
+                    self.retries += 1
+                delay = 0.5 * (2 ** attempt)
+                logger.warning(f"Range {start}-{end} failed ({e}), retry {attempt + 1} in {delay:.1f}s")
+                time.sleep(delay)
+
+
+def _ranges(size: int, part_size: int) -> list:
+    return [(start, min(start + part_size, size) - 1) for start in range(0, size, part_size)]
+
+
+def fetch_to_file(url: str, output_path: str, part_size: int = PART_SIZE,
+                  concurrency: int = CONCURRENCY) -> dict:
+    """
+    Download url to output_path using parallel byte ranges.
+
+    Returns:
+        Stats dict: bytes, seconds, mb_per_s, parts, retries, mode.
+    """
+    start_time = time.time()
+    source = _Source(url)
+
+    if source.s3:
+        bucket, key = source.s3
+        logger.info(f"Downloading s3://{bucket}/{key} to {output_path}")
+        config = TransferConfig(
+            multipart_threshold=part_size,
+            multipart_chunksize=part_size,
+            max_concurrency=concurrency,
+            use_threads=True,
+        )
+        _get_s3().download_file(bucket, key, output_path, Config=config)
+        size = os.path.getsize(output_path)
+        stats = _stats(size, time.time() - start_time, -(-size // part_size), 0, "s3-transfer")
+    else:
+        size = source.probe()
+        if size is None or size <= part_size:
+            logger.info(f"Downloading via HTTP to {output_path} (single stream)")
+            with open(output_path, "wb") as f:
+                stats = _serial_copy(url, f, start_time)
+        else:
+            ranges = _ranges(size, part_size)
+            logger.info(f"Downloading {size:,} bytes via HTTP in {len(ranges)} ranges x {concurrency} threads")
+            fd = os.open(output_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+            try:
+                os.ftruncate(fd, size)
+
+                def fetch(byte_range):
+                    data = source.read_range(*byte_range)
+                    os.pwrite(fd, data, byte_range[0])
+
+                with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="range") as pool:
+                    list(pool.map(fetch, ranges))
+            finally:
+                os.close(fd)
+            stats = _stats(size, time.time() - start_time, len(ranges), source.retries, "http-ranged")
+
+    logger.info(
+        f"Downloaded {stats['bytes']:,} bytes in {stats['seconds']}s "
+        f"({stats['mb_per_s']} MB/s, {stats['parts']} parts, {stats['retries']} retries)"
+    )
+    return stats
+
+
+def stream_to(url: str, sink, part_size: int = PART_SIZE, concurrency: int = CONCURRENCY) -> dict:
+    """
+    Stream url into a writable binary sink in order while fetching ranges in parallel.
+
+    At most 2 x concurrency parts are buffered, so memory stays bounded. A
+    BrokenPipeError from the sink (consumer exited early) stops the download.
+
+    Returns:
+        Stats dict: bytes, seconds, mb_per_s, parts, retries, mode.
+    """
+    start_time = time.time()
+    source = _Source(url)
+    size = source.probe()
+
+    if size is None or size <= part_size:
+        stats = _serial_copy(url, sink, start_time)
+    else:
+        ranges = _ranges(size, part_size)
+        window = concurrency * 2
+        written = 0
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="range") as pool:
+            pending = deque()
+            next_range = 0
+            try:
+                while pending or next_range < len(ranges):
+                    while next_range < len(ranges) and len(pending) < window:
+                        pending.append(pool.submit(source.read_range, *ranges[next_range]))
+                        next_range += 1
+                    data = pending.popleft().result()
+                    sink.write(data)
+                    written += len(data)
+            except BrokenPipeError:
+                logger.warning(f"Sink closed after {written:,} bytes, stopping download")
+            finally:
+                for future in pending:
+                    future.cancel()
+        stats = _stats(written, time.time() - start_time, len(ranges), source.retries, "stream-ranged")
+
+    logger.info(f"Streamed {stats['bytes']:,} bytes in {stats['seconds']}s ({stats['mb_per_s']} MB/s)")
+    return stats
+
+
+def object_size(url: str):
+    """Size in bytes of the object at url, or None if the server doesn't support ranges."""
+    return _Source(url).probe()
+
+
+def fetch_ranges(url: str, ranges: list, write, concurrency: int = CONCURRENCY) -> dict:
+    """
+    Fetch inclusive (start, end) byte ranges in parallel, calling write(start, data) for each.
+
+    write is called from the pool threads (os.pwrite into a shared fd is safe).
+
+    Returns:
+        Stats dict: bytes, seconds, mb_per_s, parts, retries, mode.
+    """
+    start_time = time.time()
+    source = _Source(url)
+
+    def fetch(byte_range):
+        data = source.read_range(*byte_range)
+        write(byte_range[0], data)
+        return len(data)
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="range") as pool:
+        total_bytes = sum(pool.map(fetch, ranges))
+    return _stats(total_bytes, time.time() - start_time, len(ranges), source.retries, "ranges")
+
+
+def _serial_copy(url: str, sink, start_time: float) -> dict:
+    """Single-connection fallback for small objects or servers without range support."""
+    source = _Source(url)
+    total_bytes = 0
+    if source.s3:
+        body = _get_s3().get_object(Bucket=source.s3[0], Key=source.s3[1])["Body"]
+        chunks = iter(lambda: body.read(STREAM_BLOCK), b"")
+    else:
+        response = _get_session().get(url, stream=True, timeout=600)
+        response.raise_for_status()
+        chunks = response.iter_content(chunk_size=STREAM_BLOCK)
+    try:
+        for chunk in chunks:
+            if chunk:
+                sink.write(chunk)
+                total_bytes += len(chunk)
+    except BrokenPipeError:
+        logger.warning(f"Sink closed after {total_bytes:,} bytes, stopping download")
+    return _stats(total_bytes, time.time() - start_time, 1, 0, "serial")
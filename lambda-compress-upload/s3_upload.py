@@ -1,13 +1,84 @@
-"""Multipart S3 upload with progress tracking."""
+"""Concurrent multipart S3 upload with bounded memory and progress tracking."""
 
 import os
 import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 import boto3
 from botocore.config import Config
 
 logger = logging.getLogger(__name__)
 
-PART_SIZE = 8 * 1024 * 1024  # 8MB parts (above 5MB minimum)
+MIN_PART_SIZE = 8 * 1024 * 1024  # 8MB parts (above 5MB minimum)
+MAX_PARTS = 10000                # S3 hard limit per upload
+PART_COUNT_TARGET = 9000         # leave headroom under MAX_PARTS
+CONCURRENCY = int(os.environ.get("UPLOAD_CONCURRENCY", "8"))
+MEMORY_BUDGET = int(os.environ.get("UPLOAD_MEMORY_MB", "256")) * 1024 * 1024
+PART_RETRIES = 3
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def _get_client():
+    """Shared S3 client (thread-safe), reused across files and warm invocations."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = boto3.client(
+                "s3",
+                config=Config(
+                    retries={"max_attempts": 3, "mode": "adaptive"},
+                    max_pool_connections=max(10, CONCURRENCY * 3),
+                ),
+            )
+        return _client
+
+
+class _BufferPool:
+    """
+    Reusable part buffers with a cap on total bytes in flight.
+
+    acquire() blocks while the budget is exhausted, so concurrent uploads
+    (video, audio, thumbnail) together never hold more than MEMORY_BUDGET
+    in part buffers. A single part larger than the budget is still allowed
+    when nothing else is in flight, so progress is always possible.
+    """
+
+    def __init__(self, budget_bytes: int):
+        self._budget = budget_bytes
+        self._in_use = 0
+        self._free = {}  # size -> [bytearray]
+        self._cond = threading.Condition()
+
+    def acquire(self, size: int) -> bytearray:
+        with self._cond:
+            while self._in_use and self._in_use + size > self._budget:
+                self._cond.wait()
+            self._in_use += size
+            free = self._free.get(size)
+            return free.pop() if free else bytearray(size)
+
+    def release(self, buf: bytearray):
+        with self._cond:
+            self._in_use -= len(buf)
+            free = self._free.setdefault(len(buf), [])
+            # Only keep as many idle buffers as could be in flight at once
+            if (len(free) + 1) * len(buf) <= self._budget:
+                free.append(buf)
+            self._cond.notify_all()
+
+
+_buffers = _BufferPool(MEMORY_BUDGET)
+
+
+def part_size_for(file_size: int) -> int:
+    """Smallest MB-aligned part size >= 8MB that keeps the upload under ~9,000 parts."""
+    size = max(MIN_PART_SIZE, -(-file_size // PART_COUNT_TARGET))
+    mb = 1024 * 1024
+    return -(-size // mb) * mb
 
 
 def upload_to_s3(
@@ -15,24 +86,27 @@ def upload_to_s3(
     bucket: str,
     key: str,
     content_type: str = "video/mp4",
-) -> int:
+) -> dict:
     """
-    Upload file to S3 using multipart upload.
-    Returns the file size in bytes.
+    Upload file to S3, using concurrent multipart upload for large files.
+
+    Returns:
+        Stats dict: bytes, seconds, mb_per_s, parts, part_size, retries.
     """
     file_size = os.path.getsize(file_path)
     logger.info(f"Uploading {file_path} ({file_size:,} bytes) to s3://{bucket}/{key}")
 
-    s3_client = boto3.client(
-        "s3",
-        config=Config(
-            retries={"max_attempts": 3, "mode": "adaptive"},
-        ),
-    )
+    s3_client = _get_client()
+    start_time = time.time()
+    part_size = part_size_for(file_size)
+    parts = 1
+    retries = 0
 
     # Use multipart for files > 8MB, simple put otherwise
-    if file_size > PART_SIZE:
-        _multipart_upload(s3_client, file_path, bucket, key, content_type, file_size)
+    if file_size > MIN_PART_SIZE:
+        parts, retries = _multipart_upload(
+            s3_client, file_path, bucket, key, content_type, file_size, part_size
+        )
     else:
         with open(file_path, "rb") as f:
             s3_client.put_object(
@@ -42,8 +116,20 @@ def upload_to_s3(
                 ContentType=content_type,
             )
 
-    logger.info(f"Upload complete: s3://{bucket}/{key}")
-    return file_size
+    seconds = time.time() - start_time
+    stats = {
+        "bytes": file_size,
+        "seconds": round(seconds, 2),
+        "mb_per_s": round(file_size / seconds / 1e6, 2) if seconds > 0 else 0.0,
+        "parts": parts,
+        "part_size": part_size if parts > 1 else file_size,
+        "retries": retries,
+    }
+    logger.info(
+        f"Upload complete: s3://{bucket}/{key} in {stats['seconds']}s "
+        f"({stats['mb_per_s']} MB/s, {parts} parts, {retries} retries)"
+    )
+    return stats
 
 
 def _multipart_upload(
@@ -53,8 +139,15 @@ def _multipart_upload(
     key: str,
     content_type: str,
     file_size: int,
-):
-    """Perform multipart upload with progress logging."""
+    part_size: int,
+) -> tuple[int, int]:
+    """
+    Upload parts concurrently from pooled buffers. Returns (part_count, retries).
+    """
+    part_count = -(-file_size // part_size)
+    if part_count > MAX_PARTS:
+        raise ValueError(f"{file_size:,} bytes needs {part_count} parts (limit {MAX_PARTS})")
+
     mpu = s3_client.create_multipart_upload(
         Bucket=bucket,
         Key=key,
@@ -62,36 +155,55 @@ def _multipart_upload(
     )
     upload_id = mpu["UploadId"]
 
-    parts = []
-    part_number = 1
-    uploaded_bytes = 0
-
-    try:
-        with open(file_path, "rb") as f:
-            while True:
-                data = f.read(PART_SIZE)
-                if not data:
+    lock = threading.Lock()
+    progress = {"bytes": 0, "retries": 0, "logged_pct": 0}
+    fd = os.open(file_path, os.O_RDONLY)
+
+    def upload_part(part_number: int) -> dict:
+        offset = (part_number - 1) * part_size
+        length = min(part_size, file_size - offset)
+        buf = _buffers.acquire(part_size)
+        try:
+            view = memoryview(buf)[:length]
+            read = os.preadv(fd, [view], offset)
+            if read != length:
+                raise IOError(f"Short read for part {part_number}: {read}/{length} bytes")
+            # Full parts go out straight from the pooled buffer; only the last part is copied
+            body = buf if length == part_size else bytes(view)
+
+            for attempt in range(PART_RETRIES + 1):
+                try:
+                    response = s3_client.upload_part(
+                        Bucket=bucket,
+                        Key=key,
+                        PartNumber=part_number,
+                        UploadId=upload_id,
+                        Body=body,
+                    )
                     break
+                except Exception as e:
+                    if attempt == PART_RETRIES:
+                        raise
+                    with lock:
+                        progress["retries"] += 1
+                    delay = 0.5 * (2 ** attempt)
+                    logger.warning(f"Part {part_number} failed ({e}), retry {attempt + 1} in {delay:.1f}s")
+                    time.sleep(delay)
+        finally:
+            _buffers.release(buf)
+
+        with lock:
+            progress["bytes"] += length
+            pct = int(progress["bytes"] / file_size * 100)
+            if pct >= progress["logged_pct"] + 10 or progress["bytes"] == file_size:
+                progress["logged_pct"] = pct
+                logger.info(f"Uploaded {progress['bytes']:,}/{file_size:,} bytes ({pct}%)")
+
+        return {"PartNumber": part_number, "ETag": response["ETag"]}
 
-                response = s3_client.upload_part(
-                    Bucket=bucket,
-                    Key=key,
-                    PartNumber=part_number,
-                    UploadId=upload_id,
-                    Body=data,
-                )
-
-                parts.append({
-                    "PartNumber": part_number,
-                    "ETag": response["ETag"],
-                })
-
-                uploaded_bytes += len(data)
-                progress = (uploaded_bytes / file_size) * 100
-                logger.info(
-                    f"Part {part_number}: {uploaded_bytes:,}/{file_size:,} bytes ({progress:.0f}%)"
-                )
-                part_number += 1
+    try:
+        with ThreadPoolExecutor(max_workers=CONCURRENCY, thread_name_prefix="part") as pool:
+            parts = list(pool.map(upload_part, range(1, part_count + 1)))
 
         s3_client.complete_multipart_upload(
             Bucket=bucket,
@@ -108,3 +220,8 @@ def _multipart_upload(
             UploadId=upload_id,
         )
         raise
+
+    finally:
+        os.close(fd)
+
+    return part_count, progress["retries"]
@@ -0,0 +1,223 @@
+"""GOP-segmented parallel H.264 encoding for long recordings.
+
+One ffmpeg process scales poorly past a few cores at 480p, so the source is
+split at keyframes into N segments that are encoded by N concurrent ffmpeg
+processes (each with its share of the threads). Every segment starts on a
+source keyframe, so segments are cut without decoding across a boundary and
+each frame lands in exactly one segment. Audio is encoded once over the whole
+file alongside the segments (per-segment AAC would add encoder priming gaps at
+every boundary). The video segments are then joined with the concat demuxer
+and muxed with the audio, all stream copy.
+"""
+
+import logging
+import os
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# Segments per recording (0/1 = off); the event's "segments" field overrides
+SEGMENTS = int(os.environ.get("COMPRESS_SEGMENTS", "0"))
+SEGMENT_MIN_DURATION = int(os.environ.get("COMPRESS_SEGMENT_MIN_SECONDS", "300"))
+MIN_SEGMENT_SECONDS = 30
+TRACK_TIMESCALE = 90000  # shared by all segments so the concat keeps exact timestamps
+
+
+def keyframe_times(input_path: str) -> list[float]:
+    """Presentation times of the video keyframes, read from packet flags (no decode)."""
+    cmd = [
+        "ffprobe",
+        "-v", "error",
+        "-select_streams", "v:0",
+        "-show_entries", "packet=pts_time,flags",
+        "-of", "csv=p=0",
+        input_path,
+    ]
+    result = subprocess.run(cmd, capture_output=True, text=True, timeout=120)
+    if result.returncode != 0:
+        raise RuntimeError(f"ffprobe failed with code {result.returncode}: {result.stderr[-500:]}")
+
+    times = []
+    for line in result.stdout.splitlines():
+        pts, _, flags = line.partition(",")
+        if "K" in flags:
+            try:
+                times.append(float(pts))
+            except ValueError:
+                continue
+    return sorted(times)
+
+
+def split_points(keyframes: list[float], duration: float, segments: int) -> list[float]:
+    """
+    Segment start times: the keyframe nearest each 1/N of the duration.
+
+    The first segment always starts at 0; segments shorter than
+    MIN_SEGMENT_SECONDS are merged into their neighbour.
+    """
+    starts = [0.0]
+    for i in range(1, segments):
+        target = duration * i / segments
+        nearest = min(keyframes, key=lambda t: abs(t - target), default=None)
+        if nearest is None:
+            break
+        if nearest - starts[-1] >= MIN_SEGMENT_SECONDS and duration - nearest >= MIN_SEGMENT_SECONDS:
+            starts.append(nearest)
+    return starts
+
+
+def _run(cmd: list, timeout: float):
+    result = subprocess.run(cmd, capture_output=True, text=True, timeout=timeout)
+    if result.returncode != 0:
+        logger.error(f"FFmpeg stderr: {result.stderr[-2000:]}")
+        raise RuntimeError(f"FFmpeg failed with code {result.returncode}: {result.stderr[-500:]}")
+
+
+def _encode_segment(input_path: str, output_path: str, start: float, length: float | None,
+                    resolution: int, settings: dict, threads: int, timeout: float) -> float:
+    cmd = ["ffmpeg", "-nostdin", "-ss", f"{start:.6f}", "-i", input_path]
+    if length is not None:
+        cmd += ["-t", f"{length:.6f}"]
+    cmd += [
+        "-map", "0:v:0",
+        "-vf", f"scale=-2:{resolution}",
+        "-c:v", "libx264",
+        "-crf", str(settings["crf"]),
+        "-preset", settings["preset"],
+        "-threads", str(threads),
+        "-an",
+        "-video_track_timescale", str(TRACK_TIMESCALE),
+        "-y", output_path,
+    ]
+    start_time = time.time()
+    _run(cmd, timeout)
+    return time.time() - start_time
+
+
+def _encode_audio(input_path: str, aac_path: str, mp3_path: str | None, timeout: float) -> float:
+    cmd = [
+        "ffmpeg", "-nostdin",
+        "-i", input_path,
+        "-map", "0:a:0",
+        "-c:a", "aac",
+        "-b:a", "128k",
+        "-y", aac_path,
+    ]
+    if mp3_path:
+        cmd += [
+            "-map", "0:a:0",
+            "-c:a", "libmp3lame",
+            "-b:a", "128k",
+            "-y", mp3_path,
+        ]
+    start_time = time.time()
+    _run(cmd, timeout)
+    return time.time() - start_time
+
+
+def compress_segmented(
+    input_path: str,
+    recording_id: str,
+    media_info: dict,
+    segments: int,
+    resolution: int = 480,
+    want_audio: bool = True,
+    settings: dict | None = None,
+) -> dict:
+    """
+    Encode the video as `segments` keyframe-aligned parts in parallel and join them.
+
+    Args:
+        media_info: Result of probe.probe_media(input_path).
+        segments: Requested number of parallel segments (fewer if the source has
+            too few keyframes or is too short).
+        want_audio: Also write the MP3 (skip when audio was downloaded separately).
+        settings: preset, crf, threads and timeout from encoder_settings.choose_settings.
+
+    Returns:
+        Same shape as compress.compress_single_pass() ('video', 'audio',
+        'thumbnail' (always None), 'duration') plus 'segments': count,
+        split times and per-segment encode seconds.
+        Raises RuntimeError on failure so callers can fall back to a single process.
+    """
+    from compress import DEFAULT_SETTINGS
+
+    settings = settings or DEFAULT_SETTINGS
+    if not media_info.get("has_video") or not media_info.get("duration"):
+        raise RuntimeError("Segmented encode needs a probed video stream")
+
+    start_time = time.time()
+    keyframes = keyframe_times(input_path)
+    starts = split_points(keyframes, media_info["duration"], segments)
+    if len(starts) < 2:
+        raise RuntimeError(f"Only {len(keyframes)} keyframes in {media_info['duration']:.0f}s, nothing to split")
+
+    # Cut half a frame before each keyframe: rounding in the printed pts can then
+    # never drop the keyframe or repeat the frame before it
+    half_frame = 0.5 / (media_info.get("fps") or 25.0)
+    cuts = [0.0] + [t - half_frame for t in starts[1:]]
+    threads = max(1, (settings["threads"] or os.cpu_count() or 1) // len(cuts))
+
+    video_path = f"/tmp/{recording_id}_compressed.mp4"
+    aac_path = f"/tmp/{recording_id}_segment_audio.m4a"
+    mp3_path = f"/tmp/{recording_id}_compressed_audio.mp3"
+    list_path = f"/tmp/{recording_id}_segments.txt"
+    segment_paths = [f"/tmp/{recording_id}_segment_{i:03d}.mp4" for i in range(len(cuts))]
+    write_mp3 = want_audio and media_info.get("has_audio")
+    timeout = settings["timeout"]
+
+    logger.info(
+        f"Segmented encode: {len(cuts)} segments at {[round(t, 2) for t in starts]}, "
+        f"{threads} threads each, preset {settings['preset']}"
+    )
+    with ThreadPoolExecutor(max_workers=len(cuts) + 1, thread_name_prefix="segment") as pool:
+        audio_future = None
+        if media_info.get("has_audio"):
+            audio_future = pool.submit(_encode_audio, input_path, aac_path, mp3_path if write_mp3 else None, timeout)
+        segment_futures = [
+            pool.submit(
+                _encode_segment, input_path, segment_paths[i], cut,
+                cuts[i + 1] - cut if i + 1 < len(cuts) else None,
+                resolution, settings, threads, timeout,
+            )
+            for i, cut in enumerate(cuts)
+        ]
+        segment_seconds = [future.result() for future in segment_futures]
+        audio_seconds = audio_future.result() if audio_future else 0.0
+
+    with open(list_path, "w") as f:
+        for path in segment_paths:
+            f.write(f"file '{path}'\n")
+
+    cmd = ["ffmpeg", "-nostdin", "-f", "concat", "-safe", "0", "-i", list_path]
+    if audio_future:
+        cmd += ["-i", aac_path, "-map", "0:v:0", "-map", "1:a:0"]
+    cmd += ["-c", "copy", "-movflags", "+faststart", "-y", video_path]
+    concat_start = time.time()
+    _run(cmd, timeout)
+    concat_seconds = time.time() - concat_start
+
+    for path in segment_paths + [list_path, aac_path]:
+        if os.path.exists(path):
+            os.remove(path)
+
+    duration = time.time() - start_time
+    outputs = {"video": (video_path, os.path.getsize(video_path)), "audio": None, "thumbnail": None}
+    if write_mp3 and os.path.exists(mp3_path) and os.path.getsize(mp3_path) > 0:
+        outputs["audio"] = (mp3_path, os.path.getsize(mp3_path))
+    outputs["duration"] = duration
+    outputs["segments"] = {
+        "count": len(cuts),
+        "starts": [round(t, 3) for t in starts],
+        "threads_each": threads,
+        "segment_seconds": [round(s, 1) for s in segment_seconds],
+        "audio_seconds": round(audio_seconds, 1),
+        "concat_seconds": round(concat_seconds, 1),
+    }
+    logger.info(
+        f"Segmented encode complete in {duration:.1f}s: video {outputs['video'][1]:,} bytes, "
+        f"slowest segment {max(segment_seconds):.1f}s, concat {concat_seconds:.1f}s"
+    )
+    return outputs
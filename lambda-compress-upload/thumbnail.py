@@ -6,6 +6,19 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+# Preferred capture points in seconds, latest first (skips intros / blank frames)
+SEEK_TIMES = [30, 5, 1]
+
+
+def pick_thumbnail_time(duration: float | None) -> float:
+    """Latest preferred capture point that falls inside the video (0 if very short)."""
+    if duration is None:
+        return SEEK_TIMES[-1]
+    for seek_time in SEEK_TIMES:
+        if seek_time < duration:
+            return seek_time
+    return 0
+
 
 def extract_thumbnail(input_path: str, recording_id: str) -> tuple[str, int] | None:
     """
@@ -16,10 +29,10 @@ def extract_thumbnail(input_path: str, recording_id: str) -> tuple[str, int] | N
     output_path = f"/tmp/{recording_id}_thumbnail.jpg"
 
     # Try 30s first, fall back to 5s if video is shorter
-    for seek_time in ["30", "5", "1"]:
+    for seek_time in SEEK_TIMES:
         cmd = [
             "ffmpeg",
-            "-ss", seek_time,
+            "-ss", str(seek_time),
             "-i", input_path,
             "-vframes", "1",
             "-q:v", "2",
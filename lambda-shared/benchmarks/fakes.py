@@ -0,0 +1,113 @@
+"""Local stand-ins for S3 and the callback edge function, so stages run offline.
+
+LocalS3 implements the boto3 S3 client calls the lambdas make, storing
+objects under a directory. CallbackSink is an HTTP server on 127.0.0.1 that
+verifies callback signatures the way the edge functions do.
+"""
+
+import gzip
+import hashlib
+import hmac
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class LocalS3:
+    """Directory-backed subset of the boto3 S3 client."""
+
+    class exceptions:
+        class NoSuchKey(Exception):
+            pass
+
+    def __init__(self, root: str):
+        self.root = root
+        self._uploads = {}
+        self._lock = threading.Lock()
+
+    def _path(self, bucket: str, key: str) -> str:
+        path = os.path.join(self.root, bucket, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return path
+
+    def put_object(self, Bucket, Key, Body, **kwargs):
+        data = Body.read() if hasattr(Body, "read") else bytes(Body)
+        with open(self._path(Bucket, Key), "wb") as f:
+            f.write(data)
+        return {"ETag": f'"{hashlib.md5(data).hexdigest()}"'}
+
+    def get_object(self, Bucket, Key, **kwargs):
+        path = self._path(Bucket, Key)
+        if not os.path.exists(path):
+            raise self.exceptions.NoSuchKey(Key)
+        return {"Body": open(path, "rb"), "ContentLength": os.path.getsize(path)}
+
+    def download_file(self, Bucket, Key, Filename, **kwargs):
+        shutil.copyfile(self._path(Bucket, Key), Filename)
+
+    def create_multipart_upload(self, Bucket, Key, **kwargs):
+        upload_id = uuid.uuid4().hex
+        with self._lock:
+            self._uploads[upload_id] = {}
+        return {"UploadId": upload_id}
+
+    def upload_part(self, Bucket, Key, PartNumber, UploadId, Body, **kwargs):
+        data = bytes(Body)
+        with self._lock:
+            self._uploads[UploadId][PartNumber] = data
+        return {"ETag": f'"{hashlib.md5(data).hexdigest()}"'}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload, **kwargs):
+        with self._lock:
+            parts = self._uploads.pop(UploadId)
+        with open(self._path(Bucket, Key), "wb") as f:
+            for part in MultipartUpload["Parts"]:
+                f.write(parts[part["PartNumber"]])
+        return {}
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId, **kwargs):
+        with self._lock:
+            self._uploads.pop(UploadId, None)
+        return {}
+
+    def generate_presigned_url(self, operation, Params, ExpiresIn=3600):
+        return f"file://{self._path(Params['Bucket'], Params['Key'])}"
+
+
+class CallbackSink:
+    """Local callback endpoint: checks X-Callback-Signature and records each delivery (status, arrival time)."""
+
+    def __init__(self, secret: str):
+        self.secret = secret
+        self.received = []
+        sink = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                raw = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                body = gzip.decompress(raw) if self.headers.get("Content-Encoding") == "gzip" else raw
+                expected = hmac.new(sink.secret.encode("utf-8"), body, hashlib.sha256).hexdigest()
+                valid = hmac.compare_digest(expected, self.headers.get("X-Callback-Signature", ""))
+                try:
+                    status = json.loads(body).get("status")
+                except ValueError:
+                    status = None
+                sink.received.append({"bytes": len(raw), "valid": valid, "status": status, "at": time.time()})
+                self.send_response(200 if valid else 401)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self._server.server_port}/callback"
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
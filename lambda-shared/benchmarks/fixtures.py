@@ -0,0 +1,143 @@
+"""Deterministic synthetic media and transcript fixtures for the pipeline benchmarks.
+
+Media is generated with ffmpeg's lavfi sources only (no network, no sample
+files): a testsrc2 video and an "N speaker" audio track in which each speaker
+is a distinct tone, taking 3s turns separated by short silences. Files are
+cached in the fixture directory, keyed by their parameters.
+"""
+
+import os
+import random
+import subprocess
+from dataclasses import asdict, dataclass
+
+TURN_SECONDS = 3.0
+GAP_SECONDS = 0.4
+
+
+@dataclass(frozen=True)
+class Fixture:
+    duration: int    # seconds
+    height: int      # video height (width is 16:9)
+    speakers: int
+
+    @property
+    def id(self) -> str:
+        return f"{self.duration}s-{self.height}p-{self.speakers}spk"
+
+    def as_dict(self) -> dict:
+        return {**asdict(self), "id": self.id}
+
+
+# Fixture matrix per suite size
+MATRIX = {
+    "quick": [Fixture(30, 360, 2)],
+    "full": [Fixture(d, h, s) for d in (60, 300) for h in (360, 720) for s in (2, 6)],
+}
+
+
+def _audio_expr(speakers: int) -> str:
+    """Tone per speaker (200Hz, 300Hz, ...), switching every TURN_SECONDS with a gap."""
+    turn = f"mod(floor(t/{TURN_SECONDS}),{speakers})"
+    gate = f"gt(mod(t,{TURN_SECONDS}),{GAP_SECONDS})"
+    return f"0.3*sin(2*PI*(200+100*{turn})*t)*{gate}"
+
+
+def _ffmpeg(args: list):
+    cmd = ["ffmpeg", "-nostdin", "-y", "-loglevel", "error"] + args
+    result = subprocess.run(cmd, capture_output=True, text=True, timeout=1800)
+    if result.returncode != 0:
+        raise RuntimeError(f"Fixture generation failed: {result.stderr[-500:]}")
+
+
+def video_fixture(fixture: Fixture, directory: str) -> str:
+    """H.264/AAC +faststart MP4 (the shape MeetingBaaS delivers)."""
+    path = os.path.join(directory, f"video-{fixture.id}.mp4")
+    if os.path.exists(path):
+        return path
+    os.makedirs(directory, exist_ok=True)
+    width = fixture.height * 16 // 9 // 2 * 2
+    tmp_path = f"{path}.tmp.mp4"
+    _ffmpeg([
+        "-f", "lavfi", "-i", f"testsrc2=size={width}x{fixture.height}:rate=25:duration={fixture.duration}",
+        "-f", "lavfi", "-i", f"aevalsrc='{_audio_expr(fixture.speakers)}':s=48000:d={fixture.duration}",
+        "-c:v", "libx264", "-preset", "veryfast", "-crf", "23", "-pix_fmt", "yuv420p",
+        "-c:a", "aac", "-b:a", "128k",
+        "-movflags", "+faststart",
+        tmp_path,
+    ])
+    os.replace(tmp_path, path)
+    return path
+
+
+def audio_fixture(fixture: Fixture, directory: str) -> str:
+    """MP3 of the same speaker track (the separate audio_url case)."""
+    path = os.path.join(directory, f"audio-{fixture.duration}s-{fixture.speakers}spk.mp3")
+    if os.path.exists(path):
+        return path
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp.mp3"
+    _ffmpeg([
+        "-f", "lavfi", "-i", f"aevalsrc='{_audio_expr(fixture.speakers)}':s=44100:d={fixture.duration}",
+        "-c:a", "libmp3lame", "-b:a", "128k",
+        tmp_path,
+    ])
+    os.replace(tmp_path, path)
+    return path
+
+
+VOCAB = ["the", "we", "should", "pipeline", "next", "quarter", "deal", "pricing", "call",
+         "follow", "up", "on", "that", "customer", "renewal", "I", "think", "so", "yeah", "okay"]
+
+
+def speaker_turns(fixture: Fixture) -> list:
+    """Diarization turns matching the fixture's audio: (start, end, label)."""
+    turns = []
+    t = 0.0
+    i = 0
+    while t < fixture.duration:
+        start = t + GAP_SECONDS
+        end = min(t + TURN_SECONDS, fixture.duration)
+        if end > start:
+            turns.append((start, end, f"SPEAKER_{i % fixture.speakers:02d}"))
+        t += TURN_SECONDS
+        i += 1
+    return turns
+
+
+def whisper_segments(fixture: Fixture, seed: int = 0) -> list:
+    """Whisper-shaped segments (~2.5 words/s) covering the fixture's duration."""
+    rng = random.Random(seed)
+    segments = []
+    t = 0.0
+    while t < fixture.duration - 1:
+        n_words = rng.randint(4, 20)
+        words = []
+        for _ in range(n_words):
+            length = rng.uniform(0.15, 0.5)
+            words.append({
+                "word": " " + rng.choice(VOCAB),
+                "start": t,
+                "end": t + length,
+                "probability": rng.uniform(0.5, 1.0),
+            })
+            t += length + rng.uniform(0.0, 0.1)
+        segments.append({
+            "id": len(segments),
+            "start": words[0]["start"],
+            "end": words[-1]["end"],
+            "text": "".join(w["word"] for w in words),
+            "words": words,
+        })
+        t += rng.uniform(0.2, 1.0)
+    return segments
+
+
+def speaker_audio(fixture: Fixture, sample_rate: int = 16000):
+    """The fixture's speaker track as 16kHz float32 samples, generated without ffmpeg."""
+    import numpy as np
+
+    t = np.arange(int(fixture.duration * sample_rate), dtype=np.float64) / sample_rate
+    turn = np.floor(t / TURN_SECONDS) % fixture.speakers
+    gate = (t % TURN_SECONDS) > GAP_SECONDS
+    return (0.3 * np.sin(2 * np.pi * (200 + 100 * turn) * t) * gate).astype(np.float32)
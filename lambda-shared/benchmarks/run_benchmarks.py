@@ -0,0 +1,356 @@
+"""Offline stage-level benchmarks for both lambdas, with a regression gate.
+
+Every stage runs in its own subprocess against deterministic fixtures (see
+fixtures.py), with S3 replaced by a local directory and callbacks sent to a
+local signature-checking sink, so the suite needs no network, credentials or
+GPU. Model inference (Whisper, pyannote) is left out: it needs downloaded
+weights — use lambda-transcribe/benchmarks/bench_backends.py for that.
+
+Each stage is repeated; the median wall and CPU time (including ffmpeg child
+processes) and the peak RSS are compared with a JSON baseline. The run fails
+(exit 1) when a stage is slower or larger than the baseline by more than
+--threshold.
+
+Usage:
+    python lambda-shared/benchmarks/run_benchmarks.py [--suite quick|full] [--stages ...]
+        [--repeat 3] [--baseline baseline.json] [--update-baseline] [--threshold 0.25]
+"""
+
+import argparse
+import glob
+import json
+import os
+import platform
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(os.path.dirname(HERE))
+sys.path.insert(0, HERE)
+
+from fixtures import (  # noqa: E402
+    MATRIX, Fixture, audio_fixture, speaker_audio, speaker_turns, video_fixture, whisper_segments,
+)
+
+DEFAULT_FIXTURE_DIR = os.path.join(tempfile.gettempdir(), "use60-bench-fixtures")
+DEFAULT_BASELINE = os.path.join(HERE, "baseline.json")
+MIN_DELTA_SECONDS = 0.05      # ignore regressions smaller than this (timer noise)
+MIN_DELTA_RSS_MB = 32
+CALLBACK_SECRET = "bench-secret"
+
+
+# --- Stages -----------------------------------------------------------------
+# Each stage: setup(fixture, fixture_dir, work_dir) -> ctx (untimed), run(ctx) (timed).
+
+
+def _setup_decode_audio(fixture, fixture_dir, work_dir):
+    return audio_fixture(fixture, fixture_dir)
+
+
+def _run_decode_audio(path):
+    from audio import decode_audio
+    decode_audio(path, "bench")
+
+
+def _setup_split_points(fixture, fixture_dir, work_dir):
+    return speaker_audio(fixture)
+
+
+def _run_split_points(audio):
+    from chunking import find_split_points
+    find_split_points(audio, chunk_seconds=30)
+
+
+def _setup_transcript(fixture, fixture_dir, work_dir):
+    return speaker_turns(fixture), whisper_segments(fixture)
+
+
+def _run_assign_speakers(ctx):
+    from speaker_index import SpeakerTurns, assign_speakers
+    turns, segments = ctx
+    assign_speakers(SpeakerTurns(*zip(*turns)), segments)
+
+
+def _setup_format_output(fixture, fixture_dir, work_dir):
+    from speaker_index import SpeakerTurns, assign_speakers
+    turns, segments = _setup_transcript(fixture, fixture_dir, work_dir)
+    return assign_speakers(SpeakerTurns(*zip(*turns)), segments)
+
+
+def _run_format_output(segments):
+    from format_output import format_output
+    format_output(segments)
+
+
+def _setup_result_payload(fixture, fixture_dir, work_dir):
+    from format_output import format_output
+    text, transcript_json, utterances = format_output(_setup_format_output(fixture, fixture_dir, work_dir))
+    return {
+        "recording_id": "bench",
+        "status": "success",
+        "transcript_text": text,
+        "transcript_json": transcript_json,
+        "transcript_utterances": utterances,
+        "duration_seconds": fixture.duration,
+    }, speaker_audio(fixture), work_dir
+
+
+def _run_result_cache(ctx):
+    from result_cache import ResultCache, cache_key
+    result, audio, work_dir = ctx
+    cache = ResultCache(os.path.join(work_dir, "cache"), max_bytes=256 * 1024 * 1024)
+    key = cache_key(audio, {"model_size": "medium"})
+    cache.put(key, result)
+    assert cache.get(key) is not None
+
+
+def _setup_callback(fixture, fixture_dir, work_dir):
+    from fakes import CallbackSink
+    # The sink lives until the worker exits, so its startup and shutdown are not timed
+    return _setup_result_payload(fixture, fixture_dir, work_dir)[0], CallbackSink(CALLBACK_SECRET)
+
+
+def _run_callback(ctx):
+    from callback_client import send_callback
+    result, sink = ctx
+    stats = send_callback(sink.url, CALLBACK_SECRET, result)
+    assert stats["delivered"] and sink.received[-1]["valid"], "callback not delivered or bad signature"
+
+
+def _setup_video(fixture, fixture_dir, work_dir):
+    return video_fixture(fixture, fixture_dir)
+
+
+def _run_probe(path):
+    from probe import probe_media
+    probe_media(path)
+
+
+def _run_compress_video(path):
+    from compress import compress_video
+    compress_video(path, "bench", resolution=480)
+
+
+def _run_single_pass(path):
+    from compress import compress_single_pass
+    compress_single_pass(path, "bench", resolution=480, want_audio=True)
+
+
+def _setup_segmented(fixture, fixture_dir, work_dir):
+    from probe import probe_media
+    path = video_fixture(fixture, fixture_dir)
+    return path, probe_media(path)
+
+
+def _run_segmented(ctx):
+    # Compare with single_pass: same outputs (minus the thumbnail) from 4 parallel segments
+    from segmented import compress_segmented
+    path, info = ctx
+    compress_segmented(path, "bench", info, 4, resolution=480, want_audio=True)
+
+
+def _run_remux(path):
+    from compress import remux_video
+    remux_video(path, "bench")
+
+
+def _run_extract_audio(path):
+    from compress import extract_audio
+    extract_audio(path, "bench")
+
+
+def _run_thumbnail(path):
+    from thumbnail import extract_thumbnail
+    extract_thumbnail(path, "bench")
+
+
+def _setup_upload(fixture, fixture_dir, work_dir):
+    import s3_upload
+    from fakes import LocalS3
+    s3_upload._client = LocalS3(os.path.join(work_dir, "s3"))
+    return video_fixture(fixture, fixture_dir)
+
+
+def _run_upload(path):
+    from s3_upload import upload_to_s3
+    upload_to_s3(path, "bench-bucket", "meeting-recordings/bench/video.mp4")
+
+
+TRANSCRIBE = os.path.join(ROOT, "lambda-transcribe")
+COMPRESS = os.path.join(ROOT, "lambda-compress-upload")
+
+# name -> (lambda dir, setup, run, fixture fields the stage depends on, needs ffmpeg)
+STAGES = {
+    "decode_audio": (TRANSCRIBE, _setup_decode_audio, _run_decode_audio, ("duration", "speakers"), True),
+    "split_points": (TRANSCRIBE, _setup_split_points, _run_split_points, ("duration", "speakers"), False),
+    "assign_speakers": (TRANSCRIBE, _setup_transcript, _run_assign_speakers, ("duration", "speakers"), False),
+    "format_output": (TRANSCRIBE, _setup_format_output, _run_format_output, ("duration", "speakers"), False),
+    "result_cache": (TRANSCRIBE, _setup_result_payload, _run_result_cache, ("duration", "speakers"), False),
+    "callback": (TRANSCRIBE, _setup_callback, _run_callback, ("duration", "speakers"), False),
+    "probe": (COMPRESS, _setup_video, _run_probe, ("duration", "height"), True),
+    "compress_video": (COMPRESS, _setup_video, _run_compress_video, ("duration", "height"), True),
+    "single_pass": (COMPRESS, _setup_video, _run_single_pass, ("duration", "height"), True),
+    "segmented": (COMPRESS, _setup_segmented, _run_segmented, ("duration", "height"), True),
+    "remux": (COMPRESS, _setup_video, _run_remux, ("duration", "height"), True),
+    "extract_audio": (COMPRESS, _setup_video, _run_extract_audio, ("duration", "height"), True),
+    "thumbnail": (COMPRESS, _setup_video, _run_thumbnail, ("duration", "height"), True),
+    "upload": (COMPRESS, _setup_upload, _run_upload, ("duration", "height"), True),
+}
+
+
+# --- Worker -----------------------------------------------------------------
+
+
+def run_worker(stage: str, fixture: Fixture, fixture_dir: str) -> dict:
+    lambda_dir, setup, run, _, _ = STAGES[stage]
+    sys.path.insert(0, lambda_dir)
+    with tempfile.TemporaryDirectory(prefix="bench-") as work_dir:
+        ctx = setup(fixture, fixture_dir, work_dir)
+        self0 = resource.getrusage(resource.RUSAGE_SELF)
+        children0 = resource.getrusage(resource.RUSAGE_CHILDREN)
+        start = time.perf_counter()
+        run(ctx)
+        wall = time.perf_counter() - start
+        self1 = resource.getrusage(resource.RUSAGE_SELF)
+        children1 = resource.getrusage(resource.RUSAGE_CHILDREN)
+    # Stages write their outputs to /tmp/{recording_id}_* like the lambdas do
+    for path in glob.glob(os.path.join(tempfile.gettempdir(), "bench_*")):
+        os.remove(path)
+
+    def cpu(r):
+        return r.ru_utime + r.ru_stime
+
+    return {
+        "wall_seconds": wall,
+        "cpu_seconds": (cpu(self1) - cpu(self0)) + (cpu(children1) - cpu(children0)),
+        # ru_maxrss is KB on Linux; the largest of this process and any ffmpeg child
+        "peak_rss_mb": max(self1.ru_maxrss, children1.ru_maxrss) / 1024,
+    }
+
+
+def _spawn_worker(stage: str, fixture: Fixture, fixture_dir: str) -> dict:
+    cmd = [
+        sys.executable, os.path.abspath(__file__), "--worker", stage,
+        "--fixture", json.dumps(fixture.as_dict()), "--fixture-dir", fixture_dir,
+    ]
+    proc = subprocess.run(cmd, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"{stage} [{fixture.id}] failed:\n{proc.stderr[-2000:]}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+# --- Runner and regression gate ----------------------------------------------
+
+
+def run_suite(stages: list, fixtures: list, fixture_dir: str, repeat: int) -> dict:
+    results = {}
+    for stage in stages:
+        fields = STAGES[stage][3]
+        seen = set()
+        for fixture in fixtures:
+            dims = tuple(getattr(fixture, f) for f in fields)
+            if dims in seen:
+                continue
+            seen.add(dims)
+            key = f"{stage}/" + "-".join(f"{f}={getattr(fixture, f)}" for f in fields)
+            runs = [_spawn_worker(stage, fixture, fixture_dir) for _ in range(repeat)]
+            results[key] = {
+                "wall_seconds": round(statistics.median(r["wall_seconds"] for r in runs), 4),
+                "cpu_seconds": round(statistics.median(r["cpu_seconds"] for r in runs), 4),
+                "peak_rss_mb": round(max(r["peak_rss_mb"] for r in runs), 1),
+                "repeat": repeat,
+            }
+            r = results[key]
+            print(f"  {key:<48} wall {r['wall_seconds']:8.3f}s  cpu {r['cpu_seconds']:8.3f}s  "
+                  f"rss {r['peak_rss_mb']:7.1f} MB", flush=True)
+    return results
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """Return human-readable regressions against the baseline results."""
+    regressions = []
+    for key, current in results.items():
+        base = baseline.get(key)
+        if not base:
+            continue
+        wall, base_wall = current["wall_seconds"], base["wall_seconds"]
+        if wall > base_wall * (1 + threshold) and wall - base_wall > MIN_DELTA_SECONDS:
+            regressions.append(f"{key}: wall {base_wall:.3f}s -> {wall:.3f}s ({wall / base_wall - 1:+.0%})")
+        rss, base_rss = current["peak_rss_mb"], base["peak_rss_mb"]
+        if rss > base_rss * (1 + threshold) and rss - base_rss > MIN_DELTA_RSS_MB:
+            regressions.append(f"{key}: peak RSS {base_rss:.0f} MB -> {rss:.0f} MB ({rss / base_rss - 1:+.0%})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--suite", choices=sorted(MATRIX), default="quick")
+    parser.add_argument("--stages", nargs="+", choices=sorted(STAGES), default=sorted(STAGES))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--fixture-dir", default=DEFAULT_FIXTURE_DIR)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--update-baseline", action="store_true",
+                        help="Write this run's results as the new baseline instead of gating")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="Allowed fractional slowdown / memory growth per stage")
+    parser.add_argument("--output", help="Also write this run's results to a JSON file")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    parser.add_argument("--fixture", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        spec = json.loads(args.fixture)
+        fixture = Fixture(spec["duration"], spec["height"], spec["speakers"])
+        print(json.dumps(run_worker(args.worker, fixture, args.fixture_dir)))
+        return
+
+    if any(STAGES[s][4] for s in args.stages) and not shutil.which("ffmpeg"):
+        sys.exit("ffmpeg is required for the media stages (or pass --stages with CPU-only stages)")
+
+    fixtures = MATRIX[args.suite]
+    print(f"Running {len(args.stages)} stages on {len(fixtures)} fixtures ({args.suite}), x{args.repeat}")
+    results = run_suite(args.stages, fixtures, args.fixture_dir, args.repeat)
+    report = {
+        "suite": args.suite,
+        "machine": {"platform": platform.platform(), "python": platform.python_version(),
+                    "cpu_count": os.cpu_count()},
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+
+    if args.update_baseline or not os.path.exists(args.baseline):
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        # Merge, so a partial run (--stages / --suite) only replaces what it measured
+        baseline.setdefault("results", {}).update(results)
+        baseline["machine"] = report["machine"]
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print(f"Baseline written to {args.baseline}")
+        return
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get("machine", {}).get("cpu_count") != os.cpu_count():
+        print("Warning: baseline was recorded on a machine with a different CPU count")
+
+    regressions = compare(results, baseline.get("results", {}), args.threshold)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) beyond {args.threshold:.0%}:")
+        for line in regressions:
+            print(f"  {line}")
+        sys.exit(1)
+    print(f"\nNo regressions beyond {args.threshold:.0%} against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
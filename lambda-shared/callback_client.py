@@ -0,0 +1,248 @@
+"""HMAC-signed result callbacks to the Supabase edge functions.
+
+One pooled requests.Session is reused across callbacks and warm invocations.
+Failed deliveries (connection errors, timeouts, 408/425/429/5xx) are retried
+with exponential backoff and jitter, always with the same body and
+Idempotency-Key, so the edge function can recognise a repeat.
+
+The signature always covers the uncompressed JSON body. Bodies above
+CALLBACK_GZIP_KB are sent gzip-compressed (Content-Encoding: gzip). Bodies
+above CALLBACK_SPILL_MB are written to CALLBACK_SPILL_S3_URI and replaced by
+a small signed pointer carrying a presigned GET URL and the payload's sha256.
+"""
+
+import gzip
+import hashlib
+import hmac
+import json
+import logging
+import os
+import random
+import threading
+import time
+
+import boto3
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    import orjson
+except ImportError:  # optional: falls back to stdlib json
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+CALLBACK_TIMEOUT = float(os.environ.get("CALLBACK_TIMEOUT_SECONDS", "30"))
+MAX_ATTEMPTS = int(os.environ.get("CALLBACK_MAX_ATTEMPTS", "5"))
+BACKOFF_BASE = 1.0   # seconds before the first retry, doubled each attempt
+BACKOFF_MAX = 30.0
+GZIP_MIN_BYTES = int(os.environ.get("CALLBACK_GZIP_KB", "64")) * 1024
+SPILL_MIN_BYTES = int(os.environ.get("CALLBACK_SPILL_MB", "5")) * 1024 * 1024
+SPILL_S3_URI = os.environ.get("CALLBACK_SPILL_S3_URI") or None
+SPILL_URL_EXPIRES = 24 * 3600
+RETRY_STATUS = {408, 425, 429, 500, 502, 503, 504}
+
+_session = None
+_s3 = None
+_client_lock = threading.Lock()
+_stats_lock = threading.Lock()
+_stats = {
+    "sent": 0, "failed": 0, "attempts": 0, "retries": 0,
+    "gzip": 0, "spilled": 0, "latency_total": 0.0, "latency_max": 0.0,
+}
+
+
+def _get_session() -> requests.Session:
+    """Shared keep-alive session for callbacks (no urllib3 retries; we retry ourselves)."""
+    global _session
+    with _client_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8, max_retries=0)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session = session
+        return _session
+
+
+def _get_s3():
+    global _s3
+    with _client_lock:
+        if _s3 is None:
+            _s3 = boto3.client("s3")
+        return _s3
+
+
+def _json_default(value):
+    """NumPy scalars and arrays (openai-whisper's times are np.float64) as plain JSON values."""
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def dumps(payload: dict) -> bytes:
+    """Compact UTF-8 JSON (orjson when installed); NumPy values are converted, not rejected."""
+    if orjson is not None:
+        return orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY, default=_json_default)
+    return json.dumps(
+        payload, separators=(",", ":"), ensure_ascii=False, default=_json_default
+    ).encode("utf-8")
+
+
+def sign(body: bytes, secret: str) -> str:
+    return hmac.new(secret.encode("utf-8"), body, hashlib.sha256).hexdigest()
+
+
+def send_callback(callback_url: str, secret: str, payload: dict, max_attempts: int = MAX_ATTEMPTS) -> dict:
+    """
+    Deliver a signed callback, retrying transient failures up to max_attempts times.
+
+    Never raises: the outcome is logged and returned as a stats dict with
+    delivered, status_code, attempts, seconds, bytes (JSON), wire_bytes and
+    mode (json | gzip | s3).
+    """
+    start_time = time.time()
+    body = _encode(payload)
+    digest = hashlib.sha256(body).hexdigest()
+    recording_id = payload.get("recording_id", "unknown")
+    # Stable across retries and re-sends of the same result
+    idempotency_key = f"{recording_id}:{digest[:32]}"
+    json_bytes = len(body)
+    mode = "json"
+
+    if len(body) >= SPILL_MIN_BYTES and SPILL_S3_URI:
+        try:
+            body = dumps(_spill_to_s3(body, digest, recording_id, payload.get("status")))
+            mode = "s3"
+        except Exception as e:
+            logger.warning(f"Callback spill to S3 failed, sending inline: {e}")
+
+    headers = {
+        "Content-Type": "application/json",
+        "X-Callback-Signature": sign(body, secret),
+        "Idempotency-Key": idempotency_key,
+    }
+    wire_body = body
+    if mode == "json" and len(body) >= GZIP_MIN_BYTES:
+        wire_body = gzip.compress(body, compresslevel=6)
+        headers["Content-Encoding"] = "gzip"
+        mode = "gzip"
+
+    stats = {
+        "delivered": False,
+        "status_code": None,
+        "attempts": 0,
+        "seconds": 0.0,
+        "bytes": json_bytes,
+        "wire_bytes": len(wire_body),
+        "mode": mode,
+    }
+
+    session = _get_session()
+    for attempt in range(max_attempts):
+        stats["attempts"] = attempt + 1
+        retry_after = None
+        try:
+            response = session.post(callback_url, data=wire_body, headers=headers, timeout=CALLBACK_TIMEOUT)
+            stats["status_code"] = response.status_code
+            if response.status_code < 400:
+                stats["delivered"] = True
+                break
+            if response.status_code not in RETRY_STATUS:
+                logger.error(f"Callback rejected ({response.status_code}): {response.text[:500]}")
+                break
+            retry_after = _retry_after(response)
+            logger.warning(f"Callback attempt {attempt + 1} got {response.status_code}")
+        except requests.RequestException as e:
+            logger.warning(f"Callback attempt {attempt + 1} failed: {e}")
+
+        if attempt + 1 < max_attempts:
+            if retry_after is None:
+                backoff = min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt))
+                retry_after = random.uniform(backoff / 2, backoff)
+            time.sleep(min(retry_after, BACKOFF_MAX))
+
+    stats["seconds"] = round(time.time() - start_time, 3)
+    _record(stats)
+
+    if stats["delivered"]:
+        logger.info(
+            f"Callback sent: {stats['status_code']} in {stats['seconds']}s "
+            f"({stats['attempts']} attempts, {mode}, {stats['wire_bytes']:,} bytes on the wire)"
+        )
+    else:
+        logger.error(
+            f"Callback for {recording_id} not delivered after {stats['attempts']} attempts "
+            f"({stats['seconds']}s, last status {stats['status_code']})"
+        )
+    return stats
+
+
+def _encode(payload: dict) -> bytes:
+    """JSON body for payload, or a minimal error result for the same recording if it can't be serialized."""
+    try:
+        return dumps(payload)
+    except Exception as e:
+        recording_id = str(payload.get("recording_id", "unknown"))
+        logger.error(f"Callback payload for {recording_id} could not be serialized, sending an error: {e}")
+        return dumps({
+            "recording_id": recording_id,
+            "status": "error",
+            "error": f"Result could not be serialized: {type(e).__name__}: {e}",
+        })
+
+
+def _spill_to_s3(body: bytes, digest: str, recording_id: str, status) -> dict:
+    """Upload the full payload to S3 and return the pointer payload that replaces it."""
+    bucket, _, prefix = SPILL_S3_URI.removeprefix("s3://").partition("/")
+    prefix = prefix.strip("/")
+    key = f"{prefix}/{recording_id}/{digest[:16]}.json.gz" if prefix else f"{recording_id}/{digest[:16]}.json.gz"
+
+    s3 = _get_s3()
+    s3.put_object(
+        Bucket=bucket, Key=key, Body=gzip.compress(body, compresslevel=6),
+        ContentType="application/json", ContentEncoding="gzip",
+    )
+    url = s3.generate_presigned_url(
+        "get_object", Params={"Bucket": bucket, "Key": key}, ExpiresIn=SPILL_URL_EXPIRES
+    )
+    logger.info(f"Callback payload ({len(body):,} bytes) spilled to s3://{bucket}/{key}")
+    # The pointer is signed like any other body; the sha256 authenticates the spilled payload
+    return {
+        "recording_id": recording_id,
+        "status": status,
+        "payload_url": url,
+        "payload_sha256": digest,
+        "payload_bytes": len(body),
+    }
+
+
+def _retry_after(response):
+    try:
+        return float(response.headers["Retry-After"])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def _record(stats: dict):
+    with _stats_lock:
+        _stats["sent" if stats["delivered"] else "failed"] += 1
+        _stats["attempts"] += stats["attempts"]
+        _stats["retries"] += stats["attempts"] - 1
+        if stats["mode"] == "gzip":
+            _stats["gzip"] += 1
+        elif stats["mode"] == "s3":
+            _stats["spilled"] += 1
+        _stats["latency_total"] += stats["seconds"]
+        _stats["latency_max"] = max(_stats["latency_max"], stats["seconds"])
+
+
+def stats() -> dict:
+    """Cumulative delivery stats for this process."""
+    with _stats_lock:
+        s = dict(_stats)
+    total = s["sent"] + s["failed"]
+    latency_total = s.pop("latency_total")
+    s["latency_avg"] = round(latency_total / total, 3) if total else 0.0
+    s["latency_max"] = round(s["latency_max"], 3)
+    return s
@@ -0,0 +1,18 @@
+#!/bin/bash
+set -euo pipefail
+
+# Copy shared Python modules into each Lambda's build context.
+# Docker (and Railway) build each Lambda from its own directory, so the
+# shared modules are committed there too. Edit them here, then run:
+#   ./lambda-shared/sync.sh
+
+SHARED_DIR="$(cd "$(dirname "$0")" && pwd)"
+ROOT_DIR="$(dirname "${SHARED_DIR}")"
+TARGETS=("lambda-transcribe" "lambda-compress-upload")
+
+for module in "${SHARED_DIR}"/*.py; do
+  for target in "${TARGETS[@]}"; do
+    cp "${module}" "${ROOT_DIR}/${target}/"
+    echo "  $(basename "${module}") -> ${target}/"
+  done
+done
@@ -0,0 +1,160 @@
+"""Decode audio once into a shared 16kHz mono float32 buffer.
+
+ffmpeg writes raw s16le PCM to a pipe, which is converted to float32 in
+fixed-size blocks as it arrives. The same array is handed to Whisper,
+pyannote and the duration calculation, so there is no temporary WAV and no
+re-decoding. Recordings longer than AUDIO_MEMMAP_SECONDS are spilled to a
+memory-mapped file in /tmp instead of being held on the heap.
+"""
+
+import logging
+import os
+import subprocess
+import threading
+import wave
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 16000
+READ_BLOCK_BYTES = 4 * 1024 * 1024  # 2M samples (~2 min of audio) per pipe read
+AUDIO_MEMMAP_SECONDS = float(os.environ.get("AUDIO_MEMMAP_SECONDS", str(3 * 3600)))
+DECODE_TIMEOUT = 600
+
+
+def decode_audio(input_path: str, recording_id: str, stdin_feed=None) -> np.ndarray:
+    """
+    Decode any ffmpeg-readable input to 16kHz mono float32 samples in [-1, 1].
+
+    Args:
+        input_path: Local path (or any URL ffmpeg can open). Ignored when stdin_feed is set.
+        recording_id: Used to name the memory-mapped spill file.
+        stdin_feed: Optional callable(sink) that writes the encoded input to ffmpeg's
+            stdin (e.g., a streaming download), run on a background thread.
+
+    Returns:
+        1-D float32 array (an np.memmap for very long recordings).
+    """
+    cmd = [
+        "ffmpeg",
+        "-nostdin",
+        "-loglevel", "error",
+        "-i", "pipe:0" if stdin_feed else input_path,
+        "-vn",                # Skip video decoding entirely
+        "-ar", str(SAMPLE_RATE),
+        "-ac", "1",
+        "-f", "s16le",
+        "-",
+    ]
+    memmap_threshold = int(AUDIO_MEMMAP_SECONDS * SAMPLE_RATE)
+    spill_path = f"/tmp/{recording_id}_audio.f32"
+
+    blocks = []
+    n_samples = 0
+    spill = None
+    carry = b""
+
+    proc = subprocess.Popen(
+        cmd,
+        stdin=subprocess.PIPE if stdin_feed else subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    )
+
+    feed_errors = []
+    feeder = None
+    if stdin_feed:
+        def feed():
+            try:
+                stdin_feed(proc.stdin)
+            except Exception as e:
+                feed_errors.append(e)
+            finally:
+                try:
+                    proc.stdin.close()
+                except BrokenPipeError:
+                    pass
+
+        feeder = threading.Thread(target=feed, name=f"feed-{recording_id}", daemon=True)
+        feeder.start()
+
+    # Pipe reads block until ffmpeg exits, so enforce the timeout with a kill timer
+    watchdog = threading.Timer(DECODE_TIMEOUT, proc.kill)
+    watchdog.start()
+    try:
+        while True:
+            data = proc.stdout.read(READ_BLOCK_BYTES)
+            if not data:
+                break
+            data = carry + data
+            # Keep an odd trailing byte for the next read so samples stay aligned
+            usable = len(data) - (len(data) % 2)
+            carry = data[usable:]
+            block = np.frombuffer(data[:usable], dtype=np.int16).astype(np.float32)
+            block *= 1.0 / 32768.0
+            n_samples += len(block)
+
+            if spill is None and n_samples > memmap_threshold:
+                logger.info(f"Audio exceeds {AUDIO_MEMMAP_SECONDS:.0f}s, spilling to {spill_path}")
+                spill = open(spill_path, "wb")
+                for b in blocks:
+                    spill.write(b.tobytes())
+                blocks = []
+            if spill is not None:
+                spill.write(block.tobytes())
+            else:
+                blocks.append(block)
+
+        stderr = proc.stderr.read()
+        returncode = proc.wait()
+        if feeder is not None:
+            feeder.join()
+    except Exception:
+        proc.kill()
+        proc.wait()
+        if spill is not None:
+            spill.close()
+        raise
+    finally:
+        watchdog.cancel()
+
+    if feed_errors:
+        if spill is not None:
+            spill.close()
+        raise feed_errors[0]
+    if returncode != 0:
+        if spill is not None:
+            spill.close()
+        raise RuntimeError(f"ffmpeg decode failed with code {returncode}: {stderr.decode(errors='replace')[-500:]}")
+
+    if spill is not None:
+        spill.close()
+        # Copy-on-write so torch.from_numpy gets a writeable view without touching the file
+        audio = np.memmap(spill_path, dtype=np.float32, mode="c", shape=(n_samples,))
+    elif blocks:
+        audio = np.concatenate(blocks)
+    else:
+        audio = np.zeros(0, dtype=np.float32)
+
+    logger.info(f"Decoded {audio_duration(audio):.1f}s of audio ({audio.nbytes:,} bytes float32)")
+    return audio
+
+
+def load_wav(wav_path: str) -> np.ndarray:
+    """Read a 16kHz mono 16-bit PCM WAV into a float32 array in [-1, 1]."""
+    with wave.open(wav_path, "rb") as w:
+        if w.getframerate() != SAMPLE_RATE or w.getnchannels() != 1 or w.getsampwidth() != 2:
+            raise ValueError(f"Expected 16kHz mono 16-bit WAV, got {w.getparams()}")
+        pcm = w.readframes(w.getnframes())
+    return np.frombuffer(pcm, dtype=np.int16).astype(np.float32) / 32768.0
+
+
+def as_array(audio) -> np.ndarray:
+    """Accept a WAV path or an already-decoded sample array."""
+    return load_wav(audio) if isinstance(audio, str) else audio
+
+
+def audio_duration(audio: np.ndarray) -> float:
+    """Duration in seconds of a 16kHz sample array."""
+    return round(len(audio) / SAMPLE_RATE, 2)
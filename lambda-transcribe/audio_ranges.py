@@ -0,0 +1,238 @@
+"""Fetch only the audio track of a remote MP4 via byte-range requests.
+
+When a job only has a video_url, downloading the whole MP4 transfers the
+video (typically ~90% of the bytes) just for ffmpeg to discard it. Instead,
+the top-level box headers and the moov index are read with range requests,
+the audio track's sample table (stsc/stsz/stco) gives the byte ranges of its
+chunks, and only those are fetched into a sparse local file at their original
+offsets. ffmpeg then demuxes that file with -vn as usual: the video samples
+are holes that are never read, since unused input streams are discarded.
+
+Only non-fragmented MP4/MOV is supported; anything else raises
+UnsupportedContainer and the caller falls back to the full download.
+"""
+
+import logging
+import os
+import struct
+import time
+
+import numpy as np
+
+from ranged_download import fetch_ranges, object_size
+
+logger = logging.getLogger(__name__)
+
+# Adjacent audio chunks closer than this are fetched as one range
+MERGE_GAP_BYTES = 64 * 1024
+# Upper bound on range requests; the smallest gaps are merged until it holds
+MAX_RANGES = int(os.environ.get("AUDIO_RANGES_MAX_REQUESTS", "1500"))
+# Give up (and download everything) when the audio plan is most of the file anyway
+MAX_FRACTION = float(os.environ.get("AUDIO_RANGES_MAX_FRACTION", "0.6"))
+MAX_TOP_LEVEL_BOXES = 64
+HEADER_PROBE_BYTES = 16
+
+class UnsupportedContainer(Exception):
+    """The object is not a non-fragmented MP4 with an audio track."""
+
+
+def _iter_boxes(data: bytes, start: int = 0, end: int = None):
+    """Yield (type, payload_start, box_end) for the boxes in data[start:end]."""
+    end = len(data) if end is None else end
+    pos = start
+    while pos + 8 <= end:
+        size, box_type = struct.unpack_from(">I4s", data, pos)
+        header = 8
+        if size == 1:
+            size = struct.unpack_from(">Q", data, pos + 8)[0]
+            header = 16
+        elif size == 0:
+            size = end - pos
+        if size < header:
+            raise UnsupportedContainer(f"Corrupt {box_type!r} box at {pos}")
+        yield box_type, pos + header, min(pos + size, end)
+        pos += size
+
+
+def _child(data: bytes, start: int, end: int, box_type: bytes):
+    for child_type, payload, child_end in _iter_boxes(data, start, end):
+        if child_type == box_type:
+            return payload, child_end
+    return None
+
+
+def _read_top_level(url: str, size: int, write) -> tuple[int, int, int]:
+    """
+    Walk the top-level boxes with small range reads, writing each header.
+
+    Returns (moov_offset, moov_size, bytes_read).
+    """
+    headers = []
+
+    def keep(start, data):
+        headers.append((start, data))
+
+    offset = 0
+    moov = None
+    for _ in range(MAX_TOP_LEVEL_BOXES):
+        if offset + 8 > size:
+            break
+        fetch_ranges(url, [(offset, min(offset + HEADER_PROBE_BYTES, size) - 1)], keep, concurrency=1)
+        data = headers[-1][1]
+        box_size, box_type = struct.unpack_from(">I4s", data, 0)
+        if box_size == 1:
+            box_size = struct.unpack_from(">Q", data, 8)[0]
+        elif box_size == 0:
+            box_size = size - offset
+        if box_size < 8:
+            raise UnsupportedContainer(f"Corrupt top-level box at {offset}")
+        if box_type == b"moof":
+            raise UnsupportedContainer("Fragmented MP4")
+        if box_type == b"moov":
+            moov = (offset, box_size)
+        offset += box_size
+
+    if moov is None:
+        raise UnsupportedContainer("No moov box")
+    for start, data in headers:
+        write(start, data)
+    return moov[0], moov[1], sum(len(data) for _, data in headers)
+
+
+def _audio_sample_table(moov: bytes):
+    """Return the audio trak's (stsc, stsz sizes, chunk offsets) as numpy arrays."""
+    if _child(moov, 8, len(moov), b"mvex"):
+        raise UnsupportedContainer("Fragmented MP4")
+
+    for box_type, payload, end in _iter_boxes(moov, 8):
+        if box_type != b"trak":
+            continue
+        mdia = _child(moov, payload, end, b"mdia")
+        hdlr = mdia and _child(moov, mdia[0], mdia[1], b"hdlr")
+        if not hdlr or moov[hdlr[0] + 8:hdlr[0] + 12] != b"soun":
+            continue
+        minf = _child(moov, mdia[0], mdia[1], b"minf")
+        stbl = minf and _child(moov, minf[0], minf[1], b"stbl")
+        if not stbl:
+            continue
+        boxes = {t: (p, e) for t, p, e in _iter_boxes(moov, *stbl)}
+
+        p, _ = boxes[b"stsc"]
+        count = struct.unpack_from(">I", moov, p + 4)[0]
+        stsc = np.frombuffer(moov, dtype=">u4", count=count * 3, offset=p + 8).reshape(count, 3)
+
+        p, _ = boxes[b"stsz"]
+        uniform, count = struct.unpack_from(">II", moov, p + 4)
+        if uniform:
+            sizes = np.full(count, uniform, dtype=np.int64)
+        else:
+            sizes = np.frombuffer(moov, dtype=">u4", count=count, offset=p + 12).astype(np.int64)
+
+        if b"co64" in boxes:
+            p, _ = boxes[b"co64"]
+            count = struct.unpack_from(">I", moov, p + 4)[0]
+            offsets = np.frombuffer(moov, dtype=">u8", count=count, offset=p + 8).astype(np.int64)
+        else:
+            p, _ = boxes[b"stco"]
+            count = struct.unpack_from(">I", moov, p + 4)[0]
+            offsets = np.frombuffer(moov, dtype=">u4", count=count, offset=p + 8).astype(np.int64)
+        return stsc.astype(np.int64), sizes, offsets
+
+    raise UnsupportedContainer("No audio track")
+
+
+def audio_chunk_ranges(moov: bytes) -> np.ndarray:
+    """(n, 2) array of inclusive byte ranges holding the audio track's chunks."""
+    stsc, sizes, offsets = _audio_sample_table(moov)
+    n_chunks = len(offsets)
+
+    # Expand the sample-to-chunk runs into samples per chunk
+    first_chunks = stsc[:, 0] - 1
+    run_ends = np.append(first_chunks[1:], n_chunks)
+    per_chunk = np.repeat(stsc[:, 1], np.maximum(run_ends - first_chunks, 0))[:n_chunks]
+
+    # Chunk byte length = sum of its samples' sizes
+    bounds = np.concatenate([[0], np.cumsum(per_chunk)])
+    if bounds[-1] > len(sizes):
+        raise UnsupportedContainer("Sample table is inconsistent")
+    cumulative = np.concatenate([[0], np.cumsum(sizes)])
+    lengths = cumulative[bounds[1:]] - cumulative[bounds[:-1]]
+
+    keep = lengths > 0
+    starts = offsets[keep]
+    ends = starts + lengths[keep] - 1
+    order = np.argsort(starts)
+    return np.stack([starts[order], ends[order]], axis=1)
+
+
+def merge_ranges(ranges: np.ndarray, gap: int = MERGE_GAP_BYTES, max_ranges: int = MAX_RANGES) -> list:
+    """Coalesce ranges closer than gap, then merge the smallest gaps until at most max_ranges remain."""
+    if len(ranges) == 0:
+        return []
+    gaps = ranges[1:, 0] - ranges[:-1, 1] - 1
+    if len(ranges) > max_ranges:
+        # Smallest gap that still leaves at most max_ranges - 1 larger ones
+        k = len(gaps) - max_ranges
+        gap = max(gap, int(np.partition(gaps, k)[k]))
+    split = np.flatnonzero(gaps > gap)
+    firsts = np.concatenate([[0], split + 1])
+    lasts = np.concatenate([split, [len(ranges) - 1]])
+    return [(int(ranges[first, 0]), int(ranges[first:last + 1, 1].max())) for first, last in zip(firsts, lasts)]
+
+
+def fetch_audio_track(url: str, recording_id: str) -> tuple[str, dict]:
+    """
+    Fetch the moov index and the audio chunks of a remote MP4 into a sparse /tmp file.
+
+    Returns:
+        (local path, stats) where stats has bytes (transferred), object_bytes,
+        transfer_ratio, ranges, seconds, mb_per_s, retries and mode "audio-ranges".
+        Raises UnsupportedContainer when the full download should be used instead.
+    """
+    start_time = time.time()
+    size = object_size(url)
+    if not size:
+        raise UnsupportedContainer("Source does not support range requests")
+
+    path = f"/tmp/{recording_id}_input.mp4"
+    fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        os.ftruncate(fd, size)  # sparse: unfetched video bytes take no disk space
+
+        def write(start, data):
+            os.pwrite(fd, data, start)
+
+        moov_offset, moov_size, header_bytes = _read_top_level(url, size, write)
+        index_stats = fetch_ranges(url, [(moov_offset, moov_offset + moov_size - 1)], write)
+        moov = os.pread(fd, moov_size, moov_offset)
+
+        ranges = merge_ranges(audio_chunk_ranges(moov))
+        planned = sum(end - start + 1 for start, end in ranges)
+        if planned > size * MAX_FRACTION:
+            raise UnsupportedContainer(
+                f"Audio ranges cover {planned / size:.0%} of the file, a full download is cheaper"
+            )
+        audio_stats = fetch_ranges(url, ranges, write)
+    except Exception:
+        os.close(fd)
+        os.remove(path)
+        raise
+    os.close(fd)
+
+    transferred = header_bytes + index_stats["bytes"] + audio_stats["bytes"]
+    seconds = time.time() - start_time
+    stats = {
+        "bytes": transferred,
+        "object_bytes": size,
+        "transfer_ratio": round(transferred / size, 4),
+        "ranges": len(ranges),
+        "seconds": round(seconds, 2),
+        "mb_per_s": round(transferred / seconds / 1e6, 2) if seconds > 0 else 0.0,
+        "retries": index_stats["retries"] + audio_stats["retries"],
+        "mode": "audio-ranges",
+    }
+    logger.info(
+        f"Fetched audio track: {transferred:,} of {size:,} bytes ({stats['transfer_ratio']:.1%}) "
+        f"in {len(ranges)} ranges, {seconds:.1f}s"
+    )
+    return path, stats
@@ -0,0 +1,302 @@
+"""Cross-recording batched Whisper inference for /transcribe/batch.
+
+Each recording in a batch runs the normal pipeline (download, decode, cache,
+diarization, formatting, callback), except that its transcription stage cuts
+the audio into silence-aligned windows of at most 30s and hands them to the
+shared WindowBatcher. One inference thread takes windows from every recording
+in flight and runs the Whisper encoder and decoder over up to BATCH_SIZE of
+them at once (same model and language), then resolves each window's future.
+The recording's stage waits for its windows and stitches them back into one
+timeline, exactly as chunked transcription does.
+
+Batched decoding uses the openai-whisper backend (a single decoding pass at
+temperature 0, no fallback), with word timestamps aligned per window.
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future
+
+import numpy as np
+
+from audio import SAMPLE_RATE, as_array
+from chunking import find_split_points, stitch_chunks
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = int(os.environ.get("TRANSCRIBE_BATCH_SIZE", "8"))
+# How long the inference thread waits for more windows before running a partial batch
+BATCH_WAIT_SECONDS = float(os.environ.get("TRANSCRIBE_BATCH_WAIT_SECONDS", "0.5"))
+# Most recordings of one /transcribe/batch request processed at the same time (also capped by TRANSCRIBE_WORKERS)
+BATCH_RECORDINGS = int(os.environ.get("TRANSCRIBE_BATCH_RECORDINGS", "4"))
+# Longest a recording waits for any one of its windows before failing the job
+WINDOW_TIMEOUT_SECONDS = float(os.environ.get("TRANSCRIBE_BATCH_WINDOW_TIMEOUT", "900"))
+# Window target and silence search; target + search stays under Whisper's 30s input
+WINDOW_SECONDS = 25.0
+WINDOW_SEARCH_SECONDS = 4.0
+# Whisper's no-speech rule: drop windows the model thinks are silence
+NO_SPEECH_THRESHOLD = 0.6
+LOGPROB_THRESHOLD = -1.0
+SECONDS_PER_TIMESTAMP = 0.02
+
+
+class _Window:
+    __slots__ = ("audio", "start", "end", "key", "future")
+
+    def __init__(self, audio: np.ndarray, start: int, end: int, key: tuple):
+        self.audio = audio
+        self.start = start
+        self.end = end
+        self.key = key
+        self.future = Future()
+
+
+class WindowBatcher:
+    """Shared queue of windows from all recordings, drained in batches by one inference thread."""
+
+    def __init__(self, batch_size: int = BATCH_SIZE, wait_seconds: float = BATCH_WAIT_SECONDS):
+        self.batch_size = max(1, batch_size)
+        self.wait_seconds = wait_seconds
+        self._pending = []
+        self._cond = threading.Condition()
+        self._thread = None
+
+        # Stats (guarded by _cond)
+        self._batches = 0
+        self._windows = 0
+        self._audio_seconds = 0.0
+        self._busy_seconds = 0.0
+        self._last_batch = None
+
+    def transcribe(self, audio, model_size: str = "medium", language: str = None) -> tuple:
+        """
+        Transcribe one recording through the shared batches. Blocks until all its windows are done.
+
+        Returns:
+            Tuple of (segments_with_words, detected_language, stats) where stats reports
+            the window count, the batches they ran in and those batches' throughput.
+        """
+        audio = as_array(audio)
+        points = find_split_points(audio, WINDOW_SECONDS, search_seconds=WINDOW_SEARCH_SECONDS)
+        key = (model_size, language)
+        windows = [
+            _Window(np.asarray(audio[start:end]), start, end, key)
+            for start, end in zip(points[:-1], points[1:])
+            if end > start
+        ]
+
+        start_time = time.time()
+        with self._cond:
+            self._pending.extend(windows)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="whisper-batcher", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+        chunk_results = []
+        languages = Counter()
+        batches = {}
+        try:
+            for window in windows:
+                segments, detected_language, batch = window.future.result(timeout=WINDOW_TIMEOUT_SECONDS)
+                languages[detected_language] += 1
+                batches[batch["id"]] = batch
+                chunk_results.append({
+                    "offset": window.start / SAMPLE_RATE,
+                    "core_start": window.start / SAMPLE_RATE,
+                    "core_end": window.end / SAMPLE_RATE if window.end < len(audio) else float("inf"),
+                    "segments": segments,
+                })
+        except Exception:
+            # Failed or timed out: don't spend inference on the rest of this recording
+            self._withdraw(windows)
+            raise
+
+        segments = stitch_chunks(chunk_results)
+        detected_language = language or (languages.most_common(1)[0][0] if languages else "en")
+        batch_audio = sum(b["audio_seconds"] for b in batches.values())
+        batch_seconds = sum(b["seconds"] for b in batches.values())
+        stats = {
+            "mode": "batched",
+            "windows": len(windows),
+            "batches": len(batches),
+            "mean_batch_size": round(sum(b["size"] for b in batches.values()) / len(batches), 2) if batches else 0,
+            "batch_audio_per_second": round(batch_audio / batch_seconds, 2) if batch_seconds > 0 else None,
+            "wall_seconds": round(time.time() - start_time, 2),
+        }
+        logger.info(
+            f"Batched transcription complete: {len(segments)} segments from {len(windows)} windows "
+            f"in {len(batches)} batches"
+        )
+        return segments, detected_language, stats
+
+    def _next_batch(self) -> list:
+        """Oldest pending window plus up to batch_size - 1 more with the same model and language."""
+        with self._cond:
+            while not self._pending:
+                self._cond.wait()
+            key = self._pending[0].key
+            deadline = time.monotonic() + self.wait_seconds
+            while True:
+                matching = [w for w in self._pending if w.key == key]
+                remaining = deadline - time.monotonic()
+                if len(matching) >= self.batch_size or remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            batch = matching[: self.batch_size]
+            taken = set(map(id, batch))
+            self._pending = [w for w in self._pending if id(w) not in taken]
+        # Skips windows whose recording gave up on them in the meantime
+        return [w for w in batch if w.future.set_running_or_notify_cancel()]
+
+    def _withdraw(self, windows: list):
+        """Drop a recording's windows that have not been taken into a batch yet."""
+        withdrawn = set(map(id, windows))
+        with self._cond:
+            self._pending = [w for w in self._pending if id(w) not in withdrawn]
+        for window in windows:
+            window.future.cancel()  # no-op for windows already decoding or done
+
+    def _run(self):
+        while True:
+            windows = []
+            try:
+                windows = self._next_batch()
+                if windows:
+                    self._run_batch(windows)
+            except Exception as e:
+                # Whatever failed, no window of this batch is left waiting forever
+                logger.error(f"Batch of {len(windows)} windows failed: {e}", exc_info=True)
+                for window in windows:
+                    if not window.future.done():
+                        window.future.set_exception(e)
+
+    def _run_batch(self, windows: list):
+        start = time.time()
+        results = _decode_batch(windows)
+        if len(results) != len(windows):
+            raise RuntimeError(f"Decoded {len(results)} results for {len(windows)} windows")
+
+        seconds = time.time() - start
+        audio_seconds = sum(len(w.audio) for w in windows) / SAMPLE_RATE
+        with self._cond:
+            self._batches += 1
+            self._windows += len(windows)
+            self._audio_seconds += audio_seconds
+            self._busy_seconds += seconds
+            batch = {
+                "id": self._batches,
+                "size": len(windows),
+                "audio_seconds": round(audio_seconds, 2),
+                "seconds": round(seconds, 3),
+                "audio_per_second": round(audio_seconds / seconds, 2) if seconds > 0 else None,
+            }
+            self._last_batch = batch
+        logger.info(
+            f"Batch {batch['id']}: {batch['size']} windows, {batch['audio_seconds']}s of audio "
+            f"in {batch['seconds']}s ({batch['audio_per_second']}x real time)"
+        )
+        for window, (segments, detected_language) in zip(windows, results):
+            window.future.set_result((segments, detected_language, batch))
+
+    def stats(self) -> dict:
+        """Totals across all batches, for /health and /metrics."""
+        with self._cond:
+            return {
+                "batch_size": self.batch_size,
+                "pending_windows": len(self._pending),
+                "batches": self._batches,
+                "windows": self._windows,
+                "mean_batch_size": round(self._windows / self._batches, 2) if self._batches else 0,
+                "audio_per_second": (
+                    round(self._audio_seconds / self._busy_seconds, 2) if self._busy_seconds > 0 else 0.0
+                ),
+                "last_batch": self._last_batch,
+            }
+
+
+def _segments_from_tokens(result, tokenizer, window_seconds: float) -> list:
+    """Split one decoded window at its timestamp tokens into openai-whisper style segments."""
+    timestamp_begin = tokenizer.timestamp_begin
+    segments = []
+    text_tokens = []
+    start = None
+    for token in result.tokens:
+        if token >= timestamp_begin:
+            t = (token - timestamp_begin) * SECONDS_PER_TIMESTAMP
+            if text_tokens:
+                segments.append((start or 0.0, t, text_tokens))
+                text_tokens = []
+                start = None
+            else:
+                start = t
+        else:
+            text_tokens.append(token)
+    if text_tokens:
+        segments.append((start or 0.0, window_seconds, text_tokens))
+
+    return [
+        {
+            "id": i,
+            "seek": 0,
+            "start": start,
+            "end": end,
+            "text": tokenizer.decode(tokens),
+            "tokens": tokens,
+            "temperature": result.temperature,
+            "avg_logprob": result.avg_logprob,
+            "compression_ratio": result.compression_ratio,
+            "no_speech_prob": result.no_speech_prob,
+        }
+        for i, (start, end, tokens) in enumerate(segments)
+    ]
+
+
+def _decode_batch(windows: list) -> list:
+    """Run Whisper over a batch of windows. Returns [(segments, language)] in window order."""
+    # Lazy imports — heavy ML libraries
+    import torch
+    import whisper
+    from whisper.audio import HOP_LENGTH
+    from whisper.timing import add_word_timestamps
+    from whisper.tokenizer import get_tokenizer
+
+    from transcribe import load_model
+
+    model_size, language = windows[0].key
+    model = load_model(model_size, "whisper")
+    mels = torch.stack([
+        whisper.log_mel_spectrogram(
+            whisper.pad_or_trim(torch.from_numpy(np.ascontiguousarray(w.audio, dtype=np.float32))),
+            model.dims.n_mels,
+        )
+        for w in windows
+    ])
+
+    with torch.no_grad():
+        decoded = whisper.decode(model, mels, whisper.DecodingOptions(language=language, fp16=False))
+
+        results = []
+        for window, mel, result in zip(windows, mels, decoded):
+            detected_language = result.language or language or "en"
+            if result.no_speech_prob > NO_SPEECH_THRESHOLD and result.avg_logprob < LOGPROB_THRESHOLD:
+                results.append(([], detected_language))
+                continue
+            tokenizer = get_tokenizer(
+                model.is_multilingual, num_languages=model.num_languages,
+                language=detected_language, task="transcribe",
+            )
+            segments = _segments_from_tokens(result, tokenizer, len(window.audio) / SAMPLE_RATE)
+            if segments:
+                add_word_timestamps(
+                    segments=segments, model=model, tokenizer=tokenizer, mel=mel,
+                    num_frames=len(window.audio) // HOP_LENGTH, last_speech_timestamp=0.0,
+                )
+            results.append((segments, detected_language))
+    return results
+
+
+batcher = WindowBatcher()
@@ -0,0 +1,120 @@
+"""Compare transcription backends on a fixture clip.
+
+Each backend runs in its own subprocess so peak RSS is measured in isolation.
+Reports model load time, real-time factor (transcribe seconds / audio seconds,
+lower is better), peak RSS and, when a reference transcript is given, WER.
+
+Usage:
+    python benchmarks/bench_backends.py --audio fixture.wav [--reference fixture.txt] \
+        [--model-size medium] [--backends whisper faster-whisper] [--language en]
+
+The clip should be a 16kHz mono WAV, the same signal audio.decode_audio feeds
+the pipeline (e.g. ffmpeg -i input -ac 1 -ar 16000 -c:a pcm_s16le clip.wav).
+"""
+
+import argparse
+import json
+import os
+import re
+import resource
+import subprocess
+import sys
+import time
+import wave
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+
+def _normalize(text: str) -> list:
+    return re.sub(r"[^\w\s']", " ", text.lower()).split()
+
+
+def word_error_rate(reference: str, hypothesis: str) -> float:
+    """Word-level Levenshtein distance divided by reference length."""
+    ref, hyp = _normalize(reference), _normalize(hypothesis)
+    if not ref:
+        return 0.0 if not hyp else 1.0
+    prev = list(range(len(hyp) + 1))
+    for i, r in enumerate(ref, 1):
+        cur = [i] + [0] * len(hyp)
+        for j, h in enumerate(hyp, 1):
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (r != h))
+        prev = cur
+    return prev[-1] / len(ref)
+
+
+def run_worker(args):
+    """Load and run one backend in this process, print a JSON result line."""
+    from transcribe import load_model, transcribe
+
+    start = time.perf_counter()
+    load_model(args.model_size, args.worker)
+    load_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    segments, language = transcribe(args.audio, args.model_size, args.language, args.worker)
+    transcribe_seconds = time.perf_counter() - start
+
+    # ru_maxrss is KiB on Linux
+    peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(json.dumps({
+        "backend": args.worker,
+        "load_seconds": load_seconds,
+        "transcribe_seconds": transcribe_seconds,
+        "peak_rss_mb": peak_rss_mb,
+        "language": language,
+        "segments": len(segments),
+        "words": sum(len(s.get("words", [])) for s in segments),
+        "text": " ".join(s.get("text", "").strip() for s in segments),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--audio", required=True, help="16kHz mono WAV fixture")
+    parser.add_argument("--reference", help="Plain-text reference transcript for WER")
+    parser.add_argument("--model-size", default="medium")
+    parser.add_argument("--language", default=None)
+    parser.add_argument("--backends", nargs="+", default=["whisper", "faster-whisper"])
+    parser.add_argument("--json", help="Also write results to this JSON file")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args)
+        return
+
+    with wave.open(args.audio, "rb") as w:
+        audio_seconds = w.getnframes() / w.getframerate()
+    reference = open(args.reference).read() if args.reference else None
+
+    results = []
+    for backend in args.backends:
+        cmd = [sys.executable, os.path.abspath(__file__), "--worker", backend,
+               "--audio", args.audio, "--model-size", args.model_size]
+        if args.language:
+            cmd += ["--language", args.language]
+        proc = subprocess.run(cmd, capture_output=True, text=True)
+        if proc.returncode != 0:
+            print(f"{backend}: failed\n{proc.stderr[-2000:]}", file=sys.stderr)
+            continue
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+        result["rtf"] = result["transcribe_seconds"] / audio_seconds if audio_seconds else 0.0
+        result["wer"] = word_error_rate(reference, result["text"]) if reference is not None else None
+        results.append(result)
+
+    print(f"audio: {args.audio} ({audio_seconds:.1f}s), model: {args.model_size}")
+    print(f"{'backend':<16} {'load_s':>7} {'run_s':>8} {'RTF':>6} {'peak_MB':>8} {'words':>6} {'WER':>6}")
+    for r in results:
+        wer = f"{r['wer']:.1%}" if r["wer"] is not None else "-"
+        print(f"{r['backend']:<16} {r['load_seconds']:7.1f} {r['transcribe_seconds']:8.1f} "
+              f"{r['rtf']:6.3f} {r['peak_rss_mb']:8.0f} {r['words']:6d} {wer:>6}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"audio_seconds": audio_seconds, "model_size": args.model_size, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
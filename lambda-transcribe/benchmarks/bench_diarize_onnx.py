@@ -0,0 +1,180 @@
+"""Parity and speed of the ONNX Runtime diarization backend against PyTorch.
+
+For each fixture speaker track (lambda-shared/benchmarks/fixtures.py) or a
+given clip, checks three things:
+
+- segmentation: max absolute difference of the PyanNet scores over the clip's
+  sliding windows, torch forward vs ONNX session;
+- embedding: lowest cosine similarity between torch and ONNX speaker
+  embeddings for every (window, active speaker) mask;
+- end to end: run_diarization with backend="torch" and backend="onnx", and
+  the fraction of speech frames (10ms) on which the two agree after matching
+  speaker labels.
+
+Also reports each backend's diarization time. Exits non-zero when any check
+is outside its tolerance, so it doubles as the parity test for a new export,
+onnxruntime or pyannote version. Needs HF_TOKEN and onnxruntime.
+
+Usage:
+    python benchmarks/bench_diarize_onnx.py [--suite quick|full] [--audio clip.wav] [--json out.json]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(os.path.dirname(HERE))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, os.path.join(ROOT, "lambda-shared", "benchmarks"))
+
+from fixtures import MATRIX, speaker_audio  # noqa: E402
+
+FRAME_SECONDS = 0.01
+SEGMENTATION_TOLERANCE = 1e-3   # max abs difference of log-probabilities
+EMBEDDING_TOLERANCE = 0.999     # min cosine similarity
+AGREEMENT_TOLERANCE = 0.99      # min frame agreement of the final turns
+
+
+def model_parity(pipeline, audio: np.ndarray) -> dict:
+    """Compare the ONNX stand-ins with the original torch forwards on the clip's windows."""
+    import torch
+
+    inference = pipeline._segmentation
+    segmentation = inference.model
+    embedding = pipeline._embedding.model_
+    window = segmentation.audio.get_num_samples(inference.duration)
+    step = segmentation.audio.get_num_samples(inference.step)
+
+    padded = np.pad(audio, (0, max(0, window - len(audio))))
+    starts = range(0, len(padded) - window + 1, step)
+    chunks = torch.from_numpy(np.stack([padded[s:s + window] for s in starts])).unsqueeze(1)
+
+    with torch.inference_mode():
+        torch_scores = type(segmentation).forward(segmentation, chunks)
+        onnx_scores = segmentation(chunks)
+        segmentation_diff = float((torch_scores - onnx_scores).abs().max())
+
+        # One mask per (window, speaker active in that window), as get_embeddings builds them
+        activity = inference.conversion(torch_scores)
+        pairs = [(c, s) for c in range(activity.shape[0]) for s in range(activity.shape[2])
+                 if activity[c, :, s].sum() > 0]
+        if pairs:
+            waveforms = chunks[[c for c, _ in pairs]]
+            masks = torch.stack([activity[c, :, s] for c, s in pairs]).float()
+            torch_embeddings = type(embedding).forward(embedding, waveforms, weights=masks)
+            onnx_embeddings = embedding(waveforms, weights=masks)
+            cosine = torch.nn.functional.cosine_similarity(torch_embeddings, onnx_embeddings, dim=1)
+            min_cosine = float(cosine.min())
+        else:
+            min_cosine = 1.0
+
+    return {
+        "windows": len(chunks),
+        "embedding_masks": len(pairs),
+        "segmentation_max_abs_diff": segmentation_diff,
+        "embedding_min_cosine": min_cosine,
+    }
+
+
+def frame_labels(turns, n_frames: int) -> np.ndarray:
+    labels = np.full(n_frames, -1, dtype=np.int32)
+    if turns is None:
+        return labels
+    for start, end, idx in zip(turns.starts, turns.ends, turns.label_idx):
+        labels[int(start / FRAME_SECONDS):int(end / FRAME_SECONDS)] = idx
+    return labels
+
+
+def agreement(reference, hypothesis, duration: float) -> float:
+    """Share of frames where either backend has a speaker and both agree, under the best label mapping."""
+    from scipy.optimize import linear_sum_assignment
+
+    n_frames = int(duration / FRAME_SECONDS) + 1
+    ref = frame_labels(reference, n_frames)
+    hyp = frame_labels(hypothesis, n_frames)
+    active = (ref >= 0) | (hyp >= 0)
+    if not active.any():
+        return 1.0
+    n = max(ref.max(), hyp.max()) + 2
+    confusion = np.zeros((n, n), dtype=np.int64)
+    np.add.at(confusion, (ref[active] + 1, hyp[active] + 1), 1)
+    # Row/column 0 is "no speaker": keep it fixed, match the speakers
+    rows, cols = linear_sum_assignment(-confusion[1:, 1:])
+    matched = confusion[0, 0] + confusion[rows + 1, cols + 1].sum()
+    return float(matched / active.sum())
+
+
+def run_clip(label: str, audio: np.ndarray, pipeline) -> dict:
+    from diarize import run_diarization
+
+    duration = len(audio) / 16000
+    result = {"clip": label, "audio_seconds": duration, **model_parity(pipeline, audio)}
+    turns = {}
+    for backend in ("torch", "onnx"):
+        start = time.perf_counter()
+        turns[backend] = run_diarization(audio, backend=backend)
+        result[f"{backend}_seconds"] = time.perf_counter() - start
+        result[f"{backend}_speakers"] = len(turns[backend].speakers) if turns[backend] is not None else 0
+    result["frame_agreement"] = agreement(turns["torch"], turns["onnx"], duration)
+    result["ok"] = (
+        result["segmentation_max_abs_diff"] <= SEGMENTATION_TOLERANCE
+        and result["embedding_min_cosine"] >= EMBEDDING_TOLERANCE
+        and result["frame_agreement"] >= AGREEMENT_TOLERANCE
+    )
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--suite", choices=sorted(MATRIX), default="quick")
+    parser.add_argument("--audio", help="16kHz mono WAV to use instead of the fixture matrix")
+    parser.add_argument("--json", help="Also write results to this JSON file")
+    args = parser.parse_args()
+
+    if not os.environ.get("HF_TOKEN"):
+        sys.exit("HF_TOKEN not set")
+
+    from audio import load_wav
+    from diarize import load_pipeline
+
+    if args.audio:
+        clips = [(os.path.basename(args.audio), load_wav(args.audio))]
+    else:
+        clips = [(fixture.id, speaker_audio(fixture)) for fixture in MATRIX[args.suite]]
+
+    load_pipeline(backend="torch")
+    start = time.perf_counter()
+    pipeline = load_pipeline(backend="onnx")
+    load_seconds = time.perf_counter() - start
+    if not hasattr(pipeline, "onnx"):
+        sys.exit("ONNX Runtime backend failed to load, see the log above")
+    print(f"onnx load (export or cached): {load_seconds:.1f}s")
+
+    results = [run_clip(label, audio, pipeline) for label, audio in clips]
+
+    print(f"{'clip':<20} {'audio_s':>8} {'seg_diff':>9} {'emb_cos':>8} {'agree':>7} "
+          f"{'torch_s':>8} {'onnx_s':>7} {'speedup':>8} {'spk':>5}  ok")
+    for r in results:
+        speedup = r["torch_seconds"] / r["onnx_seconds"] if r["onnx_seconds"] > 0 else float("inf")
+        print(
+            f"{r['clip']:<20} {r['audio_seconds']:8.1f} {r['segmentation_max_abs_diff']:9.1e} "
+            f"{r['embedding_min_cosine']:8.5f} {r['frame_agreement']:7.2%} {r['torch_seconds']:8.2f} "
+            f"{r['onnx_seconds']:7.2f} {speedup:7.2f}x {r['torch_speakers']:>2}/{r['onnx_speakers']:<2}  "
+            f"{'yes' if r['ok'] else 'NO'}"
+        )
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"onnx_load_seconds": load_seconds, "results": results}, f, indent=2)
+
+    if not all(r["ok"] for r in results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
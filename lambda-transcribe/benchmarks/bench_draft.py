@@ -0,0 +1,123 @@
+"""Time-to-draft vs time-to-final for draft mode on the benchmark fixtures.
+
+Runs process_transcription in this process on each fixture's speaker track
+(lambda-shared/benchmarks/fixtures.py) or on a given clip, once as a normal
+job and once with "draft": true. Download and decode are replaced by the
+in-memory samples and callbacks go to a local signature-checking sink, so
+the times are when each callback arrived, measured from job start. Both
+models are loaded before timing starts.
+
+Needs the Whisper weights for both model sizes (and HF_TOKEN for
+diarization, which is otherwise skipped in both runs).
+
+Usage:
+    python benchmarks/bench_draft.py [--suite quick|full] [--audio clip.wav] \
+        [--model-size medium] [--draft-model small] [--backend whisper] [--json out.json]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(os.path.dirname(HERE))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, os.path.join(ROOT, "lambda-shared", "benchmarks"))
+
+from fakes import CallbackSink  # noqa: E402
+from fixtures import MATRIX, speaker_audio  # noqa: E402
+
+CALLBACK_SECRET = "bench-secret"
+
+
+def _arrival(received: list, statuses: tuple, start: float):
+    for delivery in received:
+        if delivery["status"] in statuses:
+            return round(delivery["at"] - start, 2)
+    return None
+
+
+def run_job(handler, audio, label: str, sink: CallbackSink, args, draft: bool) -> dict:
+    handler.decode_audio = lambda path, recording_id: audio
+    event = {
+        "recording_id": f"bench-{label}-{'draft' if draft else 'final'}",
+        "audio_url": "bench://audio",
+        "callback_url": sink.url,
+        "callback_secret": CALLBACK_SECRET,
+        "model_size": args.model_size,
+        "backend": args.backend,
+        "language": args.language,
+        "draft": draft,
+        "draft_model_size": args.draft_model,
+    }
+    sink.received.clear()
+    start = time.time()
+    result = handler.process_transcription(event)
+    return {
+        "fixture": label,
+        "mode": "draft" if draft else "final-only",
+        "status": result["status"],
+        "draft_seconds": _arrival(sink.received, ("draft",), start),
+        "final_seconds": _arrival(sink.received, ("success", "error"), start),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--suite", choices=sorted(MATRIX), default="quick")
+    parser.add_argument("--audio", help="16kHz mono WAV to use instead of the fixture matrix")
+    parser.add_argument("--model-size", default="medium")
+    parser.add_argument("--draft-model", default="small")
+    parser.add_argument("--backend", default=None)
+    parser.add_argument("--language", default="en")
+    parser.add_argument("--json", help="Also write results to this JSON file")
+    args = parser.parse_args()
+
+    import handler
+    from audio import audio_duration, load_wav
+    from result_cache import cache as result_cache
+    from transcribe import load_model
+
+    # Every run must do the full work
+    result_cache.enabled = False
+    handler.download_audio = lambda url, recording_id: ("bench://audio", {"bytes": 0})
+
+    if args.audio:
+        clips = [(os.path.basename(args.audio), load_wav(args.audio))]
+    else:
+        clips = [(fixture.id, speaker_audio(fixture)) for fixture in MATRIX[args.suite]]
+
+    load_model(args.draft_model, args.backend)
+    load_model(args.model_size, args.backend)
+
+    sink = CallbackSink(CALLBACK_SECRET)
+    results = []
+    try:
+        for label, audio in clips:
+            for draft in (False, True):
+                result = run_job(handler, audio, label, sink, args, draft)
+                result["audio_seconds"] = audio_duration(audio)
+                results.append(result)
+    finally:
+        sink.close()
+
+    print(f"model: {args.model_size}, draft model: {args.draft_model}")
+    print(f"{'fixture':<20} {'audio_s':>8} {'mode':<11} {'draft_s':>8} {'final_s':>8} {'draft/final':>11}")
+    for r in results:
+        draft = f"{r['draft_seconds']:8.1f}" if r["draft_seconds"] is not None else f"{'-':>8}"
+        final = f"{r['final_seconds']:8.1f}" if r["final_seconds"] is not None else f"{'-':>8}"
+        ratio = (
+            f"{r['draft_seconds'] / r['final_seconds']:11.0%}"
+            if r["draft_seconds"] is not None and r["final_seconds"] else f"{'-':>11}"
+        )
+        print(f"{r['fixture']:<20} {r['audio_seconds']:8.1f} {r['mode']:<11} {draft} {final} {ratio}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"model_size": args.model_size, "draft_model": args.draft_model, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
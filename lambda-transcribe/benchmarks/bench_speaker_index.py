@@ -0,0 +1,117 @@
+"""Benchmark speaker assignment on synthetic long meetings.
+
+Compares the original per-segment rescan of every speaker turn against the
+SpeakerTurns interval index, checks they agree on segment speakers, and prints
+how both scale with meeting length.
+
+Usage:
+    python benchmarks/bench_speaker_index.py [--hours 0.5 1 2 4] [--speakers 6] [--long-turn]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from speaker_index import SpeakerTurns, assign_speakers  # noqa: E402
+
+
+def make_meeting(hours: float, num_speakers: int, seed: int = 0, long_turn: bool = False):
+    """
+    Generate synthetic diarization turns and Whisper segments.
+
+    Roughly matches a real all-hands: ~0.55 turns/s and ~0.4 segments/s,
+    with occasional overlapping speech and a few words per segment. With
+    long_turn, one extra turn spans the whole meeting (the worst case for a
+    running-max-of-ends index without turn splitting).
+    """
+    rng = random.Random(seed)
+    total = hours * 3600
+
+    turns = []
+    t = 0.0
+    while t < total:
+        length = rng.uniform(0.5, 3.5)
+        speaker = f"SPEAKER_{rng.randrange(num_speakers):02d}"
+        turns.append((t, min(t + length, total), speaker))
+        # Mostly gaps, sometimes overlap with the next turn
+        t += length + rng.uniform(-0.4, 0.6)
+        t = max(t, turns[-1][0] + 0.1)
+
+    if long_turn:
+        turns.insert(0, (0.0, total, "SPEAKER_BACKGROUND"))
+
+    segments = []
+    t = 0.0
+    while t < total:
+        length = rng.uniform(1.0, 4.0)
+        end = min(t + length, total)
+        n_words = max(1, int(length * 2.5))
+        step = (end - t) / n_words
+        words = [
+            {"word": f" w{i}", "start": t + i * step, "end": t + (i + 1) * step, "probability": 0.9}
+            for i in range(n_words)
+        ]
+        segments.append({"start": t, "end": end, "text": "x", "words": words})
+        t = end + rng.uniform(0.0, 1.0)
+
+    return turns, segments
+
+
+def legacy_assign(turns: list, segments: list) -> list:
+    """The original O(segments x turns) rescan, kept for comparison."""
+    labels = []
+    for seg in segments:
+        seg_start = seg.get("start", 0)
+        seg_end = seg.get("end", seg_start)
+        speaker_times = {}
+        for turn_start, turn_end, speaker in turns:
+            overlap = max(0, min(seg_end, turn_end) - max(seg_start, turn_start))
+            if overlap > 0:
+                speaker_times[speaker] = speaker_times.get(speaker, 0) + overlap
+        labels.append(max(speaker_times, key=speaker_times.get) if speaker_times else "SPEAKER_00")
+    return labels
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--hours", type=float, nargs="+", default=[0.25, 0.5, 1.0, 2.0])
+    parser.add_argument("--speakers", type=int, default=6)
+    parser.add_argument("--skip-legacy-above", type=float, default=2.0,
+                        help="Skip the legacy loop for meetings longer than this (hours)")
+    parser.add_argument("--long-turn", action="store_true",
+                        help="Add one turn spanning the whole meeting")
+    args = parser.parse_args()
+
+    print(f"{'hours':>6} {'turns':>7} {'segs':>6} {'words':>7} {'legacy_s':>9} {'index_s':>8} {'speedup':>8} {'agree':>6}")
+    for hours in args.hours:
+        turns, segments = make_meeting(hours, args.speakers, long_turn=args.long_turn)
+        n_words = sum(len(s["words"]) for s in segments)
+
+        legacy_s = None
+        expected = None
+        if hours <= args.skip_legacy_above:
+            t0 = time.perf_counter()
+            expected = legacy_assign(turns, segments)
+            legacy_s = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        index = SpeakerTurns(*zip(*turns))
+        assign_speakers(index, segments)
+        index_s = time.perf_counter() - t0
+
+        agree = "-"
+        if expected is not None:
+            matches = sum(seg["speaker"] == e for seg, e in zip(segments, expected))
+            agree = f"{matches / len(segments):.1%}"
+
+        legacy_str = f"{legacy_s:9.3f}" if legacy_s is not None else f"{'-':>9}"
+        speedup = f"{legacy_s / index_s:7.1f}x" if legacy_s else f"{'-':>8}"
+        print(f"{hours:6.2f} {len(turns):7d} {len(segments):6d} {n_words:7d} {legacy_str} {index_s:8.3f} {speedup} {agree:>6}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""Benchmark callback transcript formats on synthetic long meetings.
+
+Compares the current full format (transcript_json + transcript_utterances,
+which carry the same utterances twice) against the columnar compact and
+packed formats: JSON size, gzipped size, serialisation and decode time, and
+checks that from_compact() round-trips exactly.
+
+Usage:
+    python benchmarks/bench_transcript_format.py [--hours 0.5 1 2 4] [--speakers 6]
+"""
+
+import argparse
+import gzip
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from format_output import format_output, from_compact, to_compact  # noqa: E402
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+VOCAB = ["the", "we", "should", "pipeline", "next", "quarter", "deal", "pricing", "call",
+         "follow", "up", "on", "that", "customer", "renewal", "I", "think", "so", "yeah", "okay"]
+
+
+def make_segments(hours: float, num_speakers: int, seed: int = 0) -> list:
+    """Diarized Whisper-style segments at ~150 words per minute."""
+    rng = random.Random(seed)
+    total = hours * 3600
+    segments = []
+    t = 0.0
+    while t < total:
+        n_words = rng.randint(4, 25)
+        words = []
+        for _ in range(n_words):
+            length = rng.uniform(0.15, 0.6)
+            words.append({
+                "word": " " + rng.choice(VOCAB),
+                "start": t,
+                "end": t + length,
+                "score": rng.uniform(0.5, 1.0),
+                "probability": rng.uniform(0.5, 1.0),
+            })
+            t += length + rng.uniform(0.0, 0.1)
+        segments.append({
+            "start": words[0]["start"],
+            "end": words[-1]["end"],
+            "text": "".join(w["word"] for w in words),
+            "speaker": f"SPEAKER_{rng.randrange(num_speakers):02d}",
+            "confidence": rng.uniform(0.5, 1.0),
+            "words": words,
+        })
+        t += rng.uniform(0.2, 1.5)
+    return segments
+
+
+def serializers() -> dict:
+    funcs = {"json": lambda obj: json.dumps(obj).encode("utf-8")}
+    if orjson is not None:
+        funcs["orjson"] = orjson.dumps
+    return funcs
+
+
+def timed(fn, *args, repeat: int = 3):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn(*args)
+        best = min(best, time.perf_counter() - t0)
+    return out, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--hours", type=float, nargs="+", default=[0.5, 1.0, 2.0])
+    parser.add_argument("--speakers", type=int, default=6)
+    args = parser.parse_args()
+
+    print(f"{'hours':>6} {'words':>7} {'format':>7} {'encoder':>7} {'json_MB':>8} {'gzip_MB':>8} "
+          f"{'encode_ms':>10} {'decode_ms':>10} {'roundtrip':>9}")
+    for hours in args.hours:
+        _, transcript_json, utterances = format_output(make_segments(hours, args.speakers))
+        n_words = sum(len(u["words"]) for u in utterances)
+
+        payloads = {
+            "full": lambda: {"transcript_json": transcript_json, "transcript_utterances": utterances},
+            "compact": lambda: {"transcript_compact": to_compact(utterances)},
+            "packed": lambda: {"transcript_compact": to_compact(utterances, packed=True)},
+        }
+        for name, build in payloads.items():
+            for encoder, dumps in serializers().items():
+                # Encode time includes building the columnar form
+                body, encode_s = timed(lambda: dumps(build()))
+                compressed = gzip.compress(body, compresslevel=6)
+
+                decoded, decode_s = timed(lambda: json.loads(body))
+                roundtrip = "-"
+                if name != "full":
+                    restored, restore_s = timed(from_compact, decoded["transcript_compact"])
+                    decode_s += restore_s
+                    roundtrip = "ok" if restored == utterances else "MISMATCH"
+
+                print(f"{hours:6.2f} {n_words:7d} {name:>7} {encoder:>7} {len(body) / 1e6:8.2f} "
+                      f"{len(compressed) / 1e6:8.2f} {encode_s * 1000:10.1f} {decode_s * 1000:10.1f} {roundtrip:>9}")
+
+
+if __name__ == "__main__":
+    main()
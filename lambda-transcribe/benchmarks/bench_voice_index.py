@@ -0,0 +1,118 @@
+"""Benchmark the per-org voice index: index size vs enrollment and lookup time.
+
+Enrolls synthetic voices (random vectors at the WeSpeaker embedding size, several
+noisy samples each) into a temporary on-disk index in batches, times one more
+incremental add to the full index, then times top-k search for a single
+speaker and identify() for a whole meeting. Queries are noisy copies of
+enrolled voices, so the top-1 hit rate checks the search as well as timing it.
+
+Usage:
+    python benchmarks/bench_voice_index.py [--voices 1000 10000 50000] [--samples 2] \
+        [--dim 256] [--speakers 6] [--queries 200] [--json out.json]
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from voice_index import VoiceIndex  # noqa: E402
+
+ENROLL_BATCH = 1000  # samples per add() call while building
+
+
+def build_index(directory: str, voices: int, samples: int, dim: int, rng) -> tuple:
+    """Enroll `voices` voices with `samples` samples each. Returns (index, centres, seconds)."""
+    centres = rng.standard_normal((voices, dim)).astype(np.float32)
+    index = VoiceIndex(directory)
+    start = time.perf_counter()
+    for _ in range(samples):
+        # Same voice ids on every pass: later passes add samples to existing voices
+        noisy = centres + 0.3 * rng.standard_normal(centres.shape).astype(np.float32)
+        for first in range(0, voices, ENROLL_BATCH):
+            ids = [f"voice-{i}" for i in range(first, min(first + ENROLL_BATCH, voices))]
+            index.add_many(ids, noisy[first:first + ENROLL_BATCH], [f"Person {i}" for i in range(first, first + len(ids))])
+    return index, centres, time.perf_counter() - start
+
+
+def run_size(voices: int, args, rng) -> dict:
+    with tempfile.TemporaryDirectory() as directory:
+        index, centres, build_seconds = build_index(directory, voices, args.samples, args.dim, rng)
+
+        # One more enrollment into the full index, as POST /voices does it
+        start = time.perf_counter()
+        index.add("voice-new", rng.standard_normal(args.dim), name="New person")
+        add_seconds = time.perf_counter() - start
+
+        # Reopen from disk so search runs against the memory-mapped files
+        index = VoiceIndex(directory)
+        targets = rng.integers(0, voices, size=args.queries)
+        queries = centres[targets] + 0.3 * rng.standard_normal((args.queries, args.dim)).astype(np.float32)
+
+        index.search(queries[:1])  # warm the page cache
+        single = []
+        hits = 0
+        for target, query in zip(targets, queries):
+            start = time.perf_counter()
+            matches = index.search(query)[0]
+            single.append(time.perf_counter() - start)
+            hits += bool(matches) and matches[0][0] == f"voice-{target}"
+
+        meetings = []
+        for first in range(0, args.queries - args.speakers + 1, args.speakers):
+            speakers = {f"SPEAKER_{i:02d}": queries[first + i] for i in range(args.speakers)}
+            start = time.perf_counter()
+            index.identify(speakers, threshold=0.0)
+            meetings.append(time.perf_counter() - start)
+
+        single_ms = np.array(single) * 1000
+        meeting_ms = np.array(meetings) * 1000
+        return {
+            "voices": voices,
+            "samples": index.samples,
+            "index_mb": round(len(index.voices) * args.dim * 4 / 1e6, 1),
+            "bulk_enroll_us_per_sample": round(build_seconds / index.samples * 1e6, 1),
+            "add_ms": round(add_seconds * 1000, 2),
+            "search_p50_ms": round(float(np.percentile(single_ms, 50)), 3),
+            "search_p99_ms": round(float(np.percentile(single_ms, 99)), 3),
+            "identify_p50_ms": round(float(np.percentile(meeting_ms, 50)), 3) if len(meetings) else None,
+            "top1_hit_rate": hits / len(targets),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--voices", nargs="+", type=int, default=[1000, 10000, 50000])
+    parser.add_argument("--samples", type=int, default=2, help="Enrolled samples per voice")
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--speakers", type=int, default=6, help="Speakers per identify() call")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--json", help="Also write results to this JSON file")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    results = [run_size(voices, args, rng) for voices in args.voices]
+
+    print(f"{'voices':>8} {'samples':>8} {'MB':>7} {'bulk_us':>8} {'add':>9} {'search_p50':>11} "
+          f"{'search_p99':>11} {'identify_p50':>13} {'top1':>6}")
+    for r in results:
+        print(
+            f"{r['voices']:8d} {r['samples']:8d} {r['index_mb']:7.1f} {r['bulk_enroll_us_per_sample']:8.1f} "
+            f"{r['add_ms']:7.2f}ms "
+            f"{r['search_p50_ms']:9.3f}ms {r['search_p99_ms']:9.3f}ms {r['identify_p50_ms']:11.3f}ms "
+            f"{r['top1_hit_rate']:6.1%}"
+        )
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"samples_per_voice": args.samples, "dim": args.dim, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
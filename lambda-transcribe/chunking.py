@@ -0,0 +1,321 @@
+"""Chunked parallel transcription for long recordings.
+
+The 16kHz audio is split at low-energy (silence) frames near every
+TRANSCRIBE_CHUNK_SECONDS boundary. Chunks, padded with a little context on
+each side, are transcribed across a process pool. Segments and words are then
+shifted back to global time and trimmed to each chunk's core span, so words
+heard in the padding of two neighbouring chunks are kept exactly once.
+
+The language is detected once, on the first chunk, and passed to every
+worker so all chunks are decoded in the same language. Each pool worker holds
+its own copy of the Whisper model; those copies are reserved against
+MODEL_MEMORY_BUDGET_MB, and the pool is shrunk (or skipped) when the budget
+cannot hold one copy per worker.
+"""
+
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from audio import SAMPLE_RATE, as_array
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SECONDS = float(os.environ.get("TRANSCRIBE_CHUNK_SECONDS", "300"))
+CHUNK_WORKERS = int(os.environ.get("TRANSCRIBE_CHUNK_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+SEARCH_SECONDS = 15.0   # look this far either side of a target boundary for silence
+PAD_SECONDS = 1.0       # context added on both sides of each chunk
+FRAME_SECONDS = 0.03    # energy frame length
+
+# Persistent pool so workers keep their models loaded between jobs
+_pool = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+
+def frame_energy(audio: np.ndarray, sr: int = SAMPLE_RATE, frame_seconds: float = FRAME_SECONDS) -> np.ndarray:
+    """RMS energy per non-overlapping frame (vectorised)."""
+    frame_len = max(1, int(sr * frame_seconds))
+    n_frames = len(audio) // frame_len
+    if n_frames == 0:
+        return np.zeros(0, dtype=np.float32)
+    frames = audio[: n_frames * frame_len].reshape(n_frames, frame_len)
+    return np.sqrt(np.mean(frames * frames, axis=1))
+
+
+def find_split_points(audio: np.ndarray, chunk_seconds: float = CHUNK_SECONDS,
+                      sr: int = SAMPLE_RATE, search_seconds: float = SEARCH_SECONDS) -> list:
+    """
+    Choose chunk boundaries (in samples) at the quietest frame near each target.
+
+    Returns:
+        Sorted boundaries including 0 and len(audio).
+    """
+    total = len(audio)
+    chunk_len = int(chunk_seconds * sr)
+    if chunk_len <= 0 or total <= chunk_len:
+        return [0, total]
+
+    frame_len = max(1, int(sr * FRAME_SECONDS))
+    energy = frame_energy(audio, sr)
+    # Smooth over ~0.3s so a single quiet frame inside a word doesn't win
+    kernel = np.ones(10, dtype=np.float32) / 10
+    smoothed = np.convolve(energy, kernel, mode="same") if len(energy) >= len(kernel) else energy
+
+    search = int(search_seconds * sr) // frame_len
+    points = [0]
+    target = chunk_len
+    while target < total - chunk_len // 4:
+        centre = target // frame_len
+        lo = max(points[-1] // frame_len + 1, centre - search)
+        hi = min(len(smoothed), centre + search + 1)
+        if hi > lo:
+            split = (lo + int(np.argmin(smoothed[lo:hi]))) * frame_len
+        else:
+            split = target
+        points.append(split)
+        target = split + chunk_len
+    points.append(total)
+    return points
+
+
+def stitch_chunks(chunk_results: list) -> list:
+    """
+    Merge per-chunk segments into one global timeline.
+
+    Args:
+        chunk_results: List of dicts with 'offset' (seconds the chunk audio starts at),
+            'core_start'/'core_end' (global seconds this chunk owns) and 'segments'
+            (chunk-relative Whisper segments).
+
+    Returns:
+        Segments with global timestamps, boundary duplicates removed.
+    """
+    merged = []
+    for chunk in chunk_results:
+        offset, core_start, core_end = chunk["offset"], chunk["core_start"], chunk["core_end"]
+
+        def owned(start, end):
+            mid = (start + end) / 2
+            return core_start <= mid < core_end
+
+        for seg in chunk["segments"]:
+            seg = dict(seg)
+            seg["start"] = seg.get("start", 0.0) + offset
+            seg["end"] = seg.get("end", 0.0) + offset
+            words = seg.get("words") or []
+            if words:
+                kept = []
+                for w in words:
+                    w = dict(w)
+                    if "start" in w and "end" in w:
+                        w["start"] += offset
+                        w["end"] += offset
+                        if not owned(w["start"], w["end"]):
+                            continue
+                    kept.append(w)
+                if not kept:
+                    continue
+                timed = [w for w in kept if "start" in w and "end" in w]
+                if timed:
+                    seg["start"] = timed[0]["start"]
+                    seg["end"] = timed[-1]["end"]
+                if len(kept) != len(words):
+                    seg["text"] = "".join(w.get("word", "") for w in kept)
+                seg["words"] = kept
+            elif not owned(seg["start"], seg["end"]):
+                continue
+            merged.append(seg)
+
+    merged.sort(key=lambda s: s["start"])
+    for i, seg in enumerate(merged):
+        seg["id"] = i
+    return merged
+
+
+def _init_worker(threads: int):
+    """Give each pool process an equal share of cores and room for a single model."""
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+    os.environ["OMP_NUM_THREADS"] = str(threads)
+
+    from model_manager import models
+    # The parent reserves one model copy per worker; keep it that way across model sizes
+    models.budget_bytes = 1
+
+
+def _transcribe_chunk(audio: np.ndarray, model_size: str, language: str, backend: str) -> tuple:
+    """Pool task: transcribe one chunk (model stays cached in the worker process)."""
+    from transcribe import transcribe
+
+    start = time.time()
+    segments, detected_language = transcribe(audio, model_size, language, backend)
+    return segments, detected_language, time.time() - start
+
+
+def _get_pool(workers: int, model_bytes: int) -> ProcessPoolExecutor:
+    global _pool, _pool_workers
+    from model_manager import models
+
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=True)
+            threads = max(1, (os.cpu_count() or workers) // workers)
+            # spawn, not fork: forking a process with live torch/OpenMP threads can deadlock
+            _pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(threads,),
+            )
+            _pool_workers = workers
+            logger.info(f"Started chunk pool: {workers} workers x {threads} threads")
+        models.reserve("chunk-pool", workers * model_bytes)
+        return _pool
+
+
+def shutdown_pool():
+    """Stop the chunk pool's worker processes (server shutdown) and release their budget."""
+    global _pool, _pool_workers
+    from model_manager import models
+
+    with _pool_lock:
+        if _pool is None:
+            return
+        _pool.shutdown(wait=True, cancel_futures=True)
+        _pool = None
+        _pool_workers = 0
+        models.reserve("chunk-pool", 0)
+        logger.info("Stopped chunk pool")
+
+
+def _budget_workers(workers: int, model_size: str, backend: str) -> tuple:
+    """
+    Shrink the pool so one model copy per worker fits in MODEL_MEMORY_BUDGET_MB.
+
+    Returns:
+        (workers, bytes per worker model), sized from the copy resident in this
+        process (which detect_language loaded).
+    """
+    from model_manager import models
+    from transcribe import load_model
+
+    model_bytes = models.bytes_of(load_model(model_size, backend))
+    headroom = models.headroom_bytes(excluding="chunk-pool")
+    if headroom is not None and model_bytes > 0:
+        fits = max(0, headroom // model_bytes)
+        if fits < workers:
+            logger.warning(
+                f"Chunk workers capped at {fits} (of {workers}): {model_bytes / 1e6:,.0f} MB per worker model, "
+                f"{headroom / 1e6:,.0f} MB left in MODEL_MEMORY_BUDGET_MB"
+            )
+            workers = fits
+    return max(1, workers), model_bytes
+
+
+def transcribe_chunked(audio, model_size: str = "medium", language: str = None,
+                       backend: str = None, workers: int = None,
+                       chunk_seconds: float = CHUNK_SECONDS, on_chunk=None) -> tuple:
+    """
+    Transcribe a long recording as silence-aligned chunks in parallel.
+
+    Args:
+        audio: 16kHz float32 samples (from audio.decode_audio) or a WAV path.
+        model_size, language, backend: As for transcribe.transcribe().
+        workers: Pool size (defaults to TRANSCRIBE_CHUNK_WORKERS, capped by the model
+            memory budget). With 1 worker the chunks run one by one in this process,
+            reusing its loaded model.
+        chunk_seconds: Target chunk length.
+        on_chunk: Optional callable(index, segments, core_end_seconds), called in
+            timeline order as soon as each chunk (and every chunk before it) is done,
+            with that chunk's segments in global time.
+
+    Returns:
+        Tuple of (segments_with_words, detected_language, stats) where stats reports
+        chunk count, wall time, summed per-chunk time and their ratio (parallelism).
+    """
+    workers = max(1, workers or CHUNK_WORKERS)
+    audio = as_array(audio)
+    points = find_split_points(audio, chunk_seconds)
+    pad = int(PAD_SECONDS * SAMPLE_RATE)
+
+    start = time.time()
+    bounds = []
+    for core_start, core_end in zip(points[:-1], points[1:]):
+        bounds.append((max(0, core_start - pad), core_start, core_end, min(len(audio), core_end + pad)))
+
+    if workers > 1 and len(bounds) > 1:
+        if not language:
+            # One language for the whole recording, rather than each worker guessing per chunk
+            from transcribe import detect_language
+            first_start, _, _, first_end = bounds[0]
+            language = detect_language(np.asarray(audio[first_start:first_end]), model_size, backend)
+        workers, model_bytes = _budget_workers(workers, model_size, backend)
+    else:
+        workers = 1
+    logger.info(f"Chunked transcription: {len(bounds)} chunks, {workers} workers, language={language or 'auto'}")
+
+    if workers == 1:
+        def run_in_process():
+            # Lazily, so each chunk is reported before the next one starts; the first
+            # chunk's detected language is used for the rest
+            chunk_language = language
+            for chunk_start, _, _, chunk_end in bounds:
+                result = _transcribe_chunk(np.asarray(audio[chunk_start:chunk_end]), model_size, chunk_language, backend)
+                chunk_language = chunk_language or result[1]
+                yield result
+
+        results = run_in_process()
+    else:
+        pool = _get_pool(workers, model_bytes)
+        futures = [
+            pool.submit(_transcribe_chunk, np.array(audio[chunk_start:chunk_end]), model_size, language, backend)
+            for chunk_start, _, _, chunk_end in bounds
+        ]
+        results = (future.result() for future in futures)
+
+    chunk_results = []
+    detected_language = language
+    chunk_seconds_sum = 0.0
+    for index, ((chunk_start, core_start, core_end, _), result) in enumerate(zip(bounds, results)):
+        segments, chunk_language, elapsed = result
+        chunk_seconds_sum += elapsed
+        detected_language = detected_language or chunk_language
+        chunk_results.append({
+            "offset": chunk_start / SAMPLE_RATE,
+            "core_start": core_start / SAMPLE_RATE,
+            # Last chunk owns everything up to the end, including a word straddling it
+            "core_end": core_end / SAMPLE_RATE if core_end < len(audio) else float("inf"),
+            "segments": segments,
+        })
+        if on_chunk is not None:
+            on_chunk(index, stitch_chunks(chunk_results[-1:]), core_end / SAMPLE_RATE)
+
+    segments = stitch_chunks(chunk_results)
+    wall_seconds = time.time() - start
+    detected_language = detected_language or "en"
+
+    stats = {
+        "mode": "chunked",
+        "chunks": len(chunk_results),
+        "workers": workers,
+        "wall_seconds": round(wall_seconds, 2),
+        "chunk_seconds_sum": round(chunk_seconds_sum, 2),
+        # Summed per-chunk time over wall time: how many chunks ran at once, not a speed-up
+        # over whole-file decoding (workers contend for cores, so each chunk runs slower)
+        "parallelism": round(chunk_seconds_sum / wall_seconds, 2) if wall_seconds > 0 else 1.0,
+    }
+    logger.info(
+        f"Chunked transcription complete: {len(segments)} segments, "
+        f"{stats['workers']} workers, parallelism {stats['parallelism']}x in {stats['wall_seconds']}s"
+    )
+    return segments, detected_language, stats
@@ -1,48 +1,71 @@
-"""Speaker diarization using pyannote.audio."""
+"""Speaker diarization using pyannote.audio.
+
+The pipeline's segmentation and embedding models run on PyTorch ("torch",
+default) or through ONNX Runtime ("onnx", see diarize_onnx.py); clustering and
+everything after it is the same either way.
+"""
 
 import logging
 import os
 
-from pyannote.audio import Pipeline
+from audio import SAMPLE_RATE
+from model_manager import models
+from speaker_index import SpeakerTurns, assign_speakers
 
 logger = logging.getLogger(__name__)
 
-# Cache diarization model across requests
-_diarize_model = None
+PIPELINE_NAME = "pyannote/speaker-diarization-3.1"
+DIARIZE_BACKEND = os.environ.get("DIARIZE_BACKEND", "torch")
+BACKENDS = ("torch", "onnx")
+
+
+def _load(hf_token: str, backend: str):
+    # Imported on use so DIARIZE_BACKEND can be read (result_cache) without loading torch
+    from pyannote.audio import Pipeline
+
+    pipeline = Pipeline.from_pretrained(PIPELINE_NAME, use_auth_token=hf_token)
+    if backend == "onnx":
+        # Optional dependency — a failed export or missing onnxruntime keeps the torch models
+        from diarize_onnx import use_onnx_runtime
+        try:
+            use_onnx_runtime(pipeline)
+        except Exception as e:
+            logger.error(f"ONNX Runtime diarization unavailable, using PyTorch: {e}", exc_info=True)
+    return pipeline
+
+
+def load_pipeline(hf_token: str = None, backend: str = None):
+    """Return the pyannote diarization pipeline for backend, loading it through the shared cache."""
+    hf_token = hf_token or os.environ.get("HF_TOKEN")
+    if not hf_token:
+        raise RuntimeError("HF_TOKEN not set")
+    backend = backend or DIARIZE_BACKEND
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown diarization backend: {backend} (expected one of {list(BACKENDS)})")
+    key = f"pyannote:{PIPELINE_NAME}" if backend == "torch" else f"pyannote:{PIPELINE_NAME}:{backend}"
+    return models.get(key, lambda: _load(hf_token, backend))
 
 
-def diarize(wav_path: str, segments: list, num_speakers: int = None) -> list:
+def run_diarization(audio, num_speakers: int = None, backend: str = None):
     """
-    Assign speaker labels to transcript segments using pyannote diarization.
+    Run pyannote diarization on the audio alone (no transcript needed).
 
     Args:
-        wav_path: Path to 16kHz mono WAV file.
-        segments: Whisper transcript segments (from transcribe()).
+        audio: 16kHz float32 samples (from audio.decode_audio) or a WAV path.
         num_speakers: Optional hint for expected number of speakers.
+        backend: 'torch' or 'onnx'. Defaults to DIARIZE_BACKEND.
 
     Returns:
-        List of segments with 'speaker' field assigned (e.g., 'SPEAKER_00').
+        Indexed SpeakerTurns (with one embedding per speaker), or None when
+        diarization is unavailable or failed (callers fall back to a single speaker).
     """
-    global _diarize_model
-
-    if not segments:
-        logger.warning("No segments to diarize")
-        return segments
-
     hf_token = os.environ.get("HF_TOKEN")
     if not hf_token:
         logger.warning("HF_TOKEN not set - skipping diarization, using SPEAKER_00 for all")
-        for seg in segments:
-            seg["speaker"] = "SPEAKER_00"
-        return segments
+        return None
 
-    # Load diarization model (cached across requests)
-    if _diarize_model is None:
-        logger.info("Loading pyannote diarization model")
-        _diarize_model = Pipeline.from_pretrained(
-            "pyannote/speaker-diarization-3.1",
-            use_auth_token=hf_token
-        )
+    # Load diarization model (cached across requests, LRU-evicted under memory budget)
+    pipeline = load_pipeline(hf_token, backend)
 
     # Run diarization
     diarize_kwargs = {}
@@ -53,38 +76,68 @@ def diarize(wav_path: str, segments: list, num_speakers: int = None) -> list:
         logger.info("Diarizing with automatic speaker detection")
 
     try:
-        diarization = _diarize_model(wav_path, **diarize_kwargs)
-
-        # Assign speakers to segments based on overlap
-        for seg in segments:
-            seg_start = seg.get("start", 0)
-            seg_end = seg.get("end", seg_start)
-
-            # Find speaker with most overlap in this segment
-            speaker_times = {}
-            for turn, _, speaker in diarization.itertracks(yield_label=True):
-                overlap_start = max(seg_start, turn.start)
-                overlap_end = min(seg_end, turn.end)
-                overlap = max(0, overlap_end - overlap_start)
-                if overlap > 0:
-                    speaker_times[speaker] = speaker_times.get(speaker, 0) + overlap
-
-            if speaker_times:
-                dominant_speaker = max(speaker_times, key=speaker_times.get)
-                seg["speaker"] = dominant_speaker
-            else:
-                seg["speaker"] = "SPEAKER_00"
-
-        # Count unique speakers
-        speakers = set(seg.get("speaker", "SPEAKER_00") for seg in segments)
-        logger.info(f"Diarization complete: {len(speakers)} speakers detected")
-
-        return segments
+        if isinstance(audio, str):
+            pipeline_input = audio
+        else:
+            # In-memory input: pyannote expects a (channel, time) tensor
+            import torch
+            pipeline_input = {"waveform": torch.from_numpy(audio).unsqueeze(0), "sample_rate": SAMPLE_RATE}
+        # Centroids come from the clustering step anyway; they identify recurring speakers (voice_index.py)
+        diarization, centroids = pipeline(pipeline_input, return_embeddings=True, **diarize_kwargs)
+
+        # Index speaker turns once so the join with the transcript is cheap
+        turns = SpeakerTurns.from_annotation(diarization, centroids)
+        logger.info(f"Indexed {len(turns)} speaker turns ({len(turns.speakers)} speakers)")
+        return turns
 
     except Exception as e:
         logger.error(f"Diarization failed: {e}", exc_info=True)
-        # Fallback: assign all segments to SPEAKER_00
+        return None
+
+
+def assign_segments(segments: list, turns) -> list:
+    """
+    Join step: label transcript segments (and words) with diarized speakers.
+
+    Args:
+        segments: Whisper transcript segments (from transcribe()).
+        turns: SpeakerTurns from run_diarization(), or None for single-speaker fallback.
+
+    Returns:
+        List of segments with 'speaker' field assigned (e.g., 'SPEAKER_00').
+        Timestamped words also get a per-word 'speaker'.
+    """
+    if turns is None:
         logger.warning("Falling back to single-speaker assignment")
         for seg in segments:
             seg["speaker"] = "SPEAKER_00"
         return segments
+
+    assign_speakers(turns, segments)
+
+    # Count unique speakers
+    speakers = set(seg.get("speaker", "SPEAKER_00") for seg in segments)
+    logger.info(f"Diarization complete: {len(speakers)} speakers detected")
+    return segments
+
+
+def diarize(audio, segments: list, num_speakers: int = None) -> list:
+    """
+    Assign speaker labels to transcript segments using pyannote diarization.
+
+    Sequential convenience wrapper around run_diarization() + assign_segments().
+
+    Args:
+        audio: 16kHz float32 samples (from audio.decode_audio) or a WAV path.
+        segments: Whisper transcript segments (from transcribe()).
+        num_speakers: Optional hint for expected number of speakers.
+
+    Returns:
+        List of segments with 'speaker' field assigned (e.g., 'SPEAKER_00').
+        Timestamped words also get a per-word 'speaker'.
+    """
+    if not segments:
+        logger.warning("No segments to diarize")
+        return segments
+
+    return assign_segments(segments, run_diarization(audio, num_speakers))
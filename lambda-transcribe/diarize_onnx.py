@@ -0,0 +1,203 @@
+"""ONNX Runtime execution for the pyannote segmentation and embedding models.
+
+On CPU, speaker-diarization-3.1 spends nearly all of its time in two networks:
+the PyanNet segmentation model over sliding 10s windows, and the WeSpeaker
+ResNet34 embedding model over every (window, speaker) pair. Both are exported
+to ONNX once, cached on disk under a fingerprint of their weights, and run
+through ONNX Runtime sessions with their own intra-op thread pool in place of
+the torch forward passes. Everything else in the pipeline (window aggregation,
+fbank features, clustering, reconstruction) is unchanged, so the output is the
+torch pipeline's up to float rounding.
+
+Each model is exported for its fixed window shape with a dynamic batch axis;
+a call with any other shape runs the original torch forward instead.
+"""
+
+import functools
+import hashlib
+import logging
+import os
+
+import numpy as np
+import torch
+
+logger = logging.getLogger(__name__)
+
+ONNX_CACHE_DIR = os.environ.get(
+    "DIARIZE_ONNX_CACHE",
+    os.path.join(os.environ.get("XDG_CACHE_HOME", "/tmp"), "pyannote-onnx"),
+)
+# Intra-op threads per session; 0 = half the cores when diarization runs alongside
+# transcription (PIPELINE_CONCURRENT, as the handler does for torch), else all of them
+ONNX_THREADS = int(os.environ.get("DIARIZE_ONNX_THREADS", "0"))
+# Windows (segmentation) and (window, speaker) pairs (embedding) per session run
+ONNX_BATCH_SIZE = int(os.environ.get("DIARIZE_ONNX_BATCH_SIZE", "32"))
+ONNX_OPSET = 17
+
+
+def intra_op_threads() -> int:
+    if ONNX_THREADS > 0:
+        return ONNX_THREADS
+    cores = os.cpu_count() or 1
+    if os.environ.get("PIPELINE_CONCURRENT", "1") == "1":
+        return max(1, cores // 2)
+    return cores
+
+
+def _session_options():
+    import onnxruntime as ort
+
+    options = ort.SessionOptions()
+    options.intra_op_num_threads = intra_op_threads()
+    options.inter_op_num_threads = 1
+    options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    # Idle workers sleep rather than spin, so they don't steal cores from Whisper running alongside
+    options.add_session_config_entry("session.intra_op.allow_spinning", "0")
+    return options
+
+
+def _fingerprint(module: torch.nn.Module) -> str:
+    """Hash of the weights, export opset and torch version: a changed model never reuses a stale export."""
+    digest = hashlib.sha1(f"{type(module).__name__}:{ONNX_OPSET}:{torch.__version__}".encode())
+    for name, tensor in sorted(module.state_dict().items()):
+        digest.update(name.encode())
+        digest.update(tensor.detach().cpu().contiguous().numpy().tobytes())
+    return digest.hexdigest()[:16]
+
+
+def export_onnx(module: torch.nn.Module, name: str, example_inputs: tuple,
+                input_names: list, output_name: str) -> str:
+    """
+    Export module to ONNX (batch axis dynamic) unless a matching export is already cached.
+
+    Returns:
+        Path of the .onnx file.
+    """
+    os.makedirs(ONNX_CACHE_DIR, exist_ok=True)
+    path = os.path.join(ONNX_CACHE_DIR, f"{name}-{_fingerprint(module)}.onnx")
+    if os.path.exists(path):
+        logger.info(f"Using cached ONNX export {path}")
+        return path
+
+    # Export to a temporary name so a concurrent process never loads a partial file
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    module.eval()
+    with torch.no_grad():
+        torch.onnx.export(
+            module,
+            example_inputs,
+            tmp_path,
+            input_names=input_names,
+            output_names=[output_name],
+            dynamic_axes={n: {0: "batch"} for n in input_names + [output_name]},
+            opset_version=ONNX_OPSET,
+            do_constant_folding=True,
+        )
+    os.replace(tmp_path, path)
+    logger.info(f"Exported {name} to {path} ({os.path.getsize(path) / 1e6:.1f} MB)")
+    return path
+
+
+class OrtForward:
+    """An ONNX Runtime session standing in for a torch forward at its exported shape."""
+
+    def __init__(self, path: str, example_inputs: tuple, fallback):
+        import onnxruntime as ort
+
+        self.session = ort.InferenceSession(path, sess_options=_session_options(), providers=["CPUExecutionProvider"])
+        self.input_names = [i.name for i in self.session.get_inputs()]
+        self.shapes = [tuple(t.shape[1:]) for t in example_inputs]
+        self.fallback = fallback
+        self.calls = 0
+        self.fallbacks = 0
+
+    def __call__(self, *inputs):
+        if any(tuple(t.shape[1:]) != shape for t, shape in zip(inputs, self.shapes)):
+            self.fallbacks += 1
+            return self.fallback(*inputs)
+        self.calls += 1
+        feeds = {
+            name: np.ascontiguousarray(t.detach().cpu().numpy(), dtype=np.float32)
+            for name, t in zip(self.input_names, inputs)
+        }
+        return torch.from_numpy(self.session.run(None, feeds)[0])
+
+
+class _EmbeddingHead(torch.nn.Module):
+    """WeSpeaker ResNet from fbank features and frame weights to the speaker embedding."""
+
+    def __init__(self, resnet: torch.nn.Module):
+        super().__init__()
+        self.resnet = resnet
+
+    def forward(self, fbank, weights):
+        return self.resnet(fbank, weights=weights)[1]
+
+
+def _segmentation_to_onnx(pipeline) -> OrtForward:
+    inference = pipeline._segmentation
+    model = inference.model
+    num_samples = model.audio.get_num_samples(inference.duration)
+    example = (torch.zeros(2, getattr(model.hparams, "num_channels", 1), num_samples),)
+
+    path = export_onnx(model, "segmentation", example, ["waveforms"], "scores")
+    ort_forward = OrtForward(path, example, functools.partial(type(model).forward, model))
+    # Inference calls model(chunks); an instance attribute shadows the class forward
+    model.forward = ort_forward
+    return ort_forward
+
+
+def _embedding_to_onnx(pipeline, frames: int) -> OrtForward:
+    embedding = pipeline._embedding
+    model = getattr(embedding, "model_", None)
+    if model is None or not hasattr(model, "resnet") or not hasattr(model, "compute_fbank"):
+        raise RuntimeError(f"Embedding {type(embedding).__name__} is not a WeSpeaker ResNet, keeping PyTorch")
+
+    num_samples = model.audio.get_num_samples(pipeline._segmentation.duration)
+    with torch.no_grad():
+        fbank = model.compute_fbank(torch.zeros(2, 1, num_samples))
+    example = (fbank, torch.ones(2, frames))
+
+    head = _EmbeddingHead(model.resnet)
+    path = export_onnx(head, "embedding", example, ["fbank", "weights"], "embeddings")
+    ort_head = OrtForward(path, example, head.forward)
+    original_forward = functools.partial(type(model).forward, model)
+
+    def forward(waveforms, weights=None):
+        # fbank stays in torch (kaldi-compatible features do not export); only the ResNet runs in ONNX
+        if weights is None:
+            return original_forward(waveforms)
+        return ort_head(model.compute_fbank(waveforms), weights)
+
+    model.forward = forward
+    return ort_head
+
+
+def use_onnx_runtime(pipeline, batch_size: int = ONNX_BATCH_SIZE):
+    """
+    Route a loaded SpeakerDiarization pipeline's model forwards through ONNX Runtime, in place.
+
+    Windows are batched batch_size at a time for both models. Raises when
+    onnxruntime is missing or an export fails; the pipeline is then left
+    running on PyTorch for whichever model was not converted.
+
+    Returns:
+        The pipeline (with an `onnx` attribute holding the two OrtForward stand-ins).
+    """
+    import onnxruntime  # noqa: F401 — fail before exporting anything
+
+    segmentation = _segmentation_to_onnx(pipeline)
+    with torch.no_grad():
+        frames = segmentation(torch.zeros(1, *segmentation.shapes[0])).shape[1]
+    segmentation.calls = 0
+    embedding = _embedding_to_onnx(pipeline, frames)
+
+    pipeline.segmentation_batch_size = batch_size
+    pipeline.embedding_batch_size = batch_size
+    pipeline.onnx = {"segmentation": segmentation, "embedding": embedding}
+    logger.info(
+        f"Diarization models on ONNX Runtime: {intra_op_threads()} intra-op threads, "
+        f"batch size {batch_size}, cache {ONNX_CACHE_DIR}"
+    )
+    return pipeline
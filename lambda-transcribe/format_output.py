@@ -5,14 +5,22 @@ Produces three output formats:
 2. transcript_json: {"utterances": [...]} with full metadata
 3. utterances: Raw array of utterance objects
 
+to_compact() packs utterances into a columnar form for large callbacks:
+parallel arrays of millisecond ints, confidences scaled by 10,000 and speaker
+numbers, optionally packed as base64 little-endian int32 blocks.
+from_compact() restores the exact utterance list.
+
 The transcript_text format matches what the frontend expects:
   - MeetingDetail.tsx splits by newline
   - Parses each line for "Name: text" pattern using regex
   - Speaker labels are "Speaker N" (numeric index)
 """
 
+import base64
 import logging
 
+import numpy as np
+
 logger = logging.getLogger(__name__)
 
 
@@ -50,19 +58,20 @@ def format_output(diarized_segments: list) -> tuple:
         for w in segment.get("words", []):
             # Only include words with valid timestamps
             if "start" in w and "end" in w:
+                # float(): openai-whisper times are np.float64, which round() keeps
                 words.append({
                     "word": w["word"],
-                    "start": round(w["start"], 3),
-                    "end": round(w["end"], 3),
-                    "confidence": round(w.get("score", 0.0), 4),
+                    "start": round(float(w["start"]), 3),
+                    "end": round(float(w["end"]), 3),
+                    "confidence": round(float(w.get("score", 0.0)), 4),
                 })
 
         utterance = {
             "speaker": speaker_num,
-            "start": round(segment.get("start", 0.0), 3),
-            "end": round(segment.get("end", 0.0), 3),
+            "start": round(float(segment.get("start", 0.0)), 3),
+            "end": round(float(segment.get("end", 0.0)), 3),
             "text": text,
-            "confidence": round(segment.get("confidence", 0.0), 4),
+            "confidence": round(float(segment.get("confidence", 0.0)), 4),
             "words": words,
         }
         utterances.append(utterance)
@@ -78,3 +87,97 @@ def format_output(diarized_segments: list) -> tuple:
     )
 
     return transcript_text, transcript_json, utterances
+
+
+COMPACT_VERSION = 1
+CONFIDENCE_SCALE = 10000  # confidences are rounded to 4 decimals
+# Numeric columns of the compact format (everything else is a list of strings)
+UTTERANCE_INT_COLUMNS = ("speaker", "start_ms", "end_ms", "confidence", "word_count")
+WORD_INT_COLUMNS = ("start_ms", "end_ms", "confidence")
+
+
+def to_compact(utterances: list, packed: bool = False) -> dict:
+    """
+    Convert utterances to parallel arrays.
+
+    Times become integer milliseconds and confidences integers in
+    [0, 10000]; both are exact given the rounding in format_output, so
+    from_compact() round-trips. Words of all utterances share one set of
+    columns, sliced per utterance by "word_count".
+
+    Args:
+        utterances: Utterance list from format_output.
+        packed: Encode numeric columns as base64 int32 (little-endian)
+            instead of JSON arrays — smaller, and much faster to serialize.
+    """
+    u_cols = {name: [] for name in UTTERANCE_INT_COLUMNS}
+    u_text = []
+    w_cols = {name: [] for name in WORD_INT_COLUMNS}
+    w_text = []
+
+    for u in utterances:
+        u_cols["speaker"].append(u["speaker"])
+        u_cols["start_ms"].append(round(u["start"] * 1000))
+        u_cols["end_ms"].append(round(u["end"] * 1000))
+        u_cols["confidence"].append(round(u["confidence"] * CONFIDENCE_SCALE))
+        u_cols["word_count"].append(len(u["words"]))
+        u_text.append(u["text"])
+        for w in u["words"]:
+            w_text.append(w["word"])
+            w_cols["start_ms"].append(round(w["start"] * 1000))
+            w_cols["end_ms"].append(round(w["end"] * 1000))
+            w_cols["confidence"].append(round(w["confidence"] * CONFIDENCE_SCALE))
+
+    if packed:
+        u_cols = {name: _pack(values) for name, values in u_cols.items()}
+        w_cols = {name: _pack(values) for name, values in w_cols.items()}
+
+    return {
+        "version": COMPACT_VERSION,
+        "packed": packed,
+        "utterances": {**u_cols, "text": u_text},
+        "words": {**w_cols, "word": w_text},
+    }
+
+
+def from_compact(compact: dict) -> list:
+    """Rebuild the format_output utterance list from to_compact() output."""
+    if compact.get("version") != COMPACT_VERSION:
+        raise ValueError(f"Unsupported compact transcript version: {compact.get('version')}")
+
+    u, w = compact["utterances"], compact["words"]
+    if compact.get("packed"):
+        u = {**u, **{name: _unpack(u[name]) for name in UTTERANCE_INT_COLUMNS}}
+        w = {**w, **{name: _unpack(w[name]) for name in WORD_INT_COLUMNS}}
+
+    utterances = []
+    offset = 0
+    for i, text in enumerate(u["text"]):
+        end = offset + u["word_count"][i]
+        words = [
+            {
+                "word": w["word"][j],
+                "start": w["start_ms"][j] / 1000,
+                "end": w["end_ms"][j] / 1000,
+                "confidence": w["confidence"][j] / CONFIDENCE_SCALE,
+            }
+            for j in range(offset, end)
+        ]
+        offset = end
+        utterances.append({
+            "speaker": u["speaker"][i],
+            "start": u["start_ms"][i] / 1000,
+            "end": u["end_ms"][i] / 1000,
+            "text": text,
+            "confidence": u["confidence"][i] / CONFIDENCE_SCALE,
+            "words": words,
+        })
+    return utterances
+
+
+def _pack(values: list) -> str:
+    return base64.b64encode(np.asarray(values, dtype="<i4").tobytes()).decode("ascii")
+
+
+def _unpack(block: str) -> list:
+    return np.frombuffer(base64.b64decode(block), dtype="<i4").tolist()
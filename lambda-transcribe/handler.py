@@ -1,5 +1,5 @@
 """
-Transcription handler: Download audio → Transcribe (WhisperX) → Diarize (pyannote) → Callback.
+Transcription handler: Download audio → Transcribe (WhisperX) ∥ Diarize (pyannote) → Align → Callback.
 
 Core logic used by both Railway server (server.py) and Lambda handler.
 
@@ -12,25 +12,63 @@ Expected event payload:
     "callback_secret": "shared-hmac-secret",
     "language": "en",          # optional, auto-detect if omitted
     "model_size": "medium",    # small | medium | large-v3
-    "num_speakers": null       # optional hint for diarization
+    "backend": "whisper",      # optional: whisper | faster-whisper (CTranslate2 int8)
+    "num_speakers": null,      # optional hint for diarization
+    "org_id": "uuid",          # optional: name speakers matching the org's enrolled voices (voice_index.py)
+    "diarize_backend": "torch", # optional: torch | onnx (ONNX Runtime segmentation + embedding)
+    "chunked": false,          # optional: split at silences and transcribe chunks in parallel
+    "stream_download": false,  # optional: pipe the download into ffmpeg while it downloads
+    "audio_ranges": false,     # optional: video-only jobs fetch just the MP4's audio track
+    "transcript_format": "full", # optional: full | compact | packed (columnar transcript_compact)
+    "progressive": false,      # optional: send partial callbacks as each window is transcribed
+    "trim_silence": false,     # optional: skip long non-speech gaps before Whisper (TRANSCRIBE_TRIM_SILENCE)
+    "draft": false             # optional: send a provisional small-model transcript before the final one
+                               # (takes precedence over progressive)
 }
 """
 
-import hashlib
-import hmac
-import json
 import logging
 import os
-import subprocess
+import threading
 import time
-
-import requests
-
-from download import cleanup_temp_files, download_audio
-from format_output import format_output
+from concurrent.futures import ThreadPoolExecutor
+
+from audio import audio_duration, decode_audio
+from audio_ranges import fetch_audio_track
+from callback_client import send_callback
+from download import cleanup_temp_files, download_audio, stream_audio
+from format_output import format_output, to_compact
+from result_cache import cache as result_cache, cache_key
+from speech_trim import TRIM_SILENCE, find_speech
+from tracing import Trace, metrics
+from voice_index import VOICE_INDEX_DIR, index_for
 
 logger = logging.getLogger(__name__)
 
+# Run Whisper and pyannote side by side (set to 0 to run them one after the other)
+PIPELINE_CONCURRENT = os.environ.get("PIPELINE_CONCURRENT", "1") == "1"
+# torch's intra-op thread count is process-global, so it is set once (to half the
+# cores when the stages run side by side) rather than per job
+_torch_threads_configured = False
+_torch_threads_lock = threading.Lock()
+# Pipe the download into ffmpeg instead of writing the input to /tmp first
+# (per-job override: "stream_download"). Needs a streamable container — MP4s
+# without +faststart cannot be demuxed from a pipe.
+STREAM_DOWNLOAD = os.environ.get("DOWNLOAD_STREAM_DECODE", "0") == "1"
+# Video-only jobs: range-read just the audio chunks of the MP4 (per-job override:
+# "audio_ranges"); falls back to the full download for other containers
+AUDIO_RANGES = os.environ.get("DOWNLOAD_AUDIO_RANGES", "0") == "1"
+# Transcript shape in the callback (per-job override: "transcript_format"):
+# full = transcript_json + transcript_utterances; compact/packed = one columnar
+# transcript_compact instead (see format_output.to_compact)
+TRANSCRIPT_FORMAT = os.environ.get("TRANSCRIPT_FORMAT", "full")
+# Progressive mode: window length for unchunked jobs (chunked jobs report per chunk)
+PROGRESSIVE_WINDOW_SECONDS = float(os.environ.get("PROGRESSIVE_WINDOW_SECONDS", "120"))
+PARTIAL_CALLBACK_ATTEMPTS = 2  # a lost partial is superseded by the next one
+# Draft mode ("draft": true): a quick pass with this model is sent as a provisional
+# callback before the requested model's final transcript (per-job: "draft_model_size")
+DRAFT_MODEL_SIZE = os.environ.get("TRANSCRIBE_DRAFT_MODEL", "small")
+
 
 def process_transcription(event: dict) -> dict:
     """
@@ -41,11 +79,14 @@ def process_transcription(event: dict) -> dict:
     logger.info(f"Transcribing recording: {recording_id}")
 
     start_time = time.time()
+    trace = Trace()
     result = {
         "recording_id": recording_id,
         "status": "error",
         "error": None,
     }
+    draft_model = _draft_model(event)
+    partials = _PartialCallbacks(event, start_time) if event.get("progressive") or draft_model else None
 
     try:
         # Prefer audio_url over video_url (smaller file, faster download)
@@ -53,44 +94,115 @@ def process_transcription(event: dict) -> dict:
         if not audio_url:
             raise ValueError("No audio_url or video_url provided")
 
-        # Step 1: Download audio
-        local_path = download_audio(audio_url, recording_id)
-        logger.info(f"Downloaded audio to {local_path}")
-
-        # Step 2: Convert to WAV 16kHz mono (WhisperX requirement)
-        wav_path = convert_to_wav(local_path, recording_id)
-        logger.info(f"Converted to WAV: {wav_path}")
-
-        # Step 3: Transcribe with WhisperX (lazy import — heavy ML libraries)
-        from transcribe import transcribe
-        model_size = event.get("model_size", "medium")
-        language = event.get("language")
-        segments, detected_language = transcribe(wav_path, model_size, language)
-        logger.info(f"Transcribed {len(segments)} segments, language: {detected_language}")
-
-        # Step 4: Speaker diarization with pyannote (lazy import — heavy ML libraries)
-        from diarize import diarize
-        num_speakers = event.get("num_speakers")
-        diarized_segments = diarize(wav_path, segments, num_speakers)
-        logger.info(f"Diarized {len(diarized_segments)} segments")
-
-        # Step 5: Format output
-        transcript_text, transcript_json, utterances = format_output(diarized_segments)
-
-        # Step 6: Get audio duration
-        duration_seconds = get_audio_duration(wav_path)
-
-        # Build success result
-        result["status"] = "success"
-        result["transcript_text"] = transcript_text
-        result["transcript_json"] = transcript_json
-        result["transcript_utterances"] = utterances
-        result["duration_seconds"] = duration_seconds
-        result["language"] = detected_language
-        result["word_count"] = len(transcript_text.split())
-        result["speaker_count"] = len(set(u["speaker"] for u in utterances))
-        result["processing_seconds"] = int(time.time() - start_time)
+        # Steps 1+2: Download, then decode once to 16kHz mono float32 shared by every stage below.
+        # For a video-only job the audio track can be fetched on its own with range requests;
+        # in streaming mode the download is piped straight into ffmpeg so decoding overlaps it.
+        use_ranges = event.get("audio_ranges")
+        if use_ranges is None:
+            use_ranges = AUDIO_RANGES
+        stream_download = event.get("stream_download")
+        if stream_download is None:
+            stream_download = STREAM_DOWNLOAD
+
+        local_path = None
+        if use_ranges and not event.get("audio_url"):
+            try:
+                with trace.span("download_ranges") as span:
+                    local_path, download_stats = fetch_audio_track(audio_url, recording_id)
+                    span["bytes"] = download_stats["bytes"]
+            except Exception as e:
+                logger.warning(f"Audio range fetch not possible, downloading the whole file: {e}")
+
+        if local_path is None and stream_download:
+            download_stats = {}
+            with trace.span("download_decode") as span:
+                audio = decode_audio(
+                    None, recording_id,
+                    stdin_feed=lambda sink: download_stats.update(stream_audio(audio_url, sink)),
+                )
+                span["bytes"] = download_stats.get("bytes")
+        else:
+            if local_path is None:
+                with trace.span("download") as span:
+                    local_path, download_stats = download_audio(audio_url, recording_id)
+                    span["bytes"] = download_stats["bytes"]
+            logger.info(f"Downloaded audio to {local_path}")
+
+            with trace.span("decode", download_stats["bytes"]):
+                audio = decode_audio(local_path, recording_id)
+        result["download"] = download_stats
+        trace.media_seconds = audio_duration(audio)
+
+        # Content-addressed cache: identical audio + settings → reuse the stored result
+        with trace.span("cache_lookup", audio.nbytes):
+            key = cache_key(audio, event)
+            cached = result_cache.get(key)
+
+        if cached is not None:
+            result.update(cached)
+            result["status"] = "success"
+            result["cache"] = "hit"
+        else:
+            # Steps 3+4: Transcribe (Whisper) and diarize (pyannote) — both only need the audio
+            segments, detected_language, transcription_stats, turns = _run_model_stages(
+                audio, event, trace,
+                # A complete draft would be overwritten by the shorter partials that follow it
+                on_partial=partials.send if event.get("progressive") and not draft_model else None,
+                on_draft=(lambda segs, lang: partials.send_draft(segs, lang, draft_model)) if draft_model else None,
+            )
+            logger.info(f"Transcribed {len(segments)} segments, language: {detected_language}")
+
+            # Join: assign diarized speakers to transcript segments and words
+            from diarize import assign_segments
+            with trace.span("align"):
+                diarized_segments = assign_segments(segments, turns)
+            logger.info(f"Diarized {len(diarized_segments)} segments")
+
+            # Step 5: Format output
+            with trace.span("format"):
+                transcript_text, transcript_json, utterances = format_output(diarized_segments)
+
+            # Build success result
+            result["status"] = "success"
+            result["transcript_text"] = transcript_text
+            result["transcript_json"] = transcript_json
+            result["transcript_utterances"] = utterances
+            result["duration_seconds"] = trace.media_seconds
+            result["language"] = detected_language
+            result["word_count"] = len(transcript_text.split())
+            result["speaker_count"] = len(set(u["speaker"] for u in utterances))
+            if turns is not None and turns.embeddings:
+                # One voice embedding per transcript speaker, for identification and enrollment
+                speakers = set(seg["speaker"] for seg in diarized_segments)
+                result["speaker_embeddings"] = {
+                    label: [round(float(x), 5) for x in vector]
+                    for label, vector in turns.embeddings.items() if label in speakers
+                }
+            if transcription_stats:
+                result["transcription_stats"] = transcription_stats
+            result["silence_skipped_seconds"] = (transcription_stats or {}).get("trim", {}).get("skipped_seconds", 0.0)
+            result["cache"] = "miss"
+            # Don't cache single-speaker fallbacks from a failed or skipped diarization
+            if turns is not None:
+                result_cache.put(key, result)
+
+        # Name recurring speakers against the org's enrolled voices (after the cache: the index changes)
+        if event.get("org_id") and VOICE_INDEX_DIR and result.get("speaker_embeddings"):
+            try:
+                with trace.span("identify"):
+                    result["speaker_identities"] = index_for(event["org_id"]).identify(result["speaker_embeddings"])
+                logger.info(f"Identified {len(result['speaker_identities'])} of {len(result['speaker_embeddings'])} speakers")
+            except Exception as e:
+                logger.warning(f"Speaker identification failed: {e}")
+
+        transcript_format = event.get("transcript_format") or TRANSCRIPT_FORMAT
+        if transcript_format != "full":
+            with trace.span("compact"):
+                utterances = result.pop("transcript_utterances")
+                del result["transcript_json"]
+                result["transcript_compact"] = to_compact(utterances, packed=transcript_format == "packed")
 
+        result["processing_seconds"] = int(time.time() - start_time)
         logger.info(
             f"Transcription complete: {result['word_count']} words, "
             f"{result['speaker_count']} speakers, "
@@ -106,77 +218,246 @@ def process_transcription(event: dict) -> dict:
         # Always clean up temp files
         cleanup_temp_files(recording_id)
 
-        # Always send callback (success or error)
-        _send_callback(event["callback_url"], event["callback_secret"], result)
+        # Partials go out first, so the final callback is always the last one received
+        if partials is not None:
+            result.update(partials.close())
+
+        if event.get("batch_id"):
+            result["batch"] = {
+                "batch_id": event["batch_id"],
+                "latency_seconds": round(time.time() - event["batch_accepted_at"], 2),
+            }
+
+        # Always send callback (success or error), with whatever stages completed
+        result["timings"] = trace.as_dict()
+        with trace.span("callback"):
+            result["callback"] = send_callback(event["callback_url"], event["callback_secret"], result)
+        metrics.observe_trace(trace, result["status"])
+        logger.info(f"Stage timings: {trace.summary()}")
 
     return result
 
 
-# Legacy Lambda entry point
-def lambda_handler(event, context):
-    return process_transcription(event)
+def _draft_model(event: dict):
+    """Model for the provisional draft pass, or None when draft mode is off or pointless."""
+    if not event.get("draft"):
+        return None
+    draft_model = event.get("draft_model_size") or DRAFT_MODEL_SIZE
+    if draft_model == (event.get("model_size") or "medium"):
+        return None
+    return draft_model
 
 
-def convert_to_wav(input_path: str, recording_id: str) -> str:
-    """Convert audio/video to WAV 16kHz mono for WhisperX."""
-    wav_path = f"/tmp/{recording_id}_audio.wav"
-
-    cmd = [
-        "ffmpeg",
-        "-i", input_path,
-        "-ar", "16000",      # 16kHz sample rate
-        "-ac", "1",           # Mono
-        "-c:a", "pcm_s16le",  # 16-bit PCM
-        "-y",                 # Overwrite
-        wav_path,
-    ]
-
-    subprocess.run(cmd, capture_output=True, check=True, timeout=300)
-    logger.info(f"Converted to WAV: {os.path.getsize(wav_path):,} bytes")
-    return wav_path
-
-
-def get_audio_duration(wav_path: str) -> float:
-    """Get duration of audio file in seconds using ffprobe."""
-    cmd = [
-        "ffprobe",
-        "-v", "quiet",
-        "-show_entries", "format=duration",
-        "-of", "default=noprint_wrappers=1:nokey=1",
-        wav_path,
-    ]
-
-    result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
-    try:
-        return round(float(result.stdout.strip()), 2)
-    except (ValueError, AttributeError):
-        logger.warning("Could not determine audio duration")
-        return 0.0
-
-
-def _send_callback(callback_url: str, secret: str, payload: dict):
-    """Send callback to edge function with HMAC-SHA256 signature."""
-    body = json.dumps(payload)
-    signature = hmac.new(
-        secret.encode("utf-8"),
-        body.encode("utf-8"),
-        hashlib.sha256,
-    ).hexdigest()
-
-    headers = {
-        "Content-Type": "application/json",
-        "X-Callback-Signature": signature,
-    }
+def _configure_torch_threads():
+    """Halve torch's intra-op threads for concurrent stages, the first time they run in this process."""
+    global _torch_threads_configured
+    with _torch_threads_lock:
+        if _torch_threads_configured:
+            return
+        import torch
 
-    try:
-        response = requests.post(
-            callback_url,
-            data=body,
-            headers=headers,
-            timeout=30,
+        threads = max(1, torch.get_num_threads() // 2)
+        torch.set_num_threads(threads)
+        _torch_threads_configured = True
+    logger.info(f"torch intra-op threads set to {threads} for concurrent transcribe/diarize stages")
+
+
+def _run_model_stages(audio, event: dict, trace: Trace, on_partial=None, on_draft=None) -> tuple:
+    """
+    Run transcription and diarization, concurrently unless PIPELINE_CONCURRENT=0.
+
+    In concurrent mode torch intra-op threads are halved, once per process, so
+    the two passes share the cores instead of oversubscribing them (chunked
+    transcription runs in its own process pool and is unaffected).
+
+    With on_partial, transcription runs window by window (or chunk by chunk when
+    chunked) and on_partial(index, segments, window_end) is called in order as
+    each window finishes.
+
+    With on_draft, a DRAFT_MODEL_SIZE pass over the same audio runs first (alongside
+    diarization) and on_draft(segments, language) gets its result before the requested
+    model starts; its detected language is reused for the final pass.
+
+    With trim_silence, diarization runs first and transcription after it: the
+    speaker turns decide which quiet stretches are speech, so they are needed
+    before any audio is cut.
+
+    Returns:
+        (segments, detected_language, transcription_stats, speaker_turns)
+    """
+    # Lazy imports — heavy ML libraries
+    from diarize import run_diarization
+    from transcribe import transcribe
+
+    model_size = event.get("model_size", "medium")
+    language = event.get("language")
+    backend = event.get("backend")
+    num_speakers = event.get("num_speakers")
+    diarize_backend = event.get("diarize_backend")
+    trim_silence = event.get("trim_silence")
+    if trim_silence is None:
+        trim_silence = TRIM_SILENCE
+
+    def transcribe_stage(turns=None):
+        transcription_stats = None
+        # Transcribe a speech-only copy of the audio; timestamps are mapped back below
+        speech_map = None
+        speech = audio
+        if trim_silence:
+            with trace.span("trim", audio.nbytes):
+                speech_map = find_speech(audio, turns=turns)
+                if speech_map is not None:
+                    speech = speech_map.compact(audio)
+
+        on_window = on_partial
+        if speech_map is not None and on_partial is not None:
+            def on_window(index, segments, window_end):
+                on_partial(
+                    index, speech_map.remap_segments(segments),
+                    float(speech_map.to_original(window_end, ends=True)),
+                )
+
+        final_language = language
+        if on_draft is not None:
+            draft_model = _draft_model(event)
+            with trace.span("draft", speech.nbytes):
+                draft_segments, draft_language = transcribe(speech, draft_model, language, backend)
+            if speech_map is not None:
+                speech_map.remap_segments(draft_segments)
+            on_draft(draft_segments, draft_language)
+            final_language = language or draft_language
+
+        with trace.span("transcribe", speech.nbytes):
+            if event.get("batch_id"):
+                # /transcribe/batch: windows share batched Whisper passes with other recordings
+                from batch import batcher
+                segments, detected_language, transcription_stats = batcher.transcribe(
+                    speech, model_size, final_language
+                )
+            elif event.get("chunked"):
+                from chunking import transcribe_chunked
+                segments, detected_language, transcription_stats = transcribe_chunked(
+                    speech, model_size, final_language, backend, on_chunk=on_window
+                )
+            elif on_window is not None:
+                from chunking import transcribe_chunked
+                segments, detected_language, transcription_stats = transcribe_chunked(
+                    speech, model_size, final_language, backend, workers=1,
+                    chunk_seconds=PROGRESSIVE_WINDOW_SECONDS, on_chunk=on_window,
+                )
+            else:
+                segments, detected_language = transcribe(speech, model_size, final_language, backend)
+
+        if speech_map is not None:
+            speech_map.remap_segments(segments)
+            transcription_stats = {**(transcription_stats or {}), "trim": speech_map.stats()}
+        return segments, detected_language, transcription_stats
+
+    def diarize_stage():
+        with trace.span("diarize", audio.nbytes):
+            return run_diarization(audio, num_speakers, diarize_backend)
+
+    models_start = time.time()
+    if trim_silence:
+        turns = diarize_stage()
+        segments, detected_language, transcription_stats = transcribe_stage(turns)
+    elif not PIPELINE_CONCURRENT:
+        segments, detected_language, transcription_stats = transcribe_stage()
+        turns = diarize_stage()
+    else:
+        _configure_torch_threads()
+        with ThreadPoolExecutor(max_workers=2, thread_name_prefix="stage") as pool:
+            transcribe_future = pool.submit(transcribe_stage)
+            diarize_future = pool.submit(diarize_stage)
+            segments, detected_language, transcription_stats = transcribe_future.result()
+            turns = diarize_future.result()
+    trace.add("models_wall", time.time() - models_start)
+
+    logger.info(
+        f"Model stages: transcribe {trace.seconds('transcribe')}s, diarize {trace.seconds('diarize')}s, "
+        f"wall {trace.seconds('models_wall')}s "
+        f"({'concurrent' if PIPELINE_CONCURRENT and not trim_silence else 'sequential'})"
+    )
+    return segments, detected_language, transcription_stats, turns
+
+
+class _PartialCallbacks:
+    """
+    Progressive and draft modes: signed partial callbacks, sent in order on a background thread.
+
+    Each partial carries the undiarized transcript so far (so a lost partial is
+    covered by the next), a sequence number and is_final=False. close() waits for
+    them and returns the fields that mark the main callback as the final one.
+    """
+
+    def __init__(self, event: dict, start_time: float):
+        self.callback_url = event["callback_url"]
+        self.callback_secret = event["callback_secret"]
+        self.recording_id = event["recording_id"]
+        self.start_time = start_time
+        self.sequence = 0
+        self.lines = []
+        self.first_partial_seconds = None
+        self.draft_seconds = None
+        self._sender = ThreadPoolExecutor(max_workers=1, thread_name_prefix="partial")
+        self._lock = threading.Lock()
+
+    def send_draft(self, segments: list, language: str, model_size: str):
+        """Send the whole-recording draft transcript from the quick model, flagged provisional."""
+        transcript_text = "\n".join(seg["text"].strip() for seg in segments if seg.get("text", "").strip())
+        with self._lock:
+            payload = {
+                "recording_id": self.recording_id,
+                "status": "draft",
+                "provisional": True,
+                "sequence": self.sequence,
+                "is_final": False,
+                "model_size": model_size,
+                "language": language,
+                "transcript_text": transcript_text,
+                "word_count": len(transcript_text.split()),
+            }
+            self.sequence += 1
+            self.draft_seconds = round(time.time() - self.start_time, 2)
+        logger.info(f"Draft ({model_size}) after {self.draft_seconds}s: {payload['word_count']} words")
+        self._sender.submit(send_callback, self.callback_url, self.callback_secret, payload)
+
+    def send(self, index: int, segments: list, window_end: float):
+        with self._lock:
+            self.lines.extend(seg["text"].strip() for seg in segments if seg.get("text", "").strip())
+            transcript_text = "\n".join(self.lines)
+            payload = {
+                "recording_id": self.recording_id,
+                "status": "partial",
+                "sequence": self.sequence,
+                "is_final": False,
+                "window_end_seconds": round(window_end, 2),
+                "transcript_text": transcript_text,
+                "word_count": len(transcript_text.split()),
+            }
+            self.sequence += 1
+            if self.first_partial_seconds is None:
+                self.first_partial_seconds = round(time.time() - self.start_time, 2)
+        logger.info(f"Partial {payload['sequence']}: transcript up to {payload['window_end_seconds']}s")
+        self._sender.submit(
+            send_callback, self.callback_url, self.callback_secret, payload,
+            max_attempts=PARTIAL_CALLBACK_ATTEMPTS,
         )
-        logger.info(f"Callback sent: {response.status_code}")
-        if response.status_code >= 400:
-            logger.error(f"Callback failed: {response.text[:500]}")
-    except Exception as e:
-        logger.error(f"Callback request failed: {e}")
+
+    def close(self) -> dict:
+        self._sender.shutdown(wait=True)
+        return {
+            "sequence": self.sequence,
+            "is_final": True,
+            "partials": {
+                "count": self.sequence,
+                "first_partial_seconds": self.first_partial_seconds,
+                "draft_seconds": self.draft_seconds,
+            },
+        }
+
+
+# Legacy Lambda entry point
+def lambda_handler(event, context):
+    return process_transcription(event)
+
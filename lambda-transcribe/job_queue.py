@@ -0,0 +1,169 @@
+"""Bounded in-process job queue with a fixed pool of worker threads.
+
+Each transcription job loads Whisper + pyannote and pins several cores, so the
+server only runs `workers` jobs at once and holds at most `max_queued` more.
+Submitting beyond that raises QueueFull so the API can answer 429.
+"""
+
+import itertools
+import logging
+import queue
+import threading
+import time
+from typing import Callable
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFull(Exception):
+    """Raised when the job queue is at capacity."""
+
+
+class ShuttingDown(Exception):
+    """Raised when a job is submitted after drain has started."""
+
+
+class JobQueue:
+    """
+    Priority queue (FIFO within a priority) drained by a fixed worker pool.
+
+    Higher `priority` values run first. Wait time is measured from submit to
+    the moment a worker picks the job up.
+    """
+
+    def __init__(self, handler: Callable[[dict], object], workers: int = 1, max_queued: int = 10):
+        self._handler = handler
+        self._workers = max(1, workers)
+        self._max_queued = max(0, max_queued)
+        self._queue = queue.PriorityQueue()
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._threads = []
+        self._accepting = False
+
+        # Stats (guarded by _lock)
+        self._queued = 0
+        self._active = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._last_wait = 0.0
+
+    def start(self):
+        """Start worker threads. Safe to call once."""
+        with self._lock:
+            if self._threads:
+                return
+            self._accepting = True
+            for i in range(self._workers):
+                t = threading.Thread(target=self._worker, name=f"transcribe-worker-{i}", daemon=True)
+                t.start()
+                self._threads.append(t)
+        logger.info(f"Job queue started: {self._workers} workers, {self._max_queued} queue slots")
+
+    def submit(self, job: dict, priority: int = 0, job_id: str = None) -> int:
+        """
+        Enqueue a job.
+
+        Returns:
+            Queue position (0 = will start as soon as a worker frees up).
+
+        Raises:
+            QueueFull: No free worker and the queue is at max_queued.
+            ShuttingDown: drain() has been called.
+        """
+        with self._lock:
+            if not self._accepting:
+                raise ShuttingDown("Server is shutting down")
+            free_workers = self._workers - self._active
+            if self._queued - free_workers >= self._max_queued:
+                self._rejected += 1
+                raise QueueFull(f"Queue full ({self._queued} queued, {self._active} active)")
+            position = max(0, self._queued - free_workers)
+            self._queued += 1
+            # Negate priority: PriorityQueue pops the smallest entry first
+            self._queue.put((-priority, next(self._seq), time.monotonic(), job_id, job))
+        return position
+
+    def _worker(self):
+        while True:
+            _, _, enqueued_at, job_id, job = self._queue.get()
+            if job is None:
+                self._queue.task_done()
+                return
+
+            wait = time.monotonic() - enqueued_at
+            with self._lock:
+                self._queued -= 1
+                self._active += 1
+                self._wait_total += wait
+                self._wait_max = max(self._wait_max, wait)
+                self._last_wait = wait
+            logger.info(f"Starting job {job_id} after {wait:.1f}s in queue")
+
+            ok = False
+            try:
+                self._handler(job)
+                ok = True
+            except Exception as e:
+                logger.error(f"Job {job_id} raised: {e}", exc_info=True)
+            finally:
+                with self._lock:
+                    self._active -= 1
+                    if ok:
+                        self._completed += 1
+                    else:
+                        self._failed += 1
+                    self._idle.notify_all()
+                self._queue.task_done()
+
+    def drain(self, timeout: float = None) -> bool:
+        """
+        Stop accepting jobs and wait for queued and running jobs to finish.
+
+        Returns:
+            True if everything finished within the timeout.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._lock:
+            self._accepting = False
+            logger.info(f"Draining job queue: {self._queued} queued, {self._active} active")
+            while self._queued or self._active:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    logger.warning(
+                        f"Drain timed out with {self._queued} queued, {self._active} active jobs"
+                    )
+                    return False
+                self._idle.wait(remaining)
+
+        # Everything finished: stop the workers with sentinels behind any real work
+        for _ in self._threads:
+            self._queue.put((float("inf"), next(self._seq), 0.0, None, None))
+        for t in self._threads:
+            t.join(timeout=5)
+        logger.info("Job queue drained")
+        return True
+
+    def stats(self) -> dict:
+        """Snapshot of queue depth, utilisation and wait times."""
+        with self._lock:
+            started = self._completed + self._failed + self._active
+            return {
+                "workers": self._workers,
+                "active_jobs": self._active,
+                "queued_jobs": self._queued,
+                "max_queued": self._max_queued,
+                "accepting": self._accepting,
+                "completed": self._completed,
+                "failed": self._failed,
+                "rejected": self._rejected,
+                "wait_seconds": {
+                    "last": round(self._last_wait, 2),
+                    "avg": round(self._wait_total / started, 2) if started else 0.0,
+                    "max": round(self._wait_max, 2),
+                },
+            }
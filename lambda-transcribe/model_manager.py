@@ -0,0 +1,207 @@
+"""Shared model cache with warm-up, LRU eviction and a resident-memory budget.
+
+Whisper and pyannote models are loaded through `models.get(key, loader)`.
+Loaded models stay resident until the total estimated size exceeds
+MODEL_MEMORY_BUDGET_MB, at which point the least recently used models are
+dropped. Memory other processes hold on this process's behalf (the chunk
+pool's worker model copies) is counted against the same budget through
+`models.reserve()`. Load times and hit/miss counts are reported via
+`models.stats()`.
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable
+
+logger = logging.getLogger(__name__)
+
+MODEL_MEMORY_BUDGET_MB = int(os.environ.get("MODEL_MEMORY_BUDGET_MB", "8192"))
+
+
+def _rss_bytes() -> int:
+    """Current resident set size (Linux), 0 if unavailable."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def _module_bytes(obj, seen: set = None, depth: int = 0) -> int:
+    """
+    Sum parameter and buffer bytes of every torch module reachable from obj.
+
+    Handles bare nn.Modules (Whisper) and wrapper objects like pyannote
+    pipelines that hold their models a few attributes deep.
+    """
+    if seen is None:
+        seen = set()
+    if id(obj) in seen or depth > 4:
+        return 0
+    seen.add(id(obj))
+
+    if hasattr(obj, "parameters") and hasattr(obj, "buffers") and callable(obj.parameters):
+        try:
+            tensors = list(obj.parameters()) + list(obj.buffers())
+            return sum(t.numel() * t.element_size() for t in tensors)
+        except Exception:
+            return 0
+
+    total = 0
+    try:
+        attrs = vars(obj).values()
+    except TypeError:
+        return 0
+    for value in attrs:
+        if isinstance(value, (str, bytes, int, float, bool, type(None))):
+            continue
+        if isinstance(value, (list, tuple)):
+            for item in value:
+                total += _module_bytes(item, seen, depth + 1)
+        elif isinstance(value, dict):
+            for item in value.values():
+                total += _module_bytes(item, seen, depth + 1)
+        else:
+            total += _module_bytes(value, seen, depth + 1)
+    return total
+
+
+class ModelManager:
+    """LRU cache of loaded models bounded by estimated resident bytes."""
+
+    def __init__(self, budget_bytes: int):
+        self.budget_bytes = budget_bytes
+        self._models = OrderedDict()  # key -> {"model", "bytes", "load_seconds"}
+        self._lock = threading.Lock()
+        self._load_locks = {}
+        self._reserved = {}  # label -> bytes held outside this cache (e.g., pool worker models)
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._load_seconds = {}
+        self._preloaded = False
+
+    def get(self, key: str, loader: Callable[[], object]):
+        """
+        Return the cached model for key, loading it with loader() on a miss.
+
+        Concurrent requests for the same key share a single load.
+        """
+        with self._lock:
+            entry = self._models.get(key)
+            if entry is not None:
+                self._models.move_to_end(key)
+                self._hits += 1
+                return entry["model"]
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+
+        with load_lock:
+            # Another thread may have finished loading while we waited
+            with self._lock:
+                entry = self._models.get(key)
+                if entry is not None:
+                    self._models.move_to_end(key)
+                    self._hits += 1
+                    return entry["model"]
+                self._misses += 1
+
+            logger.info(f"Loading model {key}")
+            rss_before = _rss_bytes()
+            start = time.time()
+            model = loader()
+            load_seconds = time.time() - start
+            size = _module_bytes(model) or max(0, _rss_bytes() - rss_before)
+            logger.info(f"Loaded model {key} in {load_seconds:.1f}s (~{size / 1e6:,.0f} MB)")
+
+            with self._lock:
+                self._models[key] = {"model": model, "bytes": size, "load_seconds": load_seconds}
+                self._load_seconds[key] = round(load_seconds, 2)
+                self._evict(keep=key)
+            return model
+
+    def reserve(self, label: str, nbytes: int):
+        """
+        Count nbytes held elsewhere against the budget under label (0 releases it).
+
+        Evicts this process's least recently used models if the reservation
+        pushes the total over budget.
+        """
+        with self._lock:
+            if nbytes > 0:
+                self._reserved[label] = nbytes
+            else:
+                self._reserved.pop(label, None)
+            self._evict(keep=None)
+
+    def bytes_of(self, model) -> int:
+        """Estimated resident bytes of a model loaded through this cache (0 if not cached)."""
+        with self._lock:
+            return next((e["bytes"] for e in self._models.values() if e["model"] is model), 0)
+
+    def headroom_bytes(self, excluding: str = None) -> int:
+        """
+        Budget left after resident models and reservations, not counting the
+        reservation under `excluding` (None when the budget is unlimited).
+        """
+        if self.budget_bytes <= 0:
+            return None
+        with self._lock:
+            return self.budget_bytes - self._resident_bytes() + self._reserved.get(excluding, 0)
+
+    def _evict(self, keep: str):
+        """Drop least recently used models until within budget (caller holds _lock)."""
+        if self.budget_bytes <= 0:
+            return
+        while self._resident_bytes() > self.budget_bytes and len(self._models) > 1:
+            key = next(iter(self._models))
+            if key == keep:
+                break
+            entry = self._models.pop(key)
+            self._evictions += 1
+            logger.info(f"Evicted model {key} (~{entry['bytes'] / 1e6:,.0f} MB) to stay within budget")
+
+    def _resident_bytes(self) -> int:
+        return sum(e["bytes"] for e in self._models.values()) + sum(self._reserved.values())
+
+    def preload(self, warmers: dict):
+        """
+        Load models up front (e.g., at server startup).
+
+        Args:
+            warmers: {label: callable} in load order. Each callable loads its
+                model through get(). Failures are logged, not raised.
+        """
+        for label, warm in warmers.items():
+            try:
+                warm()
+            except Exception as e:
+                logger.error(f"Failed to preload model {label}: {e}", exc_info=True)
+        self._preloaded = True
+
+    @property
+    def warm(self) -> bool:
+        """True once preload finished and at least one model is resident."""
+        with self._lock:
+            return self._preloaded and bool(self._models)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "resident": {
+                    key: {"mb": round(e["bytes"] / 1e6, 1), "load_seconds": round(e["load_seconds"], 2)}
+                    for key, e in self._models.items()
+                },
+                "resident_mb": round(self._resident_bytes() / 1e6, 1),
+                "reserved_mb": {label: round(n / 1e6, 1) for label, n in self._reserved.items()},
+                "budget_mb": round(self.budget_bytes / 1e6, 1),
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "load_seconds": dict(self._load_seconds),
+            }
+
+
+models = ModelManager(MODEL_MEMORY_BUDGET_MB * 1024 * 1024)
@@ -0,0 +1,219 @@
+"""Content-addressed cache of finished transcription results.
+
+Keyed by a hash of the decoded 16kHz audio plus every setting that changes
+the output (model_size, language, backend, diarize_backend, num_speakers,
+chunked, trim_silence, and whether it came through /transcribe/batch), so a
+re-submitted recording — an edge-function retry, a re-run with the same
+settings, or several bots recording the same call — skips transcription and
+diarization entirely.
+
+Entries are gzipped JSON files in TRANSCRIPT_CACHE_DIR, evicted
+least-recently-used once the directory exceeds TRANSCRIPT_CACHE_MAX_MB (512 MB,
+or 32 MB of the shared /tmp on Lambda). If
+TRANSCRIPT_CACHE_S3_URI (s3://bucket/prefix) is set, entries are also written
+there and local misses fall through to S3, so the cache survives redeploys
+and is shared between instances.
+"""
+
+import gzip
+import hashlib
+import json
+import logging
+import os
+import threading
+
+import boto3
+
+from diarize import DIARIZE_BACKEND
+from speech_trim import TRIM_SILENCE
+from transcribe import DEFAULT_BACKEND
+
+logger = logging.getLogger(__name__)
+
+CACHE_VERSION = 5  # bump when the cached result shape (or how it is computed) changes
+# On Lambda, /tmp (512 MB by default) also holds the job's download and decoded
+# audio, so the local tier only gets a small slice of it; TRANSCRIPT_CACHE_S3_URI
+# is the cache that matters there
+ON_LAMBDA = bool(os.environ.get("AWS_LAMBDA_FUNCTION_NAME"))
+DEFAULT_MAX_MB = "32" if ON_LAMBDA else "512"
+
+# Result fields stored in the cache (everything derived from the audio + settings)
+CACHED_FIELDS = (
+    "transcript_text",
+    "transcript_json",
+    "transcript_utterances",
+    "duration_seconds",
+    "language",
+    "word_count",
+    "speaker_count",
+    "speaker_embeddings",
+)
+
+
+def cache_key(audio, event: dict) -> str:
+    """Hash of the decoded samples and the output-affecting job settings."""
+    h = hashlib.sha256()
+    h.update(memoryview(audio).cast("B"))
+    # /transcribe/batch decodes with openai-whisper in a single pass whatever the default backend
+    batched = bool(event.get("batch_id"))
+    settings = {
+        "v": CACHE_VERSION,
+        "model_size": event.get("model_size") or "medium",
+        "language": event.get("language"),
+        "backend": "whisper" if batched else event.get("backend") or DEFAULT_BACKEND,
+        "batched": batched,
+        "diarize_backend": event.get("diarize_backend") or DIARIZE_BACKEND,
+        "num_speakers": event.get("num_speakers"),
+        "chunked": bool(event.get("chunked")),
+        "trim_silence": event["trim_silence"] if event.get("trim_silence") is not None else TRIM_SILENCE,
+    }
+    h.update(json.dumps(settings, sort_keys=True).encode("utf-8"))
+    return h.hexdigest()
+
+
+class ResultCache:
+    """Size-bounded local directory cache with an optional S3 tier."""
+
+    def __init__(self, directory: str, max_bytes: int, s3_uri: str = None, enabled: bool = True):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self.s3_bucket, self.s3_prefix = None, ""
+        if s3_uri:
+            bucket, _, prefix = s3_uri.removeprefix("s3://").partition("/")
+            self.s3_bucket, self.s3_prefix = bucket, prefix.strip("/")
+        self._s3 = None
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "s3_hits": 0, "misses": 0, "puts": 0, "evictions": 0, "errors": 0}
+
+    @classmethod
+    def from_env(cls) -> "ResultCache":
+        return cls(
+            directory=os.environ.get("TRANSCRIPT_CACHE_DIR", "/tmp/transcript-cache"),
+            max_bytes=int(os.environ.get("TRANSCRIPT_CACHE_MAX_MB", DEFAULT_MAX_MB)) * 1024 * 1024,
+            s3_uri=os.environ.get("TRANSCRIPT_CACHE_S3_URI") or None,
+            enabled=os.environ.get("TRANSCRIPT_CACHE", "1") == "1",
+        )
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json.gz")
+
+    def _s3_key(self, key: str) -> str:
+        return f"{self.s3_prefix}/{key}.json.gz" if self.s3_prefix else f"{key}.json.gz"
+
+    def _get_s3(self):
+        if self._s3 is None:
+            self._s3 = boto3.client("s3")
+        return self._s3
+
+    def _count(self, name: str):
+        with self._lock:
+            self._stats[name] += 1
+
+    def get(self, key: str):
+        """Return the cached result dict, or None on a miss."""
+        if not self.enabled:
+            return None
+
+        path = self._path(key)
+        try:
+            with gzip.open(path, "rb") as f:
+                entry = json.loads(f.read())
+            os.utime(path)  # mark as recently used for LRU eviction
+            self._count("hits")
+            logger.info(f"Transcript cache hit (local): {key[:12]}")
+            return entry
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f"Transcript cache read failed for {key[:12]}: {e}")
+            self._count("errors")
+
+        if self.s3_bucket:
+            try:
+                obj = self._get_s3().get_object(Bucket=self.s3_bucket, Key=self._s3_key(key))
+                blob = obj["Body"].read()
+                entry = json.loads(gzip.decompress(blob))
+                self._write_local(key, blob)
+                self._count("s3_hits")
+                logger.info(f"Transcript cache hit (S3): {key[:12]}")
+                return entry
+            except self._get_s3().exceptions.NoSuchKey:
+                pass
+            except Exception as e:
+                logger.warning(f"Transcript cache S3 read failed for {key[:12]}: {e}")
+                self._count("errors")
+
+        self._count("misses")
+        return None
+
+    def put(self, key: str, result: dict):
+        """Store the cacheable fields of a successful result."""
+        if not self.enabled:
+            return
+        entry = {field: result[field] for field in CACHED_FIELDS if field in result}
+        blob = gzip.compress(json.dumps(entry, separators=(",", ":")).encode("utf-8"), compresslevel=6)
+        try:
+            self._write_local(key, blob)
+            self._count("puts")
+        except Exception as e:
+            logger.warning(f"Transcript cache write failed for {key[:12]}: {e}")
+            self._count("errors")
+
+        if self.s3_bucket:
+            try:
+                self._get_s3().put_object(
+                    Bucket=self.s3_bucket, Key=self._s3_key(key), Body=blob,
+                    ContentType="application/json", ContentEncoding="gzip",
+                )
+            except Exception as e:
+                logger.warning(f"Transcript cache S3 write failed for {key[:12]}: {e}")
+                self._count("errors")
+
+    def _write_local(self, key: str, blob: bytes):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(blob)
+        os.replace(tmp_path, path)  # atomic, so readers never see a partial entry
+        self._evict()
+
+    def _evict(self):
+        """Remove least recently used entries until the directory fits max_bytes."""
+        with self._lock:
+            entries = []
+            total = 0
+            for name in os.listdir(self.directory):
+                if not name.endswith(".json.gz"):
+                    continue
+                path = os.path.join(self.directory, name)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+                total += st.st_size
+
+            entries.sort()
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                    total -= size
+                    self._stats["evictions"] += 1
+                except FileNotFoundError:
+                    pass
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats["hits"] + stats["s3_hits"] + stats["misses"]
+        stats["hit_rate"] = round((stats["hits"] + stats["s3_hits"]) / lookups, 3) if lookups else 0.0
+        stats["enabled"] = self.enabled
+        stats["s3"] = bool(self.s3_bucket)
+        return stats
+
+
+cache = ResultCache.from_env()
@@ -1,29 +1,140 @@
 """
 Railway server: FastAPI endpoint for WhisperX transcription + pyannote diarization.
 
-POST /transcribe — accepts async transcription jobs, processes in background, sends HMAC callback.
-GET /health — health check (includes model warm status).
+POST /transcribe — queues async transcription jobs (429 when full), processed by a bounded
+worker pool, sends HMAC callback.
+POST /transcribe/batch — queues many recordings as one job; their Whisper windows are decoded
+in shared batches (see batch.py), with one callback per recording.
+POST /voices — enrolls speaker embeddings (from a callback's speaker_embeddings) as a known voice
+of an org, so later recordings with that org_id get speaker_identities (see voice_index.py).
+Requires the X-Voice-Secret header (VOICE_API_SECRET), as does GET /voices/{org_id}.
+GET /health — health check (includes model warm status, resident models, queue depth / wait times,
+transcript cache hit/miss counters).
 """
 
+import asyncio
+import hmac
 import logging
 import os
-import threading
+import statistics
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
 
-from fastapi import FastAPI, HTTPException, BackgroundTasks
-from pydantic import BaseModel
-from typing import Optional
+from fastapi import FastAPI, Header, HTTPException
+from fastapi.responses import PlainTextResponse
+from pydantic import BaseModel, Field
+from typing import Literal, Optional
 
+import callback_client
+from batch import BATCH_RECORDINGS, batcher
+from chunking import shutdown_pool
 from handler import process_transcription
+from job_queue import JobQueue, QueueFull, ShuttingDown
+from model_manager import models
+from result_cache import cache as result_cache
+from tracing import metrics
+from voice_index import index_for
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="60 Transcriber", version="1.0.0")
+# Concurrency limits: each job runs a full Whisper + pyannote pipeline
+WORKERS = int(os.environ.get("TRANSCRIBE_WORKERS", "1"))
+MAX_QUEUED = int(os.environ.get("TRANSCRIBE_MAX_QUEUED", "20"))
+DRAIN_TIMEOUT = float(os.environ.get("TRANSCRIBE_DRAIN_TIMEOUT", "600"))
+# Models loaded before accepting traffic, e.g. "whisper:medium,faster-whisper:large-v3,pyannote"
+PRELOAD_MODELS = os.environ.get("PRELOAD_MODELS", "whisper:medium,pyannote")
+RETRY_AFTER_SECONDS = 60
+BATCH_MAX_RECORDINGS = int(os.environ.get("TRANSCRIBE_BATCH_MAX_RECORDINGS", "100"))
+# Shared secret callers of /voices send as X-Voice-Secret (unset = voice endpoints disabled)
+VOICE_API_SECRET = os.environ.get("VOICE_API_SECRET", "")
 
 # Track whether models are loaded (for health check)
 _models_warm = False
-_active_jobs = 0
-_lock = threading.Lock()
+
+
+def _run_transcription(event: dict):
+    """Worker task that runs transcription (or a batch of them) and sends callbacks."""
+    global _models_warm
+
+    if "recordings" in event:
+        _run_batch(event)
+    else:
+        process_transcription(event)
+    _models_warm = True
+
+
+def _run_batch(job: dict):
+    """
+    Run a batch's recordings concurrently so their windows share Whisper batches.
+
+    A batch holds one queue slot, so it runs at most TRANSCRIBE_WORKERS full pipelines at
+    a time (capped by BATCH_RECORDINGS) — the same download/diarization/memory budget as
+    that many single jobs. With one worker, recordings run in turn and batch their own windows.
+    """
+    events = [
+        {**recording, "batch_id": job["batch_id"], "batch_accepted_at": job["accepted_at"]}
+        for recording in job["recordings"]
+    ]
+    concurrent = max(1, min(BATCH_RECORDINGS, WORKERS))
+    with ThreadPoolExecutor(max_workers=concurrent, thread_name_prefix="batch") as pool:
+        results = list(pool.map(process_transcription, events))
+
+    latencies = [
+        r["batch"]["latency_seconds"] for r in results if r.get("batch", {}).get("latency_seconds") is not None
+    ]
+    succeeded = sum(1 for r in results if r.get("status") == "success")
+    latency = (
+        f"latency median {statistics.median(latencies):.1f}s max {max(latencies):.1f}s"
+        if latencies else "no latencies recorded"
+    )
+    logger.info(
+        f"Batch {job['batch_id']} complete: {succeeded}/{len(results)} succeeded "
+        f"({concurrent} at a time), {latency}, whisper batches {batcher.stats()}"
+    )
+
+
+def _preload_models():
+    """Load PRELOAD_MODELS through the shared model cache (lazy imports — heavy ML libraries)."""
+    global _models_warm
+
+    warmers = {}
+    for spec in filter(None, (s.strip() for s in PRELOAD_MODELS.split(","))):
+        kind, _, name = spec.partition(":")
+        if kind in ("whisper", "faster-whisper"):
+            from transcribe import load_model
+            warmers[spec] = lambda name=name or "medium", kind=kind: load_model(name, kind)
+        elif kind == "pyannote":
+            if not os.environ.get("HF_TOKEN"):
+                logger.warning("HF_TOKEN not set - not preloading pyannote")
+                continue
+            from diarize import load_pipeline
+            warmers[spec] = load_pipeline
+        else:
+            logger.warning(f"Unknown model in PRELOAD_MODELS: {spec}")
+
+    models.preload(warmers)
+    _models_warm = models.warm
+    logger.info(f"Model preload complete: {models.stats()['resident_mb']} MB resident")
+
+
+_jobs = JobQueue(_run_transcription, workers=WORKERS, max_queued=MAX_QUEUED)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Warm models before the first request so the first job skips the load
+    await asyncio.to_thread(_preload_models)
+    _jobs.start()
+    yield
+    # Let in-flight and queued jobs finish so their callbacks still fire
+    await asyncio.to_thread(_jobs.drain, DRAIN_TIMEOUT)
+    await asyncio.to_thread(shutdown_pool)
+
+
+app = FastAPI(title="60 Transcriber", version="1.0.0", lifespan=lifespan)
 
 
 class TranscribeRequest(BaseModel):
@@ -34,39 +145,151 @@ class TranscribeRequest(BaseModel):
     callback_secret: str
     language: Optional[str] = None
     model_size: str = "medium"
+    backend: Optional[Literal["whisper", "faster-whisper"]] = None  # None = TRANSCRIBE_BACKEND
     num_speakers: Optional[int] = None
+    org_id: Optional[str] = None  # name speakers that match this org's enrolled voices
+    diarize_backend: Optional[Literal["torch", "onnx"]] = None  # None = DIARIZE_BACKEND
+    chunked: bool = False  # long-audio mode: parallel transcription of silence-aligned chunks
+    stream_download: Optional[bool] = None  # pipe download into ffmpeg (None = DOWNLOAD_STREAM_DECODE)
+    audio_ranges: Optional[bool] = None  # video-only: fetch just the audio track (None = DOWNLOAD_AUDIO_RANGES)
+    transcript_format: Optional[Literal["full", "compact", "packed"]] = None  # None = TRANSCRIPT_FORMAT
+    progressive: bool = False  # partial callbacks per transcribed window before the final one
+    draft: bool = False  # provisional quick-model transcript callback before the final one
+    draft_model_size: Optional[str] = None  # None = TRANSCRIBE_DRAFT_MODEL
+    trim_silence: Optional[bool] = None  # skip long non-speech gaps before Whisper (None = TRANSCRIBE_TRIM_SILENCE)
+    priority: int = 0  # higher runs first; FIFO within a priority
+
+
+class TranscribeBatchRequest(BaseModel):
+    recordings: list[TranscribeRequest] = Field(min_length=1)
+    priority: int = 0  # for the batch as a whole; per-recording priorities are ignored
+
+
+class VoiceEnrollRequest(BaseModel):
+    org_id: str
+    voice_id: str  # stable id of the person (user or contact id)
+    name: Optional[str] = None
+    embeddings: list[list[float]] = Field(min_length=1)  # one or more samples, e.g. speaker_embeddings[label]
 
 
 @app.get("/health")
 def health():
+    stats = _jobs.stats()
     return {
-        "status": "ok",
+        "status": "ok" if stats["accepting"] else "draining",
         "models_warm": _models_warm,
-        "active_jobs": _active_jobs,
+        "active_jobs": stats["active_jobs"],
+        "queue": stats,
+        "models": models.stats(),
+        "transcript_cache": result_cache.stats(),
+        "callbacks": callback_client.stats(),
+        "batching": batcher.stats(),
     }
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    """Per-stage duration, real-time factor and peak RSS histograms, plus queue gauges."""
+    stats = _jobs.stats()
+    cache_stats = result_cache.stats()
+    batch_stats = batcher.stats()
+    return metrics.render({
+        "active_jobs": stats["active_jobs"],
+        "queued_jobs": stats["queued_jobs"],
+        "models_resident_mb": models.stats()["resident_mb"],
+        "transcript_cache_hit_rate": cache_stats["hit_rate"],
+        "batch_mean_size": batch_stats["mean_batch_size"],
+        "batch_audio_per_second": batch_stats["audio_per_second"],
+    })
+
+
 @app.post("/transcribe", status_code=202)
-def transcribe(req: TranscribeRequest, background_tasks: BackgroundTasks):
-    """Accept transcription job and process in background."""
+def transcribe(req: TranscribeRequest):
+    """Accept transcription job and queue it for a worker."""
     if not req.audio_url and not req.video_url:
         raise HTTPException(400, "audio_url or video_url required")
 
-    background_tasks.add_task(_run_transcription, req.model_dump())
-    logger.info(f"Accepted transcription job: {req.recording_id}")
-    return {"status": "accepted", "recording_id": req.recording_id}
+    try:
+        position = _jobs.submit(req.model_dump(), priority=req.priority, job_id=req.recording_id)
+    except QueueFull as e:
+        logger.warning(f"Rejected transcription job {req.recording_id}: {e}")
+        raise HTTPException(429, str(e), headers={"Retry-After": str(RETRY_AFTER_SECONDS)})
+    except ShuttingDown as e:
+        raise HTTPException(503, str(e))
 
+    logger.info(f"Accepted transcription job: {req.recording_id} (queue position {position})")
+    return {"status": "accepted", "recording_id": req.recording_id, "queue_position": position}
 
-def _run_transcription(event: dict):
-    """Background task that runs transcription and sends callback."""
-    global _models_warm, _active_jobs
 
-    with _lock:
-        _active_jobs += 1
+@app.post("/transcribe/batch", status_code=202)
+def transcribe_batch(req: TranscribeBatchRequest):
+    """Accept many recordings as one queued job; each still gets its own callback."""
+    if len(req.recordings) > BATCH_MAX_RECORDINGS:
+        raise HTTPException(400, f"At most {BATCH_MAX_RECORDINGS} recordings per batch")
+    missing = [r.recording_id for r in req.recordings if not r.audio_url and not r.video_url]
+    if missing:
+        raise HTTPException(400, f"audio_url or video_url required: {', '.join(missing)}")
+    # Batched windows are one temperature-0 openai-whisper pass; anything else would be silently ignored
+    unsupported = [
+        r.recording_id for r in req.recordings if r.backend == "faster-whisper" or r.chunked or r.progressive
+    ]
+    if unsupported:
+        raise HTTPException(
+            400,
+            "Batched transcription runs openai-whisper over shared windows; backend=faster-whisper, "
+            f"chunked and progressive are not supported: {', '.join(unsupported)}",
+        )
 
+    batch_id = uuid.uuid4().hex
+    job = {
+        "batch_id": batch_id,
+        "accepted_at": time.time(),
+        "recordings": [r.model_dump() for r in req.recordings],
+    }
     try:
-        process_transcription(event)
-        _models_warm = True
-    finally:
-        with _lock:
-            _active_jobs -= 1
+        position = _jobs.submit(job, priority=req.priority, job_id=f"batch:{batch_id}")
+    except QueueFull as e:
+        logger.warning(f"Rejected transcription batch of {len(req.recordings)}: {e}")
+        raise HTTPException(429, str(e), headers={"Retry-After": str(RETRY_AFTER_SECONDS)})
+    except ShuttingDown as e:
+        raise HTTPException(503, str(e))
+
+    logger.info(f"Accepted transcription batch {batch_id}: {len(req.recordings)} recordings (queue position {position})")
+    return {
+        "status": "accepted",
+        "batch_id": batch_id,
+        "recording_ids": [r.recording_id for r in req.recordings],
+        "queue_position": position,
+    }
+
+
+def _check_voice_secret(secret: Optional[str]):
+    """Reject /voices calls without the shared secret (enrolled voices name people)."""
+    if not VOICE_API_SECRET:
+        raise HTTPException(503, "Voice endpoints disabled (VOICE_API_SECRET not set)")
+    if not secret or not hmac.compare_digest(secret.encode("utf-8"), VOICE_API_SECRET.encode("utf-8")):
+        raise HTTPException(401, "Missing or invalid X-Voice-Secret")
+
+
+@app.post("/voices")
+def enroll_voice(req: VoiceEnrollRequest, x_voice_secret: Optional[str] = Header(None)):
+    """Add embedding samples for a known voice to the org's index (incremental, no rebuild)."""
+    _check_voice_secret(x_voice_secret)
+    try:
+        return index_for(req.org_id).add(req.voice_id, req.embeddings, name=req.name)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    except RuntimeError as e:
+        raise HTTPException(503, str(e))
+
+
+@app.get("/voices/{org_id}")
+def voice_index_stats(org_id: str, x_voice_secret: Optional[str] = Header(None)):
+    """Enrolled voice and sample counts for an org."""
+    _check_voice_secret(x_voice_secret)
+    try:
+        return {"org_id": org_id, **index_for(org_id).stats()}
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    except RuntimeError as e:
+        raise HTTPException(503, str(e))
@@ -0,0 +1,180 @@
+"""Interval index over diarization speaker turns.
+
+pyannote returns speaker turns as an Annotation. Scanning every turn for every
+transcript segment is O(segments x turns), which dominates long meetings.
+SpeakerTurns materialises the turns once into sorted NumPy arrays and answers
+"which speaker overlaps this span the most" with two binary searches plus a
+scan of only the turns that can actually overlap.
+
+Turns longer than MAX_TURN_SECONDS are stored as consecutive pieces of the
+same speaker (overlap is additive, so assignment is unchanged). Without that,
+one long turn (a 2h monologue, a speaker pyannote never closes) keeps the
+running max of end times high and every later lookup scans all the turns after
+it. With it, a lookup scans only the turns starting within MAX_TURN_SECONDS
+before the span through its end.
+"""
+
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SPEAKER = "SPEAKER_00"
+MAX_TURN_SECONDS = 30.0  # longer turns are split so lookups stay local
+
+
+class SpeakerTurns:
+    """Speaker turns sorted by start time, with a running max of end times."""
+
+    def __init__(self, starts, ends, labels: list, embeddings: dict = None):
+        """
+        Args:
+            starts: Turn start times in seconds.
+            ends: Turn end times in seconds.
+            labels: Speaker label per turn (e.g., 'SPEAKER_00').
+            embeddings: Optional {label: speaker embedding} (one centroid per speaker).
+        """
+        self.embeddings = embeddings or {}
+        starts = np.asarray(starts, dtype=np.float64)
+        ends = np.asarray(ends, dtype=np.float64)
+
+        # Speaker names in order of first appearance, turns keep an int index
+        self.speakers = list(dict.fromkeys(labels))
+        speaker_ids = {name: i for i, name in enumerate(self.speakers)}
+        label_idx = np.fromiter((speaker_ids[l] for l in labels), dtype=np.int32, count=len(labels))
+
+        # Split long turns into MAX_TURN_SECONDS pieces (bounds the candidate scan, see module docstring)
+        pieces = np.maximum(1, np.ceil((ends - starts) / MAX_TURN_SECONDS)).astype(np.int64)
+        if len(pieces) and pieces.max() > 1:
+            turn = np.repeat(np.arange(len(starts)), pieces)
+            offset = np.arange(len(turn)) - np.repeat(np.cumsum(pieces) - pieces, pieces)
+            piece_starts = starts[turn] + offset * MAX_TURN_SECONDS
+            ends = np.minimum(piece_starts + MAX_TURN_SECONDS, ends[turn])
+            starts = piece_starts
+            label_idx = label_idx[turn]
+
+        order = np.argsort(starts, kind="stable")
+        self.starts = starts[order]
+        self.ends = ends[order]
+        self.label_idx = label_idx[order]
+
+        # Turns are sorted by start but may nest, so ends are not monotonic.
+        # The running max is, and lets us binary-search the first turn that
+        # could still be open at a given time.
+        self.max_ends = np.maximum.accumulate(self.ends) if len(self.ends) else self.ends
+
+    @classmethod
+    def from_annotation(cls, annotation, centroids=None) -> "SpeakerTurns":
+        """
+        Build from a pyannote Annotation (one pass over itertracks).
+
+        centroids: the pipeline's per-speaker embeddings (return_embeddings=True),
+        rows in annotation.labels() order. All-zero or non-finite rows (speakers
+        pyannote found no clean audio for) are left out.
+        """
+        starts, ends, labels = [], [], []
+        for turn, _, speaker in annotation.itertracks(yield_label=True):
+            starts.append(turn.start)
+            ends.append(turn.end)
+            labels.append(speaker)
+
+        embeddings = {}
+        if centroids is not None:
+            for label, vector in zip(annotation.labels(), np.asarray(centroids, dtype=np.float32)):
+                if np.all(np.isfinite(vector)) and np.any(vector):
+                    embeddings[label] = vector
+        return cls(starts, ends, labels, embeddings)
+
+    def __len__(self) -> int:
+        """Indexed intervals (turns, with long turns counted once per piece)."""
+        return len(self.starts)
+
+    def assign(self, span_starts, span_ends) -> np.ndarray:
+        """
+        Find the speaker with the most total overlap for each span.
+
+        Each span scans the turns starting between span_start - MAX_TURN_SECONDS
+        and span_end, so the cost is O(log n) plus that local turn density. The
+        worst case is many turns stacked within that window (heavy crosstalk),
+        not long turns.
+
+        Args:
+            span_starts: Span start times in seconds.
+            span_ends: Span end times in seconds.
+
+        Returns:
+            Array of speaker indices into self.speakers, -1 where no turn overlaps.
+        """
+        span_starts = np.asarray(span_starts, dtype=np.float64)
+        span_ends = np.maximum(np.asarray(span_ends, dtype=np.float64), span_starts)
+        result = np.full(len(span_starts), -1, dtype=np.int32)
+        if not len(self) or not len(span_starts):
+            return result
+
+        # Candidate turns for span i live in [lo[i], hi[i]): everything before
+        # lo has ended by span start, everything from hi starts after span end.
+        lo = np.searchsorted(self.max_ends, span_starts, side="right")
+        hi = np.searchsorted(self.starts, span_ends, side="left")
+
+        n_speakers = len(self.speakers)
+        for i in np.flatnonzero(hi > lo):
+            a, b = lo[i], hi[i]
+            overlap = (
+                np.minimum(self.ends[a:b], span_ends[i])
+                - np.maximum(self.starts[a:b], span_starts[i])
+            )
+            mask = overlap > 0
+            if not mask.any():
+                continue
+            totals = np.bincount(
+                self.label_idx[a:b][mask], weights=overlap[mask], minlength=n_speakers
+            )
+            result[i] = int(np.argmax(totals))
+
+        return result
+
+    def label(self, idx: int, default: str = DEFAULT_SPEAKER) -> str:
+        """Map a speaker index from assign() back to its label."""
+        return self.speakers[idx] if idx >= 0 else default
+
+
+def assign_speakers(turns: SpeakerTurns, segments: list) -> list:
+    """
+    Assign the dominant speaker to each segment and each of its words.
+
+    Segments get 'speaker' (SPEAKER_00 when nothing overlaps). Words with
+    timestamps get their own 'speaker', falling back to the segment's speaker
+    when the word lies in a gap between turns.
+
+    Args:
+        turns: Indexed speaker turns.
+        segments: Whisper transcript segments (modified in place).
+
+    Returns:
+        The same list of segments.
+    """
+    seg_starts = [seg.get("start", 0) for seg in segments]
+    seg_ends = [seg.get("end", seg.get("start", 0)) for seg in segments]
+    seg_idx = turns.assign(seg_starts, seg_ends)
+
+    for seg, idx in zip(segments, seg_idx):
+        seg["speaker"] = turns.label(idx)
+
+    # Word-level assignment in a single batched query across all segments
+    timed_words = []
+    word_starts = []
+    word_ends = []
+    for seg in segments:
+        for w in seg.get("words") or []:
+            if "start" in w and "end" in w:
+                timed_words.append((w, seg))
+                word_starts.append(w["start"])
+                word_ends.append(w["end"])
+
+    if timed_words:
+        word_idx = turns.assign(word_starts, word_ends)
+        for (w, seg), idx in zip(timed_words, word_idx):
+            w["speaker"] = turns.label(idx, default=seg["speaker"])
+
+    return segments
@@ -0,0 +1,163 @@
+"""Skip long non-speech stretches before Whisper, then map timestamps back.
+
+Bot recordings often open with minutes of waiting-room silence or contain
+long muted stretches; Whisper spends full decoding time on them and sometimes
+hallucinates text there. A vectorised energy pass over the 16kHz audio marks
+frames above an absolute SPEECH_DB level as speech, and every frame inside a
+diarization turn is speech whatever its level, so a quiet remote speaker is
+never cut. Gaps of at least MIN_GAP_SECONDS are cut out (keeping PAD_SECONDS
+of context either side), and transcription runs on the compacted buffer.
+SpeechMap then moves every segment and word timestamp back onto the original
+timeline, so diarization (which still sees the full audio) and formatting are
+unaffected.
+
+Off by default (TRANSCRIBE_TRIM_SILENCE=1 or a job's "trim_silence" turns it
+on). The threshold is absolute rather than relative to the recording's noise
+floor: a floor-relative threshold rises with room noise and cuts speakers who
+are only a little louder than it.
+"""
+
+import logging
+import os
+
+import numpy as np
+
+from audio import SAMPLE_RATE
+from chunking import FRAME_SECONDS, frame_energy
+
+logger = logging.getLogger(__name__)
+
+TRIM_SILENCE = os.environ.get("TRANSCRIBE_TRIM_SILENCE", "0") == "1"
+MIN_GAP_SECONDS = float(os.environ.get("TRIM_MIN_GAP_SECONDS", "3.0"))
+# Frame RMS level (dBFS) above which a frame counts as speech; muted and
+# waiting-room stretches sit well below it, quiet far-end speech above it
+SPEECH_DB = float(os.environ.get("TRIM_SPEECH_DB", "-50"))
+PAD_SECONDS = 0.5          # context kept on each side of a cut
+MIN_SKIP_FRACTION = 0.02   # not worth compacting for less than this share of the audio
+
+
+class SpeechMap:
+    """Kept regions of the original audio and the compacted timeline they map to."""
+
+    def __init__(self, regions: np.ndarray, total_samples: int):
+        # regions: (n, 2) sample offsets [start, end) in the original audio
+        self.regions = regions
+        self.total_samples = total_samples
+        lengths = regions[:, 1] - regions[:, 0]
+        self._compact_starts = np.concatenate([[0], np.cumsum(lengths)[:-1]]) / SAMPLE_RATE
+        self._original_starts = regions[:, 0] / SAMPLE_RATE
+        self._lengths = lengths / SAMPLE_RATE
+
+    @property
+    def kept_seconds(self) -> float:
+        return float(self._lengths.sum())
+
+    @property
+    def skipped_seconds(self) -> float:
+        return self.total_samples / SAMPLE_RATE - self.kept_seconds
+
+    def compact(self, audio: np.ndarray) -> np.ndarray:
+        """The speech-only buffer: kept regions back to back."""
+        return np.concatenate([audio[start:end] for start, end in self.regions])
+
+    def to_original(self, times, ends: bool = False) -> np.ndarray:
+        """
+        Map compacted-timeline seconds to original seconds.
+
+        A time exactly on a cut belongs to the region after it for start times
+        and to the region before it for end times (ends=True).
+        """
+        times = np.asarray(times, dtype=np.float64)
+        side = "left" if ends else "right"
+        index = np.clip(np.searchsorted(self._compact_starts, times, side=side) - 1, 0, len(self.regions) - 1)
+        offset = np.clip(times - self._compact_starts[index], 0.0, self._lengths[index])
+        return self._original_starts[index] + offset
+
+    def remap_segments(self, segments: list) -> list:
+        """Move segment and word start/end times back onto the original timeline, in place."""
+        starts, ends, refs = [], [], []
+        for seg in segments:
+            for item in [seg] + [w for w in seg.get("words") or [] if "start" in w and "end" in w]:
+                starts.append(item["start"])
+                ends.append(item["end"])
+                refs.append(item)
+        if refs:
+            for item, start, end in zip(refs, self.to_original(starts), self.to_original(ends, ends=True)):
+                item["start"] = round(float(start), 3)
+                item["end"] = round(float(max(end, start)), 3)
+        return segments
+
+    def stats(self) -> dict:
+        return {
+            "skipped_seconds": round(self.skipped_seconds, 2),
+            "kept_seconds": round(self.kept_seconds, 2),
+            "regions": len(self.regions),
+        }
+
+
+def _turn_frames(turns, n_frames: int) -> np.ndarray:
+    """Frames overlapping any diarization turn (difference array over the turn edges)."""
+    first = np.clip(np.floor(turns.starts / FRAME_SECONDS).astype(np.int64), 0, n_frames)
+    last = np.clip(np.ceil(turns.ends / FRAME_SECONDS).astype(np.int64), 0, n_frames)
+    delta = np.zeros(n_frames + 1, dtype=np.int32)
+    np.add.at(delta, first, 1)
+    np.add.at(delta, last, -1)
+    return np.cumsum(delta[:-1]) > 0
+
+
+def find_speech(audio: np.ndarray, min_gap_seconds: float = MIN_GAP_SECONDS,
+                turns=None) -> SpeechMap | None:
+    """
+    Locate non-speech gaps worth skipping.
+
+    Args:
+        audio: 16kHz float32 samples.
+        min_gap_seconds: Shortest non-speech stretch worth cutting.
+        turns: Optional diarization SpeakerTurns; their spans are always kept.
+
+    Returns:
+        A SpeechMap of the regions to keep, or None when there is nothing
+        (or too little) to skip.
+    """
+    energy = frame_energy(audio)
+    if len(energy) == 0:
+        return None
+    frame_len = int(SAMPLE_RATE * FRAME_SECONDS)
+
+    db = 20 * np.log10(np.maximum(energy, 1e-10))
+    speech = db > SPEECH_DB
+    if turns is not None and len(turns.starts):
+        speech |= _turn_frames(turns, len(speech))
+    if not speech.any():
+        return None
+
+    # Widen speech by PAD_SECONDS each side (dilation via a running window sum)
+    pad = int(PAD_SECONDS / FRAME_SECONDS)
+    counts = np.convolve(speech.astype(np.int32), np.ones(2 * pad + 1, dtype=np.int32), mode="same")
+    keep = counts > 0
+
+    # Runs of kept frames; gaps shorter than min_gap stay in
+    edges = np.flatnonzero(np.diff(np.concatenate([[0], keep.astype(np.int8), [0]])))
+    runs = edges.reshape(-1, 2)
+    min_gap = int(min_gap_seconds / FRAME_SECONDS)
+    gaps = runs[1:, 0] - runs[:-1, 1]
+    split = np.flatnonzero(gaps >= min_gap)
+    firsts = np.concatenate([[0], split + 1])
+    lasts = np.concatenate([split, [len(runs) - 1]])
+    regions = np.stack([runs[firsts, 0], runs[lasts, 1]], axis=1).astype(np.int64) * frame_len
+
+    # Leading/trailing silence is cut only if long enough, like any other gap
+    if regions[0, 0] < min_gap * frame_len:
+        regions[0, 0] = 0
+    if len(audio) - regions[-1, 1] < min_gap * frame_len:
+        regions[-1, 1] = len(audio)
+    regions[-1, 1] = min(regions[-1, 1], len(audio))
+
+    speech_map = SpeechMap(regions, len(audio))
+    if speech_map.skipped_seconds < MIN_SKIP_FRACTION * len(audio) / SAMPLE_RATE:
+        return None
+    logger.info(
+        f"Speech trim: skipping {speech_map.skipped_seconds:.1f}s of "
+        f"{len(audio) / SAMPLE_RATE:.1f}s, keeping {len(regions)} speech regions"
+    )
+    return speech_map
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Tests import the service modules the way the container does (flat, from the lambda directory)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,80 @@
+import threading
+from concurrent.futures import TimeoutError
+
+import numpy as np
+import pytest
+
+import batch
+from batch import WindowBatcher
+
+SR = 16000
+
+
+def _audio(seconds):
+    return np.random.default_rng(0).uniform(-0.1, 0.1, int(seconds * SR)).astype(np.float32)
+
+
+def _decode_ok(windows):
+    return [([{"start": 0.0, "end": 1.0, "text": " hi", "words": []}], "en") for _ in windows]
+
+
+def test_windows_from_one_recording_resolve_in_shared_batches(monkeypatch):
+    monkeypatch.setattr(batch, "_decode_batch", _decode_ok)
+    batcher = WindowBatcher(batch_size=4, wait_seconds=0.01)
+
+    segments, language, stats = batcher.transcribe(_audio(120))
+
+    assert language == "en"
+    assert stats["windows"] == len(segments) >= 4
+    assert batcher.stats()["windows"] == stats["windows"]
+
+
+def test_failed_decode_fails_the_recording_and_the_thread_keeps_serving(monkeypatch):
+    calls = []
+
+    def decode(windows):
+        calls.append(len(windows))
+        if len(calls) == 1:
+            raise RuntimeError("model exploded")
+        return _decode_ok(windows)
+
+    monkeypatch.setattr(batch, "_decode_batch", decode)
+    batcher = WindowBatcher(batch_size=8, wait_seconds=0.01)
+
+    with pytest.raises(RuntimeError, match="model exploded"):
+        batcher.transcribe(_audio(60))
+    segments, _, _ = batcher.transcribe(_audio(20))
+    assert segments
+
+
+def test_short_result_list_fails_every_window_instead_of_hanging(monkeypatch):
+    monkeypatch.setattr(batch, "_decode_batch", lambda windows: _decode_ok(windows)[:-1])
+    monkeypatch.setattr(batch, "WINDOW_TIMEOUT_SECONDS", 5.0)
+    batcher = WindowBatcher(batch_size=8, wait_seconds=0.01)
+
+    with pytest.raises(RuntimeError, match="Decoded"):
+        batcher.transcribe(_audio(60))
+
+
+def test_timed_out_recording_withdraws_its_queued_windows(monkeypatch):
+    release = threading.Event()
+    decoded = []
+
+    def decode(windows):
+        release.wait(5)
+        decoded.extend(windows)
+        return _decode_ok(windows)
+
+    monkeypatch.setattr(batch, "_decode_batch", decode)
+    monkeypatch.setattr(batch, "WINDOW_TIMEOUT_SECONDS", 0.2)
+    batcher = WindowBatcher(batch_size=1, wait_seconds=0.0)
+
+    with pytest.raises(TimeoutError):
+        batcher.transcribe(_audio(120))
+    assert batcher.stats()["pending_windows"] == 0
+
+    release.set()
+    monkeypatch.setattr(batch, "WINDOW_TIMEOUT_SECONDS", 5.0)
+    batcher.transcribe(_audio(10))
+    # Only the window already decoding when the first recording gave up ran, plus the new one
+    assert len(decoded) == 2
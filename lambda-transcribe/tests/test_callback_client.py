@@ -0,0 +1,143 @@
+import gzip
+import hashlib
+import json
+
+import numpy as np
+import pytest
+
+import callback_client
+from format_output import format_output
+
+
+class FakeResponse:
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.text = ""
+
+
+class FakeSession:
+    def __init__(self, statuses):
+        self.statuses = list(statuses)
+        self.posts = []
+
+    def post(self, url, data, headers, timeout):
+        self.posts.append({"url": url, "data": data, "headers": dict(headers)})
+        return FakeResponse(self.statuses.pop(0))
+
+
+class FakeS3:
+    def __init__(self):
+        self.objects = {}
+
+    def put_object(self, Bucket, Key, Body, **kwargs):
+        self.objects[(Bucket, Key)] = Body
+
+    def generate_presigned_url(self, operation, Params, ExpiresIn):
+        return f"https://{Params['Bucket']}.s3.amazonaws.com/{Params['Key']}?signed"
+
+
+@pytest.fixture(autouse=True)
+def no_sleep(monkeypatch):
+    monkeypatch.setattr(callback_client.time, "sleep", lambda seconds: None)
+
+
+def _use_session(monkeypatch, statuses):
+    session = FakeSession(statuses)
+    monkeypatch.setattr(callback_client, "_get_session", lambda: session)
+    return session
+
+
+def test_retries_transient_failures_with_the_same_signed_body(monkeypatch):
+    session = _use_session(monkeypatch, [503, 429, 200])
+    payload = {"recording_id": "rec-1", "status": "success", "transcript_text": "hello"}
+
+    stats = callback_client.send_callback("https://edge/callback", "secret", payload)
+
+    assert stats["delivered"] and stats["attempts"] == 3 and stats["status_code"] == 200
+    bodies = {post["data"] for post in session.posts}
+    keys = {post["headers"]["Idempotency-Key"] for post in session.posts}
+    assert len(bodies) == 1 and len(keys) == 1
+    body = bodies.pop()
+    assert json.loads(body) == payload
+    assert session.posts[0]["headers"]["X-Callback-Signature"] == callback_client.sign(body, "secret")
+
+
+def test_client_errors_are_not_retried(monkeypatch):
+    session = _use_session(monkeypatch, [400, 200])
+
+    stats = callback_client.send_callback("https://edge/callback", "secret", {"recording_id": "rec-2"})
+
+    assert not stats["delivered"] and stats["attempts"] == 1 and len(session.posts) == 1
+
+
+def test_gives_up_after_max_attempts(monkeypatch):
+    session = _use_session(monkeypatch, [502, 502, 502])
+
+    stats = callback_client.send_callback("https://edge/callback", "secret", {"recording_id": "rec-3"}, max_attempts=3)
+
+    assert not stats["delivered"] and stats["attempts"] == 3 and len(session.posts) == 3
+
+
+def test_large_payload_spills_to_s3_behind_a_signed_pointer(monkeypatch):
+    session = _use_session(monkeypatch, [200])
+    s3 = FakeS3()
+    monkeypatch.setattr(callback_client, "_get_s3", lambda: s3)
+    monkeypatch.setattr(callback_client, "SPILL_S3_URI", "s3://spill-bucket/callbacks")
+    monkeypatch.setattr(callback_client, "SPILL_MIN_BYTES", 1024)
+    payload = {"recording_id": "rec-4", "status": "success", "transcript_text": "word " * 1000}
+
+    stats = callback_client.send_callback("https://edge/callback", "secret", payload)
+
+    assert stats["delivered"] and stats["mode"] == "s3"
+    full_body = callback_client.dumps(payload)
+    (bucket, key), spilled = next(iter(s3.objects.items()))
+    assert bucket == "spill-bucket" and key.startswith("callbacks/rec-4/")
+    assert gzip.decompress(spilled) == full_body
+
+    sent = session.posts[0]
+    pointer = json.loads(sent["data"])
+    assert pointer["payload_sha256"] == hashlib.sha256(full_body).hexdigest()
+    assert pointer["payload_bytes"] == len(full_body)
+    assert pointer["status"] == "success" and "transcript_text" not in pointer
+    assert sent["headers"]["X-Callback-Signature"] == callback_client.sign(sent["data"], "secret")
+    assert "Content-Encoding" not in sent["headers"]
+
+
+def test_unserializable_payload_sends_an_error_result(monkeypatch):
+    session = _use_session(monkeypatch, [200])
+
+    stats = callback_client.send_callback(
+        "https://edge/callback", "secret", {"recording_id": "rec-5", "status": "success", "bad": object()}
+    )
+
+    assert stats["delivered"]
+    sent = json.loads(session.posts[0]["data"])
+    assert sent["recording_id"] == "rec-5" and sent["status"] == "error" and sent["error"]
+
+
+def test_numpy_times_from_whisper_serialize_as_a_success_payload(monkeypatch):
+    session = _use_session(monkeypatch, [200])
+    # openai-whisper returns np.float64 segment and word times
+    segments = [{
+        "speaker": "SPEAKER_01", "start": np.float64(0.1234), "end": np.float64(1.5), "text": " hi there",
+        "confidence": np.float64(0.87),
+        "words": [
+            {"word": " hi", "start": np.float64(0.1234), "end": np.float64(0.6), "score": np.float64(0.9)},
+            {"word": " there", "start": np.float64(0.7), "end": np.float64(1.5), "score": np.float32(0.8)},
+        ],
+    }]
+    _, transcript_json, utterances = format_output(segments)
+    payload = {
+        "recording_id": "rec-6", "status": "success", "transcript_json": transcript_json,
+        "speaker_embeddings": {"SPEAKER_01": np.array([0.5, -0.25], dtype=np.float32)},
+    }
+
+    body = json.loads(callback_client._encode(payload))
+    assert body["status"] == "success"
+    assert body["transcript_json"]["utterances"][0]["words"][0]["start"] == 0.123
+    assert body["speaker_embeddings"] == {"SPEAKER_01": [0.5, -0.25]}
+
+    stats = callback_client.send_callback("https://edge/callback", "secret", payload)
+    assert stats["delivered"] and json.loads(session.posts[0]["data"])["status"] == "success"
+    assert all(type(u["start"]) is float for u in utterances)
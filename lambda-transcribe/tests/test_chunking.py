@@ -0,0 +1,61 @@
+import numpy as np
+
+from chunking import find_split_points, stitch_chunks
+
+
+def _word(text, start, end):
+    return {"word": text, "start": start, "end": end, "probability": 0.9}
+
+
+def test_stitch_chunks_keeps_boundary_words_once_by_midpoint():
+    # Chunk 0 owns [0, 10), chunk 1 owns [10, inf); both heard 9.5-10.6 in their padding
+    first = {
+        "offset": 0.0, "core_start": 0.0, "core_end": 10.0,
+        "segments": [{
+            "start": 8.0, "end": 10.6, "text": " one two three",
+            "words": [_word(" one", 8.0, 9.0), _word(" two", 9.5, 10.4), _word(" three", 10.4, 10.6)],
+        }],
+    }
+    second = {
+        "offset": 9.0, "core_start": 10.0, "core_end": float("inf"),
+        "segments": [{
+            "start": 0.5, "end": 3.0, "text": " two three four",
+            "words": [_word(" two", 0.5, 1.4), _word(" three", 1.4, 1.6), _word(" four", 2.0, 3.0)],
+        }],
+    }
+
+    merged = stitch_chunks([first, second])
+
+    words = [(w["word"], w["start"], w["end"]) for seg in merged for w in seg["words"]]
+    # "two" (midpoint 9.95) belongs to chunk 0, "three" (midpoint 10.5) to chunk 1
+    assert words == [(" one", 8.0, 9.0), (" two", 9.5, 10.4), (" three", 10.4, 10.6), (" four", 11.0, 12.0)]
+    assert [seg["text"] for seg in merged] == [" one two", " three four"]
+    assert (merged[0]["start"], merged[0]["end"]) == (8.0, 10.4)
+    assert (merged[1]["start"], merged[1]["end"]) == (10.4, 12.0)
+    assert [seg["id"] for seg in merged] == [0, 1]
+
+
+def test_stitch_chunks_drops_wordless_segments_outside_the_core():
+    chunk = {
+        "offset": 100.0, "core_start": 101.0, "core_end": 200.0,
+        "segments": [
+            {"start": 0.0, "end": 0.8, "text": " padding"},
+            {"start": 2.0, "end": 4.0, "text": " core"},
+        ],
+    }
+
+    merged = stitch_chunks([chunk])
+
+    assert [(seg["text"], seg["start"], seg["end"]) for seg in merged] == [(" core", 102.0, 104.0)]
+
+
+def test_find_split_points_lands_in_silence():
+    sr = 16000
+    rng = np.random.default_rng(0)
+    audio = rng.uniform(-0.5, 0.5, 30 * sr).astype(np.float32)
+    audio[11 * sr:12 * sr] = 0.0  # the only silence near the 10s target
+
+    points = find_split_points(audio, chunk_seconds=10.0, sr=sr, search_seconds=3.0)
+
+    assert points[0] == 0 and points[-1] == len(audio)
+    assert 11 * sr <= points[1] < 12 * sr
@@ -0,0 +1,59 @@
+import json
+
+import numpy as np
+import pytest
+
+from format_output import format_output, from_compact, to_compact
+
+
+def _segments(n_segments=200, seed=0):
+    rng = np.random.default_rng(seed)
+    segments = []
+    t = 0.0
+    for i in range(n_segments):
+        words = []
+        for j in range(int(rng.integers(0, 12))):
+            start = t + float(rng.uniform(0, 0.3))
+            t = start + float(rng.uniform(0.05, 0.8))
+            words.append({"word": f" w{i}_{j}", "start": start, "end": t, "score": float(rng.uniform(0, 1))})
+        segments.append({
+            "speaker": f"SPEAKER_{int(rng.integers(0, 12)):02d}",
+            "start": words[0]["start"] if words else t,
+            "end": t + float(rng.uniform(0, 0.5)),
+            "text": " ".join(w["word"].strip() for w in words) or " [inaudible]",
+            "confidence": float(rng.uniform(0, 1)),
+            "words": words,
+        })
+    return segments
+
+
+@pytest.mark.parametrize("packed", [False, True])
+def test_compact_round_trips_exactly_through_json(packed):
+    _, _, utterances = format_output(_segments())
+
+    compact = json.loads(json.dumps(to_compact(utterances, packed=packed)))
+
+    assert from_compact(compact) == utterances
+
+
+def test_packed_columns_are_base64_strings():
+    _, _, utterances = format_output(_segments(n_segments=5))
+
+    compact = to_compact(utterances, packed=True)
+
+    assert isinstance(compact["utterances"]["start_ms"], str)
+    assert isinstance(compact["words"]["confidence"], str)
+    assert compact["utterances"]["text"] == [u["text"] for u in utterances]
+
+
+def test_empty_transcript_round_trips():
+    for packed in (False, True):
+        assert from_compact(to_compact([], packed=packed)) == []
+
+
+def test_unknown_version_is_rejected():
+    compact = to_compact([])
+    compact["version"] = 99
+
+    with pytest.raises(ValueError):
+        from_compact(compact)
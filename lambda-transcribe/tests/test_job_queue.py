@@ -0,0 +1,104 @@
+import threading
+
+import pytest
+
+from job_queue import JobQueue, QueueFull, ShuttingDown
+
+
+class Recorder:
+    """Handler that blocks on jobs marked "hold" until released and records the run order."""
+
+    def __init__(self):
+        self.ran = []
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def __call__(self, job):
+        if job.get("hold"):
+            self.started.set()
+            assert self.release.wait(5)
+        if job.get("fail"):
+            raise RuntimeError("boom")
+        self.ran.append(job["name"])
+
+
+def _busy_queue(workers=1, max_queued=10):
+    """A started queue whose only worker is held by a running job."""
+    handler = Recorder()
+    jobs = JobQueue(handler, workers=workers, max_queued=max_queued)
+    jobs.start()
+    jobs.submit({"name": "running", "hold": True})
+    assert handler.started.wait(5)
+    return jobs, handler
+
+
+def test_higher_priority_runs_first_and_equal_priorities_in_order():
+    jobs, handler = _busy_queue()
+    for name, priority in [("low-1", 0), ("high-1", 5), ("low-2", 0), ("high-2", 5), ("urgent", 9)]:
+        jobs.submit({"name": name}, priority=priority, job_id=name)
+
+    handler.release.set()
+    assert jobs.drain(timeout=5)
+
+    assert handler.ran == ["running", "urgent", "high-1", "high-2", "low-1", "low-2"]
+
+
+def test_submit_beyond_max_queued_raises_queue_full():
+    jobs, handler = _busy_queue(max_queued=2)
+
+    assert jobs.submit({"name": "a"}) == 0
+    assert jobs.submit({"name": "b"}) == 1
+    with pytest.raises(QueueFull):
+        jobs.submit({"name": "c"})
+    assert jobs.stats()["rejected"] == 1
+
+    handler.release.set()
+    assert jobs.drain(timeout=5)
+    assert handler.ran == ["running", "a", "b"]
+
+
+def test_free_workers_do_not_count_against_max_queued():
+    jobs = JobQueue(Recorder(), workers=2, max_queued=0)
+    jobs.start()
+
+    assert jobs.submit({"name": "a"}) == 0
+    assert jobs.drain(timeout=5)
+
+
+def test_failed_job_is_counted_and_the_worker_keeps_serving():
+    handler = Recorder()
+    jobs = JobQueue(handler, workers=1)
+    jobs.start()
+
+    jobs.submit({"name": "bad", "fail": True})
+    jobs.submit({"name": "good"})
+    assert jobs.drain(timeout=5)
+
+    stats = jobs.stats()
+    assert (stats["completed"], stats["failed"]) == (1, 1)
+    assert handler.ran == ["good"]
+
+
+def test_submit_after_drain_raises_shutting_down():
+    jobs = JobQueue(Recorder())
+    jobs.start()
+    assert jobs.drain(timeout=5)
+
+    with pytest.raises(ShuttingDown):
+        jobs.submit({"name": "late"})
+    assert not jobs.stats()["accepting"]
+
+
+def test_drain_times_out_while_a_job_runs_then_completes_once_it_finishes():
+    jobs, handler = _busy_queue()
+    jobs.submit({"name": "queued"})
+
+    assert jobs.drain(timeout=0.1) is False
+    # Draining stopped intake even though it timed out; queued work still runs
+    with pytest.raises(ShuttingDown):
+        jobs.submit({"name": "late"})
+    assert jobs.stats()["queued_jobs"] == 1
+
+    handler.release.set()
+    assert jobs.drain(timeout=5) is True
+    assert handler.ran == ["running", "queued"]
@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+
+from diarize import DIARIZE_BACKEND
+from result_cache import cache_key
+from transcribe import DEFAULT_BACKEND
+
+AUDIO = np.linspace(-1, 1, 16000, dtype=np.float32)
+
+
+def test_defaults_hash_like_their_explicit_values():
+    assert cache_key(AUDIO, {}) == cache_key(AUDIO, {
+        "model_size": "medium", "backend": DEFAULT_BACKEND, "diarize_backend": DIARIZE_BACKEND,
+    })
+
+
+@pytest.mark.parametrize("setting", [
+    {"diarize_backend": "onnx" if DIARIZE_BACKEND == "torch" else "torch"},
+    {"backend": "faster-whisper" if DEFAULT_BACKEND == "whisper" else "whisper"},
+    {"model_size": "large-v3"},
+    {"language": "de"},
+    {"num_speakers": 3},
+    {"chunked": True},
+    {"trim_silence": True},
+])
+def test_output_affecting_settings_change_the_key(setting):
+    assert cache_key(AUDIO, setting) != cache_key(AUDIO, {})
+
+
+def test_different_audio_changes_the_key():
+    assert cache_key(AUDIO[::-1].copy(), {}) != cache_key(AUDIO, {})
+
+
+def test_batched_results_are_keyed_apart_from_single_runs():
+    single = {"backend": "whisper"}
+    batched = {"batch_id": "b1", "batch_accepted_at": 0.0}
+
+    assert cache_key(AUDIO, batched) != cache_key(AUDIO, single)
+    assert cache_key(AUDIO, batched) == cache_key(AUDIO, {**batched, "batch_id": "b2"})
@@ -0,0 +1,56 @@
+import numpy as np
+
+from speaker_index import MAX_TURN_SECONDS, SpeakerTurns, assign_speakers
+
+
+def brute_force(turns, span_starts, span_ends, speakers):
+    result = []
+    for start, end in zip(span_starts, span_ends):
+        totals = {}
+        for turn_start, turn_end, label in turns:
+            overlap = min(end, turn_end) - max(start, turn_start)
+            if overlap > 0:
+                totals[label] = totals.get(label, 0) + overlap
+        result.append(speakers.index(max(totals, key=totals.get)) if totals else -1)
+    return result
+
+
+def test_assign_matches_brute_force_with_a_long_turn():
+    rng = np.random.default_rng(0)
+    turns = [(0.0, 7200.0, "SPEAKER_00")]  # one speaker track that never closes
+    t = 0.0
+    while t < 7200:
+        length = rng.uniform(0.5, 4.0)
+        turns.append((t, t + length, f"SPEAKER_{rng.integers(1, 4):02d}"))
+        t += length + rng.uniform(-0.3, 0.8)
+
+    index = SpeakerTurns(*zip(*turns))
+    span_starts = rng.uniform(0, 7190, 500)
+    span_ends = span_starts + rng.uniform(0.1, 8.0, 500)
+
+    assert list(index.assign(span_starts, span_ends)) == brute_force(turns, span_starts, span_ends, index.speakers)
+
+
+def test_long_turns_are_split_so_lookups_stay_local():
+    index = SpeakerTurns([0.0, 10.0, 3600.0], [7200.0, 12.0, 3605.0], ["A", "B", "C"])
+
+    # Running max of ends never runs more than one piece ahead of the starts
+    assert np.all(index.max_ends - index.starts <= MAX_TURN_SECONDS + 1e-9)
+    # Pieces cover the long turn exactly
+    pieces = index.label_idx == index.speakers.index("A")
+    assert index.starts[pieces].min() == 0.0 and index.ends[pieces].max() == 7200.0
+    assert np.isclose((index.ends[pieces] - index.starts[pieces]).sum(), 7200.0)
+
+
+def test_assign_speakers_labels_segments_and_words():
+    index = SpeakerTurns([0.0, 5.0], [5.0, 10.0], ["SPEAKER_00", "SPEAKER_01"])
+    segments = [
+        {"start": 1.0, "end": 6.0, "words": [{"start": 1.0, "end": 1.5}, {"start": 5.5, "end": 6.0}]},
+        {"start": 20.0, "end": 21.0, "words": []},
+    ]
+
+    assign_speakers(index, segments)
+
+    assert segments[0]["speaker"] == "SPEAKER_00"
+    assert [w["speaker"] for w in segments[0]["words"]] == ["SPEAKER_00", "SPEAKER_01"]
+    assert segments[1]["speaker"] == "SPEAKER_00"  # nothing overlaps: default speaker
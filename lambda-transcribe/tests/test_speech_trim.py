@@ -0,0 +1,102 @@
+import numpy as np
+import pytest
+
+from speaker_index import SpeakerTurns
+from speech_trim import SpeechMap, find_speech
+
+SR = 16000
+
+
+def _noise(seconds, db, rng):
+    """Gaussian noise at the given RMS level in dBFS."""
+    return (rng.standard_normal(int(seconds * SR)) * 10 ** (db / 20)).astype(np.float32)
+
+
+def _meeting(rng):
+    # 0-20s loud local speaker, 20-40s room noise, 40-50s quiet remote speaker
+    # (9 dB over the room noise), 50-70s room noise
+    return np.concatenate([
+        _noise(20, -20, rng), _noise(20, -56, rng), _noise(10, -47, rng), _noise(20, -56, rng),
+    ])
+
+
+def _kept(speech_map, start, end):
+    """Seconds of [start, end) that the map keeps."""
+    regions = speech_map.regions / SR
+    return float(np.sum(np.clip(np.minimum(regions[:, 1], end) - np.maximum(regions[:, 0], start), 0, None)))
+
+
+def test_quiet_speaker_is_kept_while_room_noise_is_cut():
+    audio = _meeting(np.random.default_rng(0))
+
+    speech_map = find_speech(audio)
+
+    assert speech_map is not None
+    assert _kept(speech_map, 0, 20) == pytest.approx(20, abs=0.05)
+    assert _kept(speech_map, 40, 50) == pytest.approx(10, abs=0.05)
+    assert speech_map.skipped_seconds > 35
+
+
+def test_diarized_speech_is_never_cut_whatever_its_level():
+    rng = np.random.default_rng(1)
+    audio = np.concatenate([_noise(20, -20, rng), _noise(30, -70, rng), _noise(10, -20, rng)])
+    # A whisper-quiet speaker at 25-35s, below the energy threshold but found by diarization
+    turns = SpeakerTurns([0.0, 25.0, 50.0], [20.0, 35.0, 60.0], ["SPEAKER_00", "SPEAKER_01", "SPEAKER_00"])
+
+    without_turns = find_speech(audio)
+    with_turns = find_speech(audio, turns=turns)
+
+    assert _kept(without_turns, 25, 35) == 0
+    assert _kept(with_turns, 25, 35) == pytest.approx(10, abs=0.05)
+    assert with_turns.skipped_seconds > 5
+
+
+def test_nothing_to_skip_returns_none():
+    audio = _noise(30, -20, np.random.default_rng(2))
+
+    assert find_speech(audio) is None
+
+
+def test_to_original_maps_each_side_of_a_cut():
+    # Keep 0-10s and 20-30s of a 30s recording: compact 10.0 is the cut
+    speech_map = SpeechMap(np.array([[0, 10 * SR], [20 * SR, 30 * SR]]), 30 * SR)
+
+    starts = speech_map.to_original([0.0, 5.0, 10.0, 15.0, 20.0])
+    ends = speech_map.to_original([10.0, 15.0, 20.0], ends=True)
+
+    np.testing.assert_allclose(starts, [0.0, 5.0, 20.0, 25.0, 30.0])
+    np.testing.assert_allclose(ends, [10.0, 25.0, 30.0])
+    assert speech_map.kept_seconds == 20 and speech_map.skipped_seconds == 10
+
+
+def test_remap_segments_moves_segments_and_words_in_place():
+    speech_map = SpeechMap(np.array([[2 * SR, 6 * SR], [16 * SR, 20 * SR]]), 20 * SR)
+    segments = [{
+        "start": 3.0, "end": 5.5, "text": " across the cut",
+        "words": [
+            {"word": " across", "start": 3.0, "end": 3.5},
+            {"word": " the", "start": 3.6, "end": 4.0},
+            {"word": " cut", "start": 4.0, "end": 5.5},
+            {"word": " 50%"},
+        ],
+    }]
+
+    result = speech_map.remap_segments(segments)
+
+    assert result is segments
+    seg = segments[0]
+    # Compact [0, 4) is original [2, 6) and compact [4, 8) is [16, 20): "the" ends on
+    # the cut (stays before it), "cut" starts on it (moves after it)
+    assert (seg["start"], seg["end"]) == (5.0, 17.5)
+    assert [(w["start"], w["end"]) for w in seg["words"][:3]] == [(5.0, 5.5), (5.6, 6.0), (16.0, 17.5)]
+    assert "start" not in seg["words"][3]
+
+
+def test_compact_concatenates_kept_regions():
+    audio = np.arange(10 * SR, dtype=np.float32)
+    speech_map = SpeechMap(np.array([[0, SR], [5 * SR, 6 * SR]]), len(audio))
+
+    compacted = speech_map.compact(audio)
+
+    assert len(compacted) == 2 * SR
+    assert compacted[SR] == 5 * SR
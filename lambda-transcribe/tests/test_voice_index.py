@@ -0,0 +1,122 @@
+import multiprocessing
+
+import numpy as np
+import pytest
+
+from voice_index import VoiceIndex
+
+DIM = 16
+
+
+def _unit(v):
+    v = np.asarray(v, dtype=np.float32)
+    return v / np.linalg.norm(v)
+
+
+def _basis(i):
+    v = np.zeros(DIM, dtype=np.float32)
+    v[i] = 1.0
+    return v
+
+
+def test_add_then_identify_names_matching_speakers(tmp_path):
+    index = VoiceIndex(str(tmp_path))
+    assert index.add("alice", [_basis(0), _unit(_basis(0) + 0.1 * _basis(5))], name="Alice") == {
+        "voice_id": "alice", "samples": 2, "voices": 1,
+    }
+    index.add("bob", _basis(1), name="Bob")
+
+    identities = index.identify({
+        "SPEAKER_00": _unit(_basis(1) + 0.05 * _basis(7)),
+        "SPEAKER_01": _basis(0),
+        "SPEAKER_02": _basis(3),  # nobody enrolled
+    })
+
+    assert {label: match["voice_id"] for label, match in identities.items()} == {
+        "SPEAKER_00": "bob", "SPEAKER_01": "alice",
+    }
+    assert identities["SPEAKER_01"]["name"] == "Alice"
+
+
+def test_identify_gives_each_voice_to_one_speaker(tmp_path):
+    index = VoiceIndex(str(tmp_path))
+    index.add("alice", _basis(0), name="Alice")
+    index.add("bob", _unit(_basis(0) + _basis(1)), name="Bob")
+
+    # Both speakers are closest to alice; the closer one gets her, the other falls back to bob
+    identities = index.identify({
+        "SPEAKER_00": _unit(_basis(0) + 0.2 * _basis(1)),
+        "SPEAKER_01": _unit(_basis(0) + 0.3 * _basis(1)),
+    }, threshold=0.5)
+
+    assert identities["SPEAKER_00"]["voice_id"] == "alice"
+    assert identities["SPEAKER_01"]["voice_id"] == "bob"
+    assert len({m["voice_id"] for m in identities.values()}) == len(identities)
+
+
+def test_identify_leaves_a_speaker_unnamed_when_only_taken_voices_match(tmp_path):
+    index = VoiceIndex(str(tmp_path))
+    index.add("alice", _basis(0))
+
+    identities = index.identify({"SPEAKER_00": _basis(0), "SPEAKER_01": _unit(_basis(0) + 0.1 * _basis(2))})
+
+    assert list(identities) == ["SPEAKER_00"]
+
+
+def test_writers_on_the_same_directory_do_not_lose_each_others_voices(tmp_path):
+    first = VoiceIndex(str(tmp_path))
+    second = VoiceIndex(str(tmp_path))  # opened before first wrote anything, like another process
+
+    first.add("alice", _basis(0))
+    second.add("bob", _basis(1))
+    first.add("alice", _basis(0))
+
+    reopened = VoiceIndex(str(tmp_path))
+    assert reopened.stats() == {"voices": 2, "samples": 3, "dimension": DIM}
+    assert {v["voice_id"]: v["samples"] for v in reopened.voices} == {"alice": 2, "bob": 1}
+    assert reopened.search(_basis(1))[0][0][0] == "bob"
+
+
+def _enroll(directory, worker):
+    index = VoiceIndex(directory)
+    for i in range(10):
+        index.add(f"voice-{worker}-{i}", _basis((worker + i) % DIM))
+
+
+def test_concurrent_processes_enroll_into_one_index(tmp_path):
+    ctx = multiprocessing.get_context("fork")
+    processes = [ctx.Process(target=_enroll, args=(str(tmp_path), worker)) for worker in range(4)]
+    for p in processes:
+        p.start()
+    for p in processes:
+        p.join(30)
+        assert p.exitcode == 0
+
+    index = VoiceIndex(str(tmp_path))
+    assert index.stats() == {"voices": 40, "samples": 40, "dimension": DIM}
+    assert {v["voice_id"] for v in index.voices} == {f"voice-{w}-{i}" for w in range(4) for i in range(10)}
+
+
+def test_uncommitted_rows_of_a_dead_writer_are_dropped(tmp_path):
+    index = VoiceIndex(str(tmp_path))
+    index.add("alice", _basis(0))
+    # A writer that appended but died before replacing voices.json
+    with open(tmp_path / "samples.f32", "ab") as f:
+        f.write(_basis(5).tobytes())
+    with open(tmp_path / "rows.i32", "ab") as f:
+        f.write(np.int32(0).tobytes())
+
+    index.add("bob", _basis(1))
+
+    reopened = VoiceIndex(str(tmp_path))
+    assert reopened.samples == 2
+    assert (tmp_path / "samples.f32").stat().st_size == 2 * DIM * 4
+    assert reopened.search(_basis(0))[0][0][2] == pytest.approx(1.0)
+
+
+def test_rejects_a_different_dimension(tmp_path):
+    index = VoiceIndex(str(tmp_path))
+    index.add("alice", _basis(0))
+
+    with pytest.raises(ValueError):
+        index.add("bob", np.ones(DIM + 1))
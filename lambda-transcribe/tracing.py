@@ -0,0 +1,206 @@
+"""Per-stage tracing for the processing pipelines.
+
+A Trace records one span per pipeline stage: wall time, bytes processed,
+throughput, real-time factor (stage seconds / media seconds) and the peak
+resident memory seen while the stage ran. trace.as_dict() is the "timings"
+block sent with every callback.
+
+Finished traces are folded into process-wide Prometheus-style histograms
+(metrics.observe_trace) which server.py exposes on /metrics.
+"""
+
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+RSS_SAMPLE_SECONDS = 0.05
+
+# Histogram bucket upper bounds
+SECONDS_BUCKETS = (0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1200, 1800, 3600)
+RTF_BUCKETS = (0.01, 0.02, 0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1, 1.5, 2, 5)
+RSS_BUCKETS = tuple(mb * 1024 * 1024 for mb in (256, 512, 1024, 2048, 3072, 4096, 6144, 8192, 12288, 16384))
+
+
+def rss_bytes() -> int:
+    """Current resident set size (Linux), 0 if unavailable."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+class _RssSampler:
+    """Background thread tracking peak RSS for every open span (runs only while spans are open)."""
+
+    def __init__(self, interval: float):
+        self._interval = interval
+        self._open = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def watch(self, span: dict):
+        span["peak_rss"] = rss_bytes()
+        with self._lock:
+            self._open.append(span)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="rss-sampler", daemon=True)
+                self._thread.start()
+        self._wake.set()
+
+    def unwatch(self, span: dict):
+        rss = rss_bytes()
+        with self._lock:
+            span["peak_rss"] = max(span["peak_rss"], rss)
+            self._open.remove(span)
+
+    def _run(self):
+        while True:
+            self._wake.wait()
+            time.sleep(self._interval)
+            rss = rss_bytes()
+            with self._lock:
+                for span in self._open:
+                    span["peak_rss"] = max(span["peak_rss"], rss)
+                if not self._open:
+                    self._wake.clear()
+
+
+_sampler = _RssSampler(RSS_SAMPLE_SECONDS)
+
+
+class Trace:
+    """Spans for one job. Safe to use from several threads (e.g. concurrent stages)."""
+
+    def __init__(self):
+        self.media_seconds = None  # set once the input duration is known, enables RTF
+        self._spans = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name: str, nbytes: int = None):
+        """
+        Time a stage. Yields the span dict; set span["bytes"] inside the block
+        if the byte count is only known afterwards.
+        """
+        span = {"bytes": nbytes}
+        _sampler.watch(span)
+        start = time.perf_counter()
+        try:
+            yield span
+        finally:
+            span["seconds"] = time.perf_counter() - start
+            _sampler.unwatch(span)
+            with self._lock:
+                self._spans[name] = span
+
+    def add(self, name: str, seconds: float, nbytes: int = None):
+        """Record a stage timed elsewhere (e.g. inside a worker process)."""
+        with self._lock:
+            self._spans[name] = {"seconds": seconds, "bytes": nbytes, "peak_rss": None}
+
+    def seconds(self, name: str):
+        span = self._spans.get(name)
+        return round(span["seconds"], 2) if span else None
+
+    def as_dict(self) -> dict:
+        """Callback "timings" block: {stage: {seconds, bytes, mb_per_s, rtf, peak_rss_mb}}."""
+        with self._lock:
+            spans = dict(self._spans)
+        timings = {}
+        for name, span in spans.items():
+            seconds = span["seconds"]
+            entry = {"seconds": round(seconds, 3)}
+            if span.get("bytes"):
+                entry["bytes"] = span["bytes"]
+                entry["mb_per_s"] = round(span["bytes"] / seconds / 1e6, 2) if seconds > 0 else None
+            if self.media_seconds:
+                entry["rtf"] = round(seconds / self.media_seconds, 4)
+            if span.get("peak_rss"):
+                entry["peak_rss_mb"] = round(span["peak_rss"] / 1e6, 1)
+            timings[name] = entry
+        return timings
+
+    def summary(self) -> str:
+        with self._lock:
+            spans = dict(self._spans)
+        return ", ".join(f"{name} {span['seconds']:.2f}s" for name, span in spans.items())
+
+
+class _Histogram:
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.count += 1
+        self.sum += value
+
+
+class Metrics:
+    """Process-wide stage histograms and job counters in Prometheus text format."""
+
+    def __init__(self, prefix: str):
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._histograms = {}  # (metric, stage) -> _Histogram
+        self._jobs = {}        # status -> count
+
+    def _observe(self, metric: str, buckets: tuple, stage: str, value: float):
+        key = (metric, stage)
+        hist = self._histograms.get(key)
+        if hist is None:
+            hist = self._histograms[key] = _Histogram(buckets)
+        hist.observe(value)
+
+    def observe_trace(self, trace: Trace, status: str):
+        with trace._lock:
+            spans = dict(trace._spans)
+        with self._lock:
+            self._jobs[status] = self._jobs.get(status, 0) + 1
+            for stage, span in spans.items():
+                self._observe("stage_seconds", SECONDS_BUCKETS, stage, span["seconds"])
+                if trace.media_seconds:
+                    self._observe("stage_rtf", RTF_BUCKETS, stage, span["seconds"] / trace.media_seconds)
+                if span.get("peak_rss"):
+                    self._observe("stage_peak_rss_bytes", RSS_BUCKETS, stage, span["peak_rss"])
+
+    def render(self, gauges: dict = None) -> str:
+        """Prometheus text exposition; gauges is an optional {name: value} of extra gauges."""
+        p = self.prefix
+        lines = [f"# TYPE {p}_jobs_total counter"]
+        with self._lock:
+            for status, count in sorted(self._jobs.items()):
+                lines.append(f'{p}_jobs_total{{status="{status}"}} {count}')
+
+            by_metric = {}
+            for (metric, stage), hist in sorted(self._histograms.items()):
+                by_metric.setdefault(metric, []).append((stage, hist))
+            for metric, entries in by_metric.items():
+                lines.append(f"# TYPE {p}_{metric} histogram")
+                for stage, hist in entries:
+                    for bound, count in zip(hist.buckets, hist.counts):
+                        lines.append(f'{p}_{metric}_bucket{{stage="{stage}",le="{bound}"}} {count}')
+                    lines.append(f'{p}_{metric}_bucket{{stage="{stage}",le="+Inf"}} {hist.count}')
+                    lines.append(f'{p}_{metric}_sum{{stage="{stage}"}} {hist.sum:.6g}')
+                    lines.append(f'{p}_{metric}_count{{stage="{stage}"}} {hist.count}')
+
+        for name, value in (gauges or {}).items():
+            lines.append(f"# TYPE {p}_{name} gauge")
+            lines.append(f"{p}_{name} {value}")
+        lines.append(f"# TYPE {p}_process_resident_memory_bytes gauge")
+        lines.append(f"{p}_process_resident_memory_bytes {rss_bytes()}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics(os.environ.get("METRICS_PREFIX", "use60_pipeline"))
@@ -1,42 +1,40 @@
-"""OpenAI Whisper transcription with word-level timestamps."""
+"""Whisper transcription with word-level timestamps.
+
+Two interchangeable backends produce the same openai-whisper segment shape
+({"start", "end", "text", "words": [{"word", "start", "end", "probability"}]}):
+
+- "whisper": openai-whisper, PyTorch float32 on CPU (default).
+- "faster-whisper": CTranslate2 with int8 weights on CPU. Several times
+  faster and smaller in memory, and supports large-v3 natively.
+"""
 
 import logging
+import os
 
-import whisper
+from model_manager import models
 
 logger = logging.getLogger(__name__)
 
-# Cache loaded models to avoid reloading across requests
-_model_cache = {}
+DEFAULT_BACKEND = os.environ.get("TRANSCRIBE_BACKEND", "whisper")
+FASTER_WHISPER_COMPUTE_TYPE = os.environ.get("FASTER_WHISPER_COMPUTE_TYPE", "int8")
+FASTER_WHISPER_CPU_THREADS = int(os.environ.get("FASTER_WHISPER_CPU_THREADS", "0"))  # 0 = all cores
 
+# Map model names (large-v3 not available in openai-whisper, use large)
+MODEL_MAP = {
+    "large-v3": "large",
+    "large-v2": "large",
+}
 
-def transcribe(wav_path: str, model_size: str = "medium", language: str = None) -> tuple:
-    """
-    Transcribe audio using OpenAI Whisper with word-level timestamps.
 
-    Args:
-        wav_path: Path to 16kHz mono WAV file.
-        model_size: Whisper model size ('small', 'medium', 'large-v3' -> 'large').
-        language: ISO language code or None for auto-detect.
+def _load_openai_whisper(model_size: str):
+    # Imported on use so the backend defaults here can be read without loading torch
+    import whisper
 
-    Returns:
-        Tuple of (segments_with_words, detected_language).
-    """
-    # Map model names (large-v3 not available in openai-whisper, use large)
-    model_map = {
-        "large-v3": "large",
-        "large-v2": "large",
-    }
-    model_name = model_map.get(model_size, model_size)
+    model_name = MODEL_MAP.get(model_size, model_size)
+    return models.get(f"whisper:{model_name}", lambda: whisper.load_model(model_name))
 
-    # Load model (cached across requests)
-    if model_name not in _model_cache:
-        logger.info(f"Loading Whisper model: {model_name}")
-        _model_cache[model_name] = whisper.load_model(model_name)
-    model = _model_cache[model_name]
 
-    # Transcribe with word timestamps
-    logger.info(f"Transcribing with model={model_name}, language={language or 'auto'}")
+def _transcribe_openai_whisper(model, wav_path: str, language: str = None) -> tuple:
     transcribe_options = {
         "word_timestamps": True,
         "verbose": False,
@@ -45,8 +43,115 @@ def transcribe(wav_path: str, model_size: str = "medium", language: str = None)
         transcribe_options["language"] = language
 
     result = model.transcribe(wav_path, **transcribe_options)
-    detected_language = result.get("language", language or "en")
-    segments = result.get("segments", [])
+    return result.get("segments", []), result.get("language", language or "en")
+
+
+def _load_faster_whisper(model_size: str):
+    # Optional dependency — only imported when the backend is requested
+    from faster_whisper import WhisperModel
+
+    key = f"faster-whisper:{model_size}:{FASTER_WHISPER_COMPUTE_TYPE}"
+    return models.get(
+        key,
+        lambda: WhisperModel(
+            model_size,
+            device="cpu",
+            compute_type=FASTER_WHISPER_COMPUTE_TYPE,
+            cpu_threads=FASTER_WHISPER_CPU_THREADS,
+        ),
+    )
+
+
+def _transcribe_faster_whisper(model, wav_path: str, language: str = None) -> tuple:
+    fw_segments, info = model.transcribe(
+        wav_path,
+        language=language,
+        word_timestamps=True,
+        beam_size=5,
+    )
+
+    # Convert to the openai-whisper dict shape consumed by diarize/format_output
+    segments = []
+    for seg in fw_segments:
+        segments.append({
+            "id": seg.id,
+            "seek": seg.seek,
+            "start": seg.start,
+            "end": seg.end,
+            "text": seg.text,
+            "tokens": list(seg.tokens),
+            "temperature": seg.temperature,
+            "avg_logprob": seg.avg_logprob,
+            "compression_ratio": seg.compression_ratio,
+            "no_speech_prob": seg.no_speech_prob,
+            "words": [
+                {"word": w.word, "start": w.start, "end": w.end, "probability": w.probability}
+                for w in (seg.words or [])
+            ],
+        })
+    return segments, info.language or language or "en"
+
+
+def _detect_openai_whisper(model, audio) -> str:
+    import whisper
+
+    mel = whisper.log_mel_spectrogram(whisper.pad_or_trim(audio), n_mels=model.dims.n_mels).to(model.device)
+    _, probs = model.detect_language(mel)
+    return max(probs, key=probs.get)
+
+
+def _detect_faster_whisper(model, audio) -> str:
+    # Segments are generated lazily: without iterating them this only runs language detection
+    _, info = model.transcribe(audio)
+    return info.language
+
+
+# backend name -> (loader(model_size), run(model, wav_path, language))
+BACKENDS = {
+    "whisper": (_load_openai_whisper, _transcribe_openai_whisper),
+    "faster-whisper": (_load_faster_whisper, _transcribe_faster_whisper),
+}
+
+
+# backend name -> detect(model, audio)
+DETECTORS = {
+    "whisper": _detect_openai_whisper,
+    "faster-whisper": _detect_faster_whisper,
+}
+
+
+def load_model(model_size: str = "medium", backend: str = None):
+    """Return the model for model_size on the given backend, loading it through the shared cache."""
+    backend = backend or DEFAULT_BACKEND
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown transcription backend: {backend} (expected one of {sorted(BACKENDS)})")
+    loader, _ = BACKENDS[backend]
+    return loader(model_size)
+
+
+def transcribe(wav_path: str, model_size: str = "medium", language: str = None, backend: str = None) -> tuple:
+    """
+    Transcribe audio with word-level timestamps.
+
+    Args:
+        wav_path: Path to 16kHz mono WAV file, or a float32 array of 16kHz samples.
+        model_size: Whisper model size ('small', 'medium', 'large-v3'; openai-whisper maps
+            'large-v3' -> 'large').
+        language: ISO language code or None for auto-detect.
+        backend: 'whisper' or 'faster-whisper'. Defaults to TRANSCRIBE_BACKEND.
+
+    Returns:
+        Tuple of (segments_with_words, detected_language).
+    """
+    backend = backend or DEFAULT_BACKEND
+
+    # Load model (cached across requests, LRU-evicted under memory budget)
+    model = load_model(model_size, backend)
+    _, run = BACKENDS[backend]
+
+    # Transcribe with word timestamps
+    logger.info(f"Transcribing with backend={backend}, model={model_size}, language={language or 'auto'}")
+    segments, detected_language = run(model, wav_path, language)
 
     logger.info(f"Transcribed {len(segments)} segments, language={detected_language}")
 
@@ -55,3 +160,12 @@ def transcribe(wav_path: str, model_size: str = "medium", language: str = None)
         return [], detected_language
 
     return segments, detected_language
+
+
+def detect_language(audio, model_size: str = "medium", backend: str = None) -> str:
+    """Spoken language (ISO code) of the first 30s of 16kHz float32 samples, as Whisper auto-detects it."""
+    backend = backend or DEFAULT_BACKEND
+    model = load_model(model_size, backend)
+    language = DETECTORS[backend](model, audio)
+    logger.info(f"Detected language {language} with backend={backend}, model={model_size}")
+    return language
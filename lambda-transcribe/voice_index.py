@@ -0,0 +1,278 @@
+"""Per-org index of enrolled voice embeddings for recurring-speaker identification.
+
+Diarization labels speakers SPEAKER_00, SPEAKER_01, ... afresh in every
+meeting. pyannote also returns one embedding (cluster centroid) per detected
+speaker; matching those against the voices an org has enrolled (its reps,
+repeat contacts) names the speakers before the transcript leaves the service.
+
+Each org's index is a directory under VOICE_INDEX_DIR:
+
+- samples.f32 / rows.i32: every enrolled sample (L2-normalised float32) and
+  the voice it belongs to, append-only;
+- centroids.f32: one normalised mean-of-samples row per voice, memory-mapped
+  and searched with a single matrix product plus an argpartition for the top k;
+- voices.json: voice ids, names, sample counts, dimension.
+
+Adding samples appends them, rewrites the centroids of the voices they belong
+to in place and then replaces voices.json, so a reader never sees a voice
+count ahead of the centroid rows. Writers hold an exclusive flock on the
+directory's .lock file and reload voices.json under it, so several processes
+(uvicorn workers, containers sharing the volume) can enroll into one index.
+"""
+
+import fcntl
+import json
+import logging
+import os
+import re
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+VOICE_INDEX_DIR = os.environ.get("VOICE_INDEX_DIR", "/data/voice-index")  # empty = identification off
+# Minimum cosine similarity between a meeting speaker and an enrolled voice to name them
+VOICE_MATCH_THRESHOLD = float(os.environ.get("VOICE_MATCH_THRESHOLD", "0.55"))
+VOICE_TOP_K = 5
+_ORG_ID = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+def _normalize(vectors) -> np.ndarray:
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    if not np.all(np.isfinite(vectors)) or np.any(norms == 0):
+        raise ValueError("Embeddings must be finite and non-zero")
+    return vectors / norms
+
+
+class VoiceIndex:
+    """One org's enrolled voices: per-voice centroids on disk, searched by cosine similarity."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self.dimension = None
+        self.samples = 0
+        self.voices = []      # [{"voice_id", "name", "samples"}], position = voice code = centroid row
+        self._codes = {}      # voice_id -> voice code
+        self._centroids = np.zeros((0, 0), dtype=np.float32)
+        self._mtime = None
+        self._load()
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def _load(self):
+        try:
+            self._mtime = os.path.getmtime(self._path("voices.json"))
+            with open(self._path("voices.json")) as f:
+                meta = json.load(f)
+        except FileNotFoundError:
+            return
+        self.dimension = meta["dimension"]
+        self.samples = meta["samples"]
+        self.voices = meta["voices"]
+        self._codes = {v["voice_id"]: i for i, v in enumerate(self.voices)}
+        self._map()
+
+    def _map(self):
+        if self.voices:
+            self._centroids = np.memmap(
+                self._path("centroids.f32"), dtype=np.float32, mode="r", shape=(len(self.voices), self.dimension)
+            )
+
+    @contextmanager
+    def _write_lock(self):
+        """This index's thread lock plus an exclusive flock shared with other processes."""
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(self._path(".lock"), "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def refresh(self):
+        """Pick up voices another process enrolled since this index was loaded."""
+        try:
+            mtime = os.path.getmtime(self._path("voices.json"))
+        except FileNotFoundError:
+            return
+        with self._lock:
+            if mtime != self._mtime:
+                self._load()
+
+    def add(self, voice_id: str, embeddings, name: str = None) -> dict:
+        """
+        Enroll one or more embedding samples for a voice (new or existing).
+
+        Args:
+            voice_id: Caller's stable id for the person (e.g., a user or contact id).
+            embeddings: (dimension,) or (n, dimension) speaker embeddings.
+            name: Display name returned with matches (kept from the latest add that sets one).
+
+        Returns:
+            {"voice_id", "samples" (for this voice), "voices" (in the index)}.
+        """
+        vectors = _normalize(embeddings)
+        self.add_many([voice_id] * len(vectors), vectors, [name] * len(vectors))
+        with self._lock:
+            return {
+                "voice_id": voice_id,
+                "samples": self.voices[self._codes[voice_id]]["samples"],
+                "voices": len(self.voices),
+            }
+
+    def add_many(self, voice_ids: list, embeddings, names: list = None):
+        """Enroll row i of embeddings as a sample of voice_ids[i], with a single metadata write."""
+        vectors = _normalize(embeddings)
+        if len(voice_ids) != len(vectors):
+            raise ValueError(f"{len(voice_ids)} voice ids for {len(vectors)} embeddings")
+        names = names or [None] * len(vectors)
+
+        with self._write_lock():
+            # Another process may have enrolled since this index was loaded
+            self._load()
+            if self.dimension is not None and vectors.shape[1] != self.dimension:
+                raise ValueError(f"Expected {self.dimension}-dimensional embeddings, got {vectors.shape[1]}")
+            dimension = vectors.shape[1]
+
+            # Drop rows of a writer that died before committing voices.json
+            for name, row_bytes in (("samples.f32", dimension * 4), ("rows.i32", 4)):
+                open(self._path(name), "ab").close()
+                os.truncate(self._path(name), self.samples * row_bytes)
+
+            codes = np.empty(len(vectors), dtype=np.int32)
+            for i, (voice_id, name) in enumerate(zip(voice_ids, names)):
+                code = self._codes.get(voice_id)
+                if code is None:
+                    code = len(self.voices)
+                    self._codes[voice_id] = code
+                    self.voices.append({"voice_id": voice_id, "name": name, "samples": 0})
+                elif name:
+                    self.voices[code]["name"] = name
+                self.voices[code]["samples"] += 1
+                codes[i] = code
+
+            with open(self._path("samples.f32"), "ab") as f:
+                f.write(vectors.tobytes())
+            with open(self._path("rows.i32"), "ab") as f:
+                f.write(codes.tobytes())
+            self.samples += len(vectors)
+
+            # Recompute the centroids of the touched voices from all their samples
+            samples = np.memmap(self._path("samples.f32"), dtype=np.float32, mode="r", shape=(self.samples, dimension))
+            rows = np.memmap(self._path("rows.i32"), dtype=np.int32, mode="r", shape=(self.samples,))
+            touched = np.unique(codes)
+            mask = np.isin(rows, touched)
+            sums = np.zeros((len(touched), dimension), dtype=np.float32)
+            np.add.at(sums, np.searchsorted(touched, rows[mask]), samples[mask])
+
+            path = self._path("centroids.f32")
+            open(path, "ab").close()
+            os.truncate(path, len(self.voices) * dimension * 4)
+            centroids = np.memmap(path, dtype=np.float32, mode="r+", shape=(len(self.voices), dimension))
+            centroids[touched] = _normalize(sums)
+            centroids.flush()
+            del centroids
+
+            self.dimension = dimension
+            tmp_path = self._path(f"voices.json.{os.getpid()}.tmp")
+            with open(tmp_path, "w") as f:
+                json.dump({"dimension": self.dimension, "samples": self.samples, "voices": self.voices}, f)
+            os.replace(tmp_path, self._path("voices.json"))
+            self._mtime = os.path.getmtime(self._path("voices.json"))
+            self._map()
+
+        logger.info(
+            f"Enrolled {len(vectors)} sample(s) for {len(touched)} voice(s) "
+            f"({len(self.voices)} voices in {self.directory})"
+        )
+
+    def search(self, embeddings, k: int = VOICE_TOP_K) -> list:
+        """
+        Top-k enrolled voices for each query embedding.
+
+        Returns:
+            Per query, up to k (voice_id, name, score) sorted by descending cosine similarity.
+        """
+        queries = _normalize(embeddings)
+        with self._lock:
+            centroids, voices = self._centroids, self.voices
+        if not len(centroids):
+            return [[] for _ in queries]
+        if queries.shape[1] != centroids.shape[1]:
+            raise ValueError(f"Expected {centroids.shape[1]}-dimensional embeddings, got {queries.shape[1]}")
+
+        scores = (centroids @ queries.T).T  # (queries, voices); centroid matrix as the BLAS row operand
+        k = min(k, len(centroids))
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+
+        results = []
+        for query_scores, candidates in zip(scores, top):
+            candidates = candidates[np.argsort(-query_scores[candidates])]
+            results.append([
+                (voices[code]["voice_id"], voices[code]["name"], float(query_scores[code]))
+                for code in candidates
+            ])
+        return results
+
+    def identify(self, speaker_embeddings: dict, threshold: float = VOICE_MATCH_THRESHOLD) -> dict:
+        """
+        Name the speakers of one meeting.
+
+        Each enrolled voice is given to at most one speaker: candidate pairs are
+        taken in order of score, so two speakers never resolve to the same person.
+
+        Args:
+            speaker_embeddings: {speaker label: embedding} from diarization.
+
+        Returns:
+            {speaker label: {"voice_id", "name", "score"}} for speakers matched
+            at or above threshold.
+        """
+        self.refresh()
+        labels = list(speaker_embeddings)
+        if not labels or not self.voices:
+            return {}
+        matches = self.search([speaker_embeddings[label] for label in labels])
+
+        candidates = sorted(
+            ((score, label, voice_id, name)
+             for label, voice_matches in zip(labels, matches)
+             for voice_id, name, score in voice_matches if score >= threshold),
+            reverse=True,
+        )
+        identities = {}
+        taken = set()
+        for score, label, voice_id, name in candidates:
+            if label in identities or voice_id in taken:
+                continue
+            identities[label] = {"voice_id": voice_id, "name": name, "score": round(score, 4)}
+            taken.add(voice_id)
+        return identities
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"voices": len(self.voices), "samples": self.samples, "dimension": self.dimension}
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def index_for(org_id: str) -> VoiceIndex:
+    """The org's voice index under VOICE_INDEX_DIR, opened once per process."""
+    if not VOICE_INDEX_DIR:
+        raise RuntimeError("VOICE_INDEX_DIR not set")
+    if not _ORG_ID.match(org_id or ""):
+        raise ValueError(f"Invalid org id: {org_id!r}")
+    with _indexes_lock:
+        index = _indexes.get(org_id)
+        if index is None:
+            index = VoiceIndex(os.path.join(VOICE_INDEX_DIR, org_id))
+            _indexes[org_id] = index
+        return index
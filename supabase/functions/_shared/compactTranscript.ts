@@ -0,0 +1,89 @@
+// Decoder for the columnar transcript sent by lambda-transcribe when
+// transcript_format is "compact" or "packed" (see format_output.to_compact).
+// Rebuilds the same utterance objects the full format carries.
+
+export interface CompactTranscript {
+  version: number;
+  packed: boolean;
+  utterances: Record<string, number[] | string[] | string>;
+  words: Record<string, number[] | string[] | string>;
+}
+
+export interface TranscriptWord {
+  word: string;
+  start: number;
+  end: number;
+  confidence: number;
+}
+
+export interface TranscriptUtterance {
+  speaker: number;
+  start: number;
+  end: number;
+  text: string;
+  confidence: number;
+  words: TranscriptWord[];
+}
+
+const COMPACT_VERSION = 1;
+const CONFIDENCE_SCALE = 10000;
+
+/** Decode a base64 block of little-endian int32 values. */
+function unpackInt32(block: string): number[] {
+  const bytes = Uint8Array.from(atob(block), (c) => c.charCodeAt(0));
+  const view = new DataView(bytes.buffer);
+  const values = new Array<number>(bytes.length / 4);
+  for (let i = 0; i < values.length; i++) {
+    values[i] = view.getInt32(i * 4, true);
+  }
+  return values;
+}
+
+function intColumn(columns: CompactTranscript['utterances'], name: string, packed: boolean): number[] {
+  const column = columns[name];
+  return packed ? unpackInt32(column as string) : (column as number[]);
+}
+
+export function expandCompactTranscript(compact: CompactTranscript): TranscriptUtterance[] {
+  if (compact.version !== COMPACT_VERSION) {
+    throw new Error(`Unsupported compact transcript version: ${compact.version}`);
+  }
+
+  const { packed } = compact;
+  const u = compact.utterances;
+  const w = compact.words;
+  const speaker = intColumn(u, 'speaker', packed);
+  const uStart = intColumn(u, 'start_ms', packed);
+  const uEnd = intColumn(u, 'end_ms', packed);
+  const uConfidence = intColumn(u, 'confidence', packed);
+  const wordCount = intColumn(u, 'word_count', packed);
+  const text = u.text as string[];
+  const wStart = intColumn(w, 'start_ms', packed);
+  const wEnd = intColumn(w, 'end_ms', packed);
+  const wConfidence = intColumn(w, 'confidence', packed);
+  const word = w.word as string[];
+
+  const utterances: TranscriptUtterance[] = [];
+  let offset = 0;
+  for (let i = 0; i < text.length; i++) {
+    const words: TranscriptWord[] = [];
+    for (let j = offset; j < offset + wordCount[i]; j++) {
+      words.push({
+        word: word[j],
+        start: wStart[j] / 1000,
+        end: wEnd[j] / 1000,
+        confidence: wConfidence[j] / CONFIDENCE_SCALE,
+      });
+    }
+    offset += wordCount[i];
+    utterances.push({
+      speaker: speaker[i],
+      start: uStart[i] / 1000,
+      end: uEnd[i] / 1000,
+      text: text[i],
+      confidence: uConfidence[i] / CONFIDENCE_SCALE,
+      words,
+    });
+  }
+  return utterances;
+}
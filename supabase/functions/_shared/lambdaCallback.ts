@@ -0,0 +1,51 @@
+// Shared helpers for HMAC-signed callbacks from the Python Lambdas
+// (lambda-shared/callback_client.py). Used by process-transcription-callback
+// and process-compress-callback.
+//
+// - Large bodies arrive gzip-compressed; the signature covers the JSON.
+// - Very large payloads are spilled to S3 and replaced by a signed pointer
+//   { recording_id, status, payload_url, payload_sha256, payload_bytes }.
+// - Retries of the same result carry the same Idempotency-Key header.
+
+/**
+ * Read the request body as JSON text, gunzipping it if needed.
+ * Checks the gzip magic bytes rather than trusting Content-Encoding,
+ * in case the gateway already decompressed the body.
+ */
+export async function readCallbackBody(req: Request): Promise<string> {
+  const raw = new Uint8Array(await req.arrayBuffer());
+  if (raw.length >= 2 && raw[0] === 0x1f && raw[1] === 0x8b) {
+    const stream = new Blob([raw]).stream().pipeThrough(new DecompressionStream('gzip'));
+    return await new Response(stream).text();
+  }
+  return new TextDecoder().decode(raw);
+}
+
+async function sha256Hex(text: string): Promise<string> {
+  const digest = await crypto.subtle.digest('SHA-256', new TextEncoder().encode(text));
+  return Array.from(new Uint8Array(digest))
+    .map((b) => b.toString(16).padStart(2, '0'))
+    .join('');
+}
+
+/**
+ * Resolve a verified callback payload. Pointer payloads are fetched from S3
+ * and checked against the signed sha256; anything else is returned as-is.
+ */
+export async function resolveCallbackPayload<T>(payload: Record<string, unknown>): Promise<T> {
+  const payloadUrl = payload.payload_url;
+  if (typeof payloadUrl !== 'string') {
+    return payload as T;
+  }
+
+  const response = await fetch(payloadUrl);
+  if (!response.ok) {
+    throw new Error(`Failed to fetch spilled callback payload: ${response.status}`);
+  }
+  // fetch() transparently decodes the object's Content-Encoding: gzip
+  const text = await response.text();
+  if ((await sha256Hex(text)) !== payload.payload_sha256) {
+    throw new Error('Spilled callback payload does not match signed sha256');
+  }
+  return JSON.parse(text) as T;
+}
@@ -103,7 +103,7 @@ export async function handlePoll(req: Request): Promise<Response> {
     // 2. Failed transcription (for retry or fallback)
     const { data: recordings, error: fetchError } = await supabase
       .from('recordings')
-      .select('id, bot_id, s3_video_url, s3_audio_url, transcription_status, transcription_retry_count, transcription_error, updated_at')
+      .select('id, bot_id, org_id, s3_video_url, s3_audio_url, transcription_status, transcription_retry_count, transcription_error, updated_at')
       .or(
         'and(transcription_status.eq.pending,s3_upload_status.eq.complete,transcript_text.is.null),' +
         'transcription_status.eq.failed'
@@ -137,7 +137,7 @@ export async function handlePoll(req: Request): Promise<Response> {
     const results: Array<{ recording_id: string; success: boolean; action: string; error?: string }> = [];
 
     for (const recording of recordings) {
-      const { id, bot_id, s3_video_url, s3_audio_url, transcription_retry_count } = recording;
+      const { id, bot_id, org_id, s3_video_url, s3_audio_url, transcription_retry_count } = recording;
       const retryCount = transcription_retry_count || 0;
 
       try {
@@ -188,6 +188,8 @@ export async function handlePoll(req: Request): Promise<Response> {
             callback_secret: callbackSecret,
             language: 'en',
             model_size: 'medium',
+            // Names speakers that match the org's enrolled voices (speaker_identities in the callback)
+            org_id,
           };
 
           const railwayResponse = await fetch(`${railwayUrl}/transcribe`, {
@@ -7,6 +7,7 @@ import { createClient } from 'jsr:@supabase/supabase-js@2.43.4';
 import { LambdaClient, InvokeCommand } from 'npm:@aws-sdk/client-lambda@3';
 import { getCorsHeaders, handleCorsPreflightRequest } from '../_shared/corsHelper.ts';
 import { syncRecordingToMeeting } from '../_shared/recordingCompleteSync.ts';
+import { readCallbackBody, resolveCallbackPayload } from '../_shared/lambdaCallback.ts';
 
 interface CompressCallbackPayload {
   recording_id: string;
@@ -58,7 +59,7 @@ serve(async (req) => {
       throw new Error('COMPRESS_CALLBACK_SECRET not configured');
     }
 
-    const body = await req.text();
+    const body = await readCallbackBody(req);
     const signature = req.headers.get('X-Callback-Signature');
 
     if (!signature) {
@@ -77,10 +78,11 @@ serve(async (req) => {
       );
     }
 
-    const payload: CompressCallbackPayload = JSON.parse(body);
+    // Large results may be spilled to S3 behind a signed pointer
+    const payload = await resolveCallbackPayload<CompressCallbackPayload>(JSON.parse(body));
     const { recording_id, status } = payload;
 
-    console.log(`[CompressCallback] Received callback for recording: ${recording_id}, status: ${status}`);
+    console.log(`[CompressCallback] Received callback for recording: ${recording_id}, status: ${status}, idempotency key: ${req.headers.get('Idempotency-Key') ?? 'none'}`);
 
     const supabase = createClient(
       Deno.env.get('SUPABASE_URL') ?? '',
@@ -9,17 +9,37 @@ import { serve } from 'https://deno.land/std@0.168.0/http/server.ts';
 import { createClient } from 'jsr:@supabase/supabase-js@2.43.4';
 import { getCorsHeaders, handleCorsPreflightRequest } from '../_shared/corsHelper.ts';
 import { syncRecordingToMeeting } from '../_shared/recordingCompleteSync.ts';
+import { readCallbackBody, resolveCallbackPayload } from '../_shared/lambdaCallback.ts';
+import { CompactTranscript, expandCompactTranscript } from '../_shared/compactTranscript.ts';
+
+interface SpeakerIdentity {
+  voice_id: string;
+  name: string | null;
+  score: number;
+}
 
 interface TranscriptionCallbackPayload {
   recording_id: string;
-  status: 'success' | 'error';
+  status: 'success' | 'error' | 'partial' | 'draft';
+  sequence?: number;
+  is_final?: boolean;
+  provisional?: boolean;
+  model_size?: string;
+  window_end_seconds?: number;
   transcript_text?: string;
-  transcript_json?: { utterances: unknown[] };
+  transcript_json?: {
+    utterances: unknown[];
+    speaker_identities?: Record<string, SpeakerIdentity>;
+    speaker_embeddings?: Record<string, number[]>;
+  };
   transcript_utterances?: unknown[];
+  transcript_compact?: CompactTranscript;
   duration_seconds?: number;
   language?: string;
   word_count?: number;
   speaker_count?: number;
+  speaker_embeddings?: Record<string, number[]>;
+  speaker_identities?: Record<string, SpeakerIdentity>;
   processing_seconds?: number;
   error?: string;
 }
@@ -61,7 +81,7 @@ serve(async (req) => {
       throw new Error('LAMBDA_TRANSCRIBE_CALLBACK_SECRET not configured');
     }
 
-    const body = await req.text();
+    const body = await readCallbackBody(req);
     const signature = req.headers.get('X-Callback-Signature');
 
     if (!signature) {
@@ -80,17 +100,59 @@ serve(async (req) => {
       );
     }
 
-    const payload: TranscriptionCallbackPayload = JSON.parse(body);
+    // Large results may be spilled to S3 behind a signed pointer
+    const payload = await resolveCallbackPayload<TranscriptionCallbackPayload>(JSON.parse(body));
     const { recording_id, status } = payload;
 
-    console.log(`[TranscriptionCallback] Received callback for recording: ${recording_id}, status: ${status}`);
+    // Columnar transcript (transcript_format compact/packed) → the stored utterance shape
+    if (payload.transcript_compact) {
+      const utterances = expandCompactTranscript(payload.transcript_compact);
+      payload.transcript_utterances = utterances;
+      payload.transcript_json = { utterances };
+    }
+
+    // Recurring speakers: keep the matched voices and each speaker's embedding (enrollable
+    // later through the transcriber's POST /voices) alongside the utterances
+    if (payload.transcript_json && (payload.speaker_identities || payload.speaker_embeddings)) {
+      payload.transcript_json = {
+        ...payload.transcript_json,
+        speaker_identities: payload.speaker_identities ?? {},
+        speaker_embeddings: payload.speaker_embeddings ?? {},
+      };
+    }
+
+    console.log(`[TranscriptionCallback] Received callback for recording: ${recording_id}, status: ${status}, idempotency key: ${req.headers.get('Idempotency-Key') ?? 'none'}`);
 
     const supabase = createClient(
       Deno.env.get('SUPABASE_URL') ?? '',
       Deno.env.get('SUPABASE_SERVICE_ROLE_KEY') ?? ''
     );
 
-    if (status === 'success') {
+    if (status === 'partial' || status === 'draft') {
+      // Progressive mode: show the undiarized transcript so far while the job runs.
+      // Draft mode: a provisional quick-model transcript of the whole recording.
+      // Never overwrite a finished transcript with a late partial or draft.
+      const { error: partialError } = await supabase
+        .from('recordings')
+        .update({
+          transcript_text: payload.transcript_text,
+          transcription_status: 'processing',
+          updated_at: new Date().toISOString(),
+        })
+        .eq('id', recording_id)
+        .neq('transcription_status', 'complete');
+
+      if (partialError) {
+        throw new Error(`Failed to save partial transcript: ${partialError.message}`);
+      }
+
+      console.log(
+        status === 'draft'
+          ? `[TranscriptionCallback] Draft (${payload.model_size}) saved for ${recording_id}`
+          : `[TranscriptionCallback] Partial ${payload.sequence} saved for ${recording_id} ` +
+            `(up to ${payload.window_end_seconds}s)`
+      );
+    } else if (status === 'success') {
       // 2. Save transcript to recordings table
       const { error: updateError } = await supabase
         .from('recordings')